@@ -0,0 +1,264 @@
+"""
+Alertas de estoque baixo e esgotado, avisados no momento da alteração, sem varrer o catálogo.
+
+Um `Alertas` se registra como ouvinte do estoque (como o diário de `persistencia.py`) e acompanha a
+situação de cada produto em relação ao seu limite:
+
+- 'esgotado': quantidade igual a zero
+- 'baixo': quantidade maior que zero e menor que o limite
+- 'normal': quantidade maior ou igual ao limite
+
+O limite é o mesmo para todos os produtos (o padrão é 7, como em `filtrar_quantidade`), mas cada
+produto pode ter o seu. Sempre que uma alteração (cadastro, atualização de quantidade, movimentação em
+massa ou a troca de um limite) faz um produto mudar de situação, nos dois sentidos, as funções
+assinadas recebem um `Alerta`.
+
+Os alertas são entregues em lotes: uma função assinada é chamada como `funcao(alertas)`, com a lista
+dos alertas pendentes. As alterações de um grupo (`Estoque.agrupar`, `movimentar_lote`,
+`reprecificar_lote`) e os produtos de um cadastro em lote geram uma única entrega no fim, e um produto
+que muda várias vezes dentro do lote aparece uma vez só, com a situação de antes e a de depois (se ele
+voltou à situação inicial, não há alerta). Fora de um grupo, cada alteração é entregue na hora, dentro
+da própria chamada que alterou o estoque. Com `intervalo`, os alertas são acumulados e entregues por
+uma thread no máximo uma vez a cada `intervalo` segundos.
+
+Exemplo de uso:
+def repor(alertas):
+    for alerta in alertas:
+        if alerta.atual != 'normal':
+            pedir_reposicao(alerta.codigo, alerta.limite - alerta.quantidade)
+
+alertas = Alertas(estoque, limite=10)
+alertas.definir_limite(50, codigo=203) # o produto 203 vende mais: avisa abaixo de 50
+alertas.assinar(repor)
+estoque.definir_quantidade(203, 45) -> repor([Alerta(203, 'normal', 'baixo', 45, 50)])
+"""
+import threading
+import traceback
+
+LIMITE_PADRAO = 7 # mesmo padrão de `filtrar_quantidade`
+
+ESGOTADO = 'esgotado'
+BAIXO = 'baixo'
+NORMAL = 'normal'
+
+def situacao(quantidade, limite):
+    """
+    Retorna a situação ('esgotado', 'baixo' ou 'normal') de uma quantidade em relação ao limite.
+    """
+    if quantidade <= 0:
+        return ESGOTADO
+    if quantidade < limite:
+        return BAIXO
+    return NORMAL
+
+class Alerta:
+    """
+    A mudança de situação de um produto.
+
+    Atributos:
+    codigo (int): O código do produto.
+    anterior (str ou None): A situação antes da mudança (None para um produto recém-cadastrado).
+    atual (str): A situação depois da mudança.
+    quantidade (int): A quantidade atual do produto.
+    limite (int): O limite que vale para o produto.
+    """
+
+    __slots__ = ('codigo', 'anterior', 'atual', 'quantidade', 'limite')
+
+    def __init__(self, codigo, anterior, atual, quantidade, limite):
+        self.codigo = codigo
+        self.anterior = anterior
+        self.atual = atual
+        self.quantidade = quantidade
+        self.limite = limite
+
+    def __eq__(self, outro):
+        if not isinstance(outro, Alerta):
+            return NotImplemented
+        return ((self.codigo, self.anterior, self.atual, self.quantidade, self.limite)
+                == (outro.codigo, outro.anterior, outro.atual, outro.quantidade, outro.limite))
+
+    def __repr__(self):
+        return f"Alerta({self.codigo}, {self.anterior!r}, {self.atual!r}, {self.quantidade}, {self.limite})"
+
+class Alertas:
+    """
+    Acompanha as mudanças de situação dos produtos e as entrega às funções assinadas.
+
+    Parâmetros:
+    estoque (Estoque): O estoque acompanhado.
+    limite (int, opcional): O limite de todos os produtos sem limite próprio. O padrão é 7.
+    intervalo (float, opcional): Se maior que zero, os alertas são entregues por uma thread, no máximo
+                                 uma vez a cada `intervalo` segundos. Com 0 (padrão), são entregues na
+                                 hora (ou no fim do grupo de alterações).
+
+    As funções assinadas não devem alterar o estoque: elas são chamadas de dentro da alteração (ou, com
+    `intervalo`, de outra thread). Uma exceção numa delas é exibida e não interrompe as demais nem a
+    alteração que gerou o alerta.
+    """
+
+    def __init__(self, estoque, limite=LIMITE_PADRAO, intervalo=0):
+        self.estoque = estoque
+        self.limite = limite
+        self.intervalo = intervalo
+        self._limites = {} # código -> limite próprio do produto
+        self._assinantes = []
+        self._pendentes = {} # código -> [situação anterior, situação atual, quantidade, limite], na ordem das mudanças
+        self._grupo = 0 # profundidade de grupos de alterações abertos
+        self._trava = threading.Lock() # protege os pendentes quando a entrega é feita por outra thread
+        self._temporizador = None
+        estoque.adicionar_ouvinte(self._observar)
+
+    def fechar(self):
+        """
+        Entrega os alertas pendentes e deixa de acompanhar o estoque.
+        """
+        self.estoque.remover_ouvinte(self._observar)
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        self.entregar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        self.fechar()
+
+    def assinar(self, funcao):
+        """
+        Registra uma função chamada como `funcao(alertas)` a cada entrega.
+        """
+        self._assinantes.append(funcao)
+
+    def cancelar(self, funcao):
+        """
+        Cancela a assinatura de uma função.
+        """
+        self._assinantes.remove(funcao)
+
+    def limite_de(self, codigo):
+        """
+        Retorna o limite que vale para o produto.
+        """
+        return self._limites.get(codigo, self.limite)
+
+    def definir_limite(self, limite, codigo=None):
+        """
+        Altera o limite de um produto (ou, sem `codigo`, o limite de todos os produtos sem limite próprio).
+        Os produtos que mudam de situação com o novo limite geram alertas.
+        """
+        estoque = self.estoque
+        if codigo is not None:
+            anterior = self.limite_de(codigo)
+            self._limites[codigo] = limite
+            slot = estoque.localizar(codigo)
+            if slot is not None:
+                quantidade = estoque.quantidades[slot]
+                self._mudou(codigo, situacao(quantidade, anterior), situacao(quantidade, limite), quantidade, limite)
+        else:
+            anterior, self.limite = self.limite, limite
+            # só mudam os produtos com quantidade entre os dois limites (os esgotados continuam esgotados);
+            # o índice de quantidades os entrega sem percorrer o catálogo
+            menor, maior = sorted((anterior, limite))
+            codigos, quantidades = estoque.codigos, estoque.quantidades
+            for slot in estoque.indice_quantidades.entre(max(menor, 1), maior - 1):
+                codigo = codigos[slot]
+                if codigo not in self._limites:
+                    quantidade = quantidades[slot]
+                    self._mudou(codigo, situacao(quantidade, anterior), situacao(quantidade, limite), quantidade, limite)
+        self._talvez_entregar()
+
+    def remover_limite(self, codigo):
+        """
+        Faz o produto voltar a usar o limite de todos os produtos.
+        """
+        if codigo in self._limites:
+            self.definir_limite(self.limite, codigo)
+            del self._limites[codigo]
+
+    def atuais(self):
+        """
+        Retorna os alertas da situação atual: um `Alerta` (com anterior None) para cada produto esgotado
+        ou abaixo do seu limite, na ordem de cadastro. Útil para começar a acompanhar um estoque já carregado.
+        """
+        estoque = self.estoque
+        codigos, quantidades = estoque.codigos, estoque.quantidades
+        slots = set(estoque.quantidade_menor_que(self.limite))
+        for codigo, limite in self._limites.items():
+            slot = estoque.localizar(codigo)
+            if slot is not None:
+                if quantidades[slot] < max(limite, 1):
+                    slots.add(slot)
+                else:
+                    slots.discard(slot) # o limite próprio é menor que o de todos
+        alertas = []
+        for slot in sorted(slots):
+            codigo, quantidade = codigos[slot], quantidades[slot]
+            limite = self.limite_de(codigo)
+            alertas.append(Alerta(codigo, None, situacao(quantidade, limite), quantidade, limite))
+        return alertas
+
+    def _observar(self, operacao, *argumentos):
+        """
+        Ouvinte do estoque: anota as mudanças de situação e as entrega fora dos grupos de alterações.
+        """
+        if operacao == 'quantidade':
+            codigo, antiga, nova = argumentos
+            limite = self.limite_de(codigo)
+            self._mudou(codigo, situacao(antiga, limite), situacao(nova, limite), nova, limite)
+        elif operacao == 'cadastrar':
+            for produto in argumentos[0]:
+                codigo, quantidade = produto[1], produto[2]
+                limite = self.limite_de(codigo)
+                self._mudou(codigo, None, situacao(quantidade, limite), quantidade, limite)
+        elif operacao == 'remover':
+            with self._trava:
+                self._pendentes.pop(argumentos[0][1], None) # o produto não existe mais
+        elif operacao == 'inicio_grupo':
+            self._grupo += 1
+            return
+        elif operacao == 'fim_grupo':
+            self._grupo -= 1
+        else:
+            return # preço e descrição não mudam a situação
+        self._talvez_entregar()
+
+    def _mudou(self, codigo, anterior, atual, quantidade, limite):
+        with self._trava:
+            pendente = self._pendentes.get(codigo)
+            if pendente is not None:
+                pendente[1:] = atual, quantidade, limite # mantém a situação de antes do lote e atualiza o resto
+            elif anterior != atual:
+                self._pendentes[codigo] = [anterior, atual, quantidade, limite]
+
+    def _talvez_entregar(self):
+        if self._grupo or not self._pendentes:
+            return
+        if not self.intervalo:
+            self.entregar()
+        elif self._temporizador is None:
+            self._temporizador = threading.Timer(self.intervalo, self._entregar_agendado)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def _entregar_agendado(self):
+        self._temporizador = None
+        self.entregar()
+
+    def entregar(self):
+        """
+        Entrega agora os alertas pendentes. Retorna a lista entregue.
+        """
+        with self._trava:
+            pendentes, self._pendentes = self._pendentes, {}
+        alertas = [Alerta(codigo, anterior, atual, quantidade, limite)
+                   for codigo, (anterior, atual, quantidade, limite) in pendentes.items()
+                   if anterior != atual and not (anterior is None and atual == NORMAL)] # ignora quem voltou à situação inicial
+        if alertas:
+            for funcao in list(self._assinantes):
+                try:
+                    funcao(alertas)
+                except Exception:
+                    traceback.print_exc() # um assinante com erro não pode desfazer a alteração já aplicada
+        return alertas
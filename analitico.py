@@ -0,0 +1,256 @@
+"""
+Motores de análise do estoque: totais por item, agrupamentos e rankings.
+
+Há dois motores com a mesma interface:
+
+- `MotorPython`: implementação de referência, em Python puro, com a mesma aritmética de
+  `relatorio_geral` (quantidade * custo e quantidade * preço, em centavos).
+- `MotorNumpy`: faz as mesmas contas em lote sobre as colunas do estoque, vistas como vetores NumPy
+  sem cópia (`numpy.frombuffer`). Só fica disponível se o NumPy estiver instalado.
+
+Como tudo é feito com inteiros em centavos, os dois motores retornam exatamente os mesmos números.
+As contas do NumPy são feitas em int64, que estoura sem aviso; quando os maiores valores das colunas
+poderiam estourar (`cabe_em_int64`), o `MotorNumpy` repassa a conta ao `MotorPython`. A função `motor_analitico` escolhe o motor NumPy quando possível e recai no motor Python caso contrário.
+
+Exemplo de uso:
+motor = motor_analitico(estoque)
+slots, custos_totais, faturamentos_totais = motor.totais_por_item()
+motor.agrupar() -> {'Monitor': (37, 2890000, 4715000), 'Mouse': (90, 830000, 1750000), ...}
+motor.maiores(3, por='margem') -> [slot, slot, slot]
+"""
+from estoque import LIMITE_INTEIRO, REMOVIDO
+from metricas import METRICAS
+
+try:
+    import numpy as np
+except ImportError: # o NumPy é opcional
+    np = None
+
+CRITERIOS = ('valor', 'margem')
+
+def prefixo(palavras=1):
+    """
+    Retorna uma função que agrupa os produtos pelas primeiras `palavras` palavras da descrição
+    (ex.: com palavras=1, 'Monitor Samsung' e 'Monitor LG' caem no grupo 'Monitor').
+    """
+    def chave(descricao):
+        return ' '.join(descricao.split()[:palavras])
+    return chave
+
+def _margem(custo, preco):
+    return (preco - custo) / preco if preco else 0.0
+
+class MotorPython:
+    """
+    Motor de análise de referência, em Python puro.
+
+    Parâmetros:
+    estoque (Estoque): O estoque a ser analisado.
+    """
+
+    def __init__(self, estoque):
+        self.estoque = estoque
+
+    def totais_por_item(self):
+        """
+        Calcula o custo total e o faturamento total de cada produto.
+
+        Retorna:
+        tuple: (slots, custos_totais, faturamentos_totais), três sequências alinhadas, na ordem de
+               cadastro, com os valores em centavos.
+        """
+        estoque = self.estoque
+        slots = list(estoque.slots())
+        METRICAS.linhas(len(slots))
+        quantidades, custos, precos = estoque.quantidades, estoque.custos, estoque.precos
+        custos_totais = [quantidades[slot] * custos[slot] for slot in slots]
+        faturamentos_totais = [quantidades[slot] * precos[slot] for slot in slots]
+        return slots, custos_totais, faturamentos_totais
+
+    def totais(self):
+        """
+        Retorna (custo total, valor total) do estoque em centavos, recalculados do zero.
+        """
+        _, custos_totais, faturamentos_totais = self.totais_por_item()
+        return sum(custos_totais), sum(faturamentos_totais)
+
+    def agrupar(self, chave=None):
+        """
+        Agrupa os produtos e soma, por grupo, a quantidade, o custo total e o valor total (em centavos).
+
+        Parâmetros:
+        chave (callable, opcional): Função que recebe a descrição e retorna o grupo (uma categoria, por
+                                    exemplo). O padrão é agrupar pela primeira palavra da descrição.
+
+        Retorna:
+        dict: grupo -> (quantidade, custo total, valor total), com os grupos em ordem alfabética.
+        """
+        chave = chave or prefixo()
+        estoque = self.estoque
+        grupos = {}
+        METRICAS.linhas(len(estoque))
+        for slot in estoque.slots():
+            grupo = chave(estoque.descricoes[slot])
+            quantidade = estoque.quantidades[slot]
+            soma_quantidade, soma_custo, soma_valor = grupos.get(grupo, (0, 0, 0))
+            grupos[grupo] = (soma_quantidade + quantidade,
+                             soma_custo + quantidade * estoque.custos[slot],
+                             soma_valor + quantidade * estoque.precos[slot])
+        return dict(sorted(grupos.items()))
+
+    def maiores(self, n, por='valor'):
+        """
+        Retorna os slots dos `n` produtos com maior valor em estoque (quantidade * preço) ou maior margem
+        ((preço - custo) / preço). Empates ficam na ordem de cadastro.
+        """
+        if por not in CRITERIOS:
+            raise ValueError(f"critério inválido: {por!r} (use {' ou '.join(CRITERIOS)})")
+        if n <= 0:
+            return []
+        estoque = self.estoque
+        if por == 'valor':
+            criterio = lambda slot: estoque.quantidades[slot] * estoque.precos[slot]
+        else:
+            criterio = lambda slot: _margem(estoque.custos[slot], estoque.precos[slot])
+        METRICAS.linhas(len(estoque))
+        return sorted(estoque.slots(), key=criterio, reverse=True)[:n]
+
+class MotorNumpy:
+    """
+    Motor de análise vetorizado, com as mesmas respostas do `MotorPython`.
+
+    As colunas do estoque são lidas como vetores NumPy sem cópia. Enquanto um desses vetores existe,
+    o `array` de origem não pode crescer; por isso as vistas vivem apenas durante cada método e os
+    resultados retornados são sempre vetores novos.
+
+    Parâmetros:
+    estoque (Estoque): O estoque a ser analisado.
+    """
+
+    def __init__(self, estoque):
+        if np is None:
+            raise RuntimeError("o motor NumPy requer o pacote numpy")
+        self.estoque = estoque
+
+    def cabe_em_int64(self):
+        """
+        Indica se todas as contas do motor cabem em int64: a soma de `quantidade * custo` e de
+        `quantidade * preço` sobre o estoque inteiro e a diferença `preço - custo`. O limite é calculado
+        pelos maiores valores absolutos de cada coluna (as lápides têm valores zerados).
+        """
+        estoque = self.estoque
+        if not len(estoque):
+            return True
+        maior_quantidade, maior_custo, maior_preco = (
+            max(int(vetor.max()), -int(vetor.min()))
+            for vetor in (np.frombuffer(coluna, dtype=np.int64) for coluna in (estoque.quantidades, estoque.custos, estoque.precos)))
+        maior_valor = max(maior_custo, maior_preco)
+        return maior_quantidade * maior_valor * len(estoque) <= LIMITE_INTEIRO and 2 * maior_valor <= LIMITE_INTEIRO
+
+    def _colunas(self):
+        estoque = self.estoque
+        codigos = np.frombuffer(estoque.codigos, dtype=np.int64)
+        slots = np.flatnonzero(codigos != REMOVIDO)
+        quantidades = np.frombuffer(estoque.quantidades, dtype=np.int64)[slots]
+        custos = np.frombuffer(estoque.custos, dtype=np.int64)[slots]
+        precos = np.frombuffer(estoque.precos, dtype=np.int64)[slots]
+        METRICAS.linhas(len(slots))
+        return slots, quantidades, custos, precos
+
+    def totais_por_item(self):
+        """
+        Calcula o custo total e o faturamento total de cada produto, em lote.
+
+        Retorna:
+        tuple: (slots, custos_totais, faturamentos_totais), três vetores int64 alinhados, na ordem de
+               cadastro, com os valores em centavos (listas, se as contas não couberem em int64).
+        """
+        if not self.cabe_em_int64():
+            return MotorPython(self.estoque).totais_por_item()
+        slots, quantidades, custos, precos = self._colunas()
+        return slots, quantidades * custos, quantidades * precos
+
+    def totais(self):
+        """
+        Retorna (custo total, valor total) do estoque em centavos, recalculados do zero.
+        """
+        if not self.cabe_em_int64():
+            return MotorPython(self.estoque).totais()
+        _, custos_totais, faturamentos_totais = self.totais_por_item()
+        return int(custos_totais.sum()), int(faturamentos_totais.sum())
+
+    def agrupar(self, chave=None):
+        """
+        Agrupa os produtos e soma, por grupo, a quantidade, o custo total e o valor total (em centavos).
+        Mesmos parâmetros e retorno de `MotorPython.agrupar`.
+        """
+        if not self.cabe_em_int64():
+            return MotorPython(self.estoque).agrupar(chave)
+        chave = chave or prefixo()
+        slots, quantidades, custos, precos = self._colunas()
+        descricoes = self.estoque.descricoes
+        if not len(slots):
+            return {}
+
+        # a chave é calculada uma vez por descrição distinta (as descrições são internadas)
+        cache = {}
+        rotulos = []
+        for slot in slots.tolist():
+            descricao = descricoes[slot]
+            rotulo = cache.get(descricao)
+            if rotulo is None:
+                rotulo = cache[descricao] = chave(descricao)
+            rotulos.append(rotulo)
+        grupos, inversos = np.unique(np.array(rotulos, dtype=object), return_inverse=True)
+
+        # ordena por grupo e soma cada trecho com reduceat, mantendo a aritmética inteira exata
+        ordem = np.argsort(inversos, kind='stable')
+        inicios = np.flatnonzero(np.r_[True, np.diff(inversos[ordem]) != 0])
+        somas_quantidade = np.add.reduceat(quantidades[ordem], inicios)
+        somas_custo = np.add.reduceat((quantidades * custos)[ordem], inicios)
+        somas_valor = np.add.reduceat((quantidades * precos)[ordem], inicios)
+        return {grupo: (int(q), int(c), int(v))
+                for grupo, q, c, v in zip(grupos.tolist(), somas_quantidade, somas_custo, somas_valor)}
+
+    def maiores(self, n, por='valor'):
+        """
+        Retorna os slots dos `n` produtos com maior valor em estoque ou maior margem.
+        Mesmos parâmetros e retorno de `MotorPython.maiores`.
+        """
+        if por not in CRITERIOS:
+            raise ValueError(f"critério inválido: {por!r} (use {' ou '.join(CRITERIOS)})")
+        if n <= 0:
+            return []
+        if not self.cabe_em_int64():
+            return MotorPython(self.estoque).maiores(n, por)
+        slots, quantidades, custos, precos = self._colunas()
+        if por == 'valor':
+            criterio = quantidades * precos
+        else:
+            criterio = np.zeros(len(slots), dtype=np.float64)
+            com_preco = precos != 0
+            criterio[com_preco] = (precos[com_preco] - custos[com_preco]) / precos[com_preco]
+        if n < len(slots): # pré-seleciona os candidatos sem ordenar o catálogo inteiro
+            corte = np.partition(criterio, len(criterio) - n)[len(criterio) - n]
+            candidatos = np.flatnonzero(criterio >= corte)
+        else:
+            candidatos = np.arange(len(slots))
+        # maior critério primeiro; empates pela ordem de cadastro (lexsort usa a última chave como principal)
+        ordem = candidatos[np.lexsort((candidatos, -criterio[candidatos]))]
+        return slots[ordem[:n]].tolist()
+
+def motor_analitico(estoque, usar_numpy=None):
+    """
+    Escolhe o motor de análise do estoque.
+
+    Parâmetros:
+    estoque (Estoque): O estoque a ser analisado.
+    usar_numpy (bool, opcional): True exige o NumPy, False força o motor Python. O padrão (None) usa o
+                                 NumPy se ele estiver instalado.
+
+    Retorna:
+    MotorNumpy ou MotorPython
+    """
+    if usar_numpy or (usar_numpy is None and np is not None):
+        return MotorNumpy(estoque)
+    return MotorPython(estoque)
@@ -1,25 +1,30 @@
+import os
+import sys
+from collections import deque
+from itertools import islice
+
+from catalogo import Catalogo
+from estoque import PRODUTO_NAO_ENCONTRADO, formatar_centavos, para_centavos
+from metricas import METRICAS
+from renderizacao import blocos_produtos, escrever, paginar, paginas
+
 def cadastrar_produto(produto):
     """
-    Cadastra um novo produto na lista de produtos.
+    Cadastra um novo produto no estoque.
 
     A função recebe uma string contendo os atributos de um produto separados por ponto e vírgula (';'),
-    e a converte em um dicionário, onde cada chave corresponde a um atributo do produto. O dicionário é
-    então adicionado à lista global de produtos.
+    na ordem 'descricao;codigo;quantidade;custo_item;preco_venda'. Os atributos são convertidos uma única
+    vez (código e quantidade para inteiros, custo e preço para centavos) e guardados no catálogo do menu.
 
     Parâmetros:
-    produto (str): Uma string contendo os atributos do produto, separados por ponto e vírgula. 
-                   A ordem dos atributos deve corresponder à ordem definida na lista `chaves`.
+    produto (str): Uma string contendo os atributos do produto, separados por ponto e vírgula.
 
     Exemplo:
-    Se `chaves` for ['nome', 'preco', 'quantidade'], e o argumento `produto` for 'Produto A;25.99;10',
-    o dicionário {'nome': 'Produto A', 'preco': '25.99', 'quantidade': '10'} será adicionado à lista
-    `lista_produtos`.
+    Se o argumento `produto` for 'Mouse Logitech;203;50;70.00;150.00', o produto é guardado com código 203,
+    quantidade 50, custo 7000 centavos e preço 15000 centavos. Ao ser exibido, ele aparece como
+    {'descricao': 'Mouse Logitech', 'codigo': '203', 'quantidade': '50', 'custo_item': '70.00', 'preco_venda': '150.00'}.
     """
-    atributos = produto.split(';') # Separa os atributos através do separador informado
-
-    produto_dict = {chaves[i]: atributos[i] for i in range(len(chaves))} # Cria o dicionário com o produto
-
-    lista_produtos.append(produto_dict) # Adiciona o produto na lista
+    catalogo.cadastrar_produto(produto) # Converte os atributos e adiciona o produto no estoque
 
 def usuario_cadastra_produto():
     """
@@ -60,35 +65,39 @@ def usuario_cadastra_produto():
 
 def gerar_codigo_unico():
     """
-    Gera um novo código único para um produto, baseado no maior código já cadastrado na lista de produtos.
-
-    A função procura o maior valor de código presente na lista global `lista_produtos` e gera um novo código
-    incrementando o valor do maior código encontrado em 1. Esse novo código é retornado para ser utilizado no
-    cadastro de um novo produto.
+    Gera um novo código único para um produto, sem percorrer a lista de produtos.
 
-    A função assume que a lista `lista_produtos` contém produtos cadastrados com um campo 'codigo'.
+    O estoque mantém um alocador de códigos que guarda o próximo código livre (uma unidade acima do maior
+    código já cadastrado). A cada chamada, o alocador entrega esse código e avança em 1, então o custo é
+    constante mesmo com milhões de produtos. Códigos de produtos removidos nunca são reutilizados, e com o
+    estoque vazio o primeiro código gerado é 1.
 
     Retorna:
     int: O novo código único gerado para o próximo produto a ser cadastrado.
 
     Exemplo de uso:
-    Se os códigos cadastrados forem [1, 2, 3], a função retornará 4 como o próximo código.
+    Se os códigos cadastrados forem [1, 2, 3], a função retornará 4 como o próximo código, e 5 na chamada seguinte.
     """
-    maior_codigo = max(produto['codigo'] for produto in lista_produtos) # procura qual é o maior código cadastrado na lista de produtos
-    novo_codigo = int(maior_codigo) + 1 # soma + 1 no maior código para gerar um novo único
-    return novo_codigo # retorna o código
+    return catalogo.gerar_codigo_unico() # pede ao alocador do estoque o próximo código livre
 
-def listar_produtos(lista):
+def listar_produtos(lista, saida=None, inicio=0, limite=None):
     """
     Exibe no terminal a lista de produtos, mostrando suas chaves e valores.
 
-    A função percorre a lista fornecida e, para cada produto (representado como um dicionário), imprime
+    A função percorre a lista fornecida e, para cada produto (representado como um dicionário), escreve
     suas chaves e respectivos valores no formato "chave: valor". Após exibir os dados de cada produto,
-    é impressa uma linha separadora para melhorar a leitura.
+    é escrita uma linha separadora para melhorar a leitura.
+
+    O texto é montado por um gerador e gravado em blocos grandes (ver `renderizacao.escrever`), em vez de
+    um `print()` por atributo. No terminal, se um tamanho de página tiver sido definido no menu, os produtos
+    são exibidos página por página.
 
     Parâmetros:
-    lista (list): Uma lista de dicionários, onde cada dicionário representa um produto e contém
-                  pares de chave-valor correspondentes às propriedades do produto.
+    lista (iterável): Uma lista (ou gerador) de dicionários, onde cada dicionário representa um produto e contém
+                      pares de chave-valor correspondentes às propriedades do produto.
+    saida (objeto com `write`, opcional): Arquivo, pipe ou outro destino do texto. O padrão é o terminal.
+    inicio (int, opcional): Quantos produtos pular antes de começar a exibir. O padrão é 0.
+    limite (int, opcional): Quantidade máxima de produtos exibidos. O padrão (None) exibe todos.
 
     Exemplo de uso:
     Se a lista contiver:
@@ -110,19 +119,64 @@ def listar_produtos(lista):
     preco: 25.99
     --------------------
     """
-    for produto in lista:
-        print("Produto:")
-        for chave, valor in produto.items():
-            print(f"{chave}: {valor}") # para cada produto na lista é printado no terminal com sua chave e valor
-        print("-" * 20)
+    exibir(paginar(blocos_produtos(lista), inicio, limite), saida) # formata cada produto em um único bloco de texto
+
+def exibir(pedacos, saida=None, cabecalho=0, rodape=0):
+    """
+    Grava os pedaços de texto na saída em blocos grandes.
+
+    Quando a saída é o terminal e o usuário definiu um tamanho de página (opção do menu), os pedaços são
+    exibidos em páginas desse tamanho, e o usuário escolhe entre ver a próxima página ou parar.
+
+    Parâmetros:
+    pedacos (iterável de str): Os pedaços de texto (um por produto ou por linha de relatório).
+    saida (objeto com `write`, opcional): Arquivo, pipe ou outro destino do texto. O padrão é o terminal.
+    cabecalho (int, opcional): Quantos pedaços do início não são itens: eles saem junto com a primeira
+                               página e não contam no tamanho dela. O padrão é 0.
+    rodape (int, opcional): Quantos pedaços do fim não são itens: eles saem depois da última página.
+                            O padrão é 0.
+    """
+    if saida is not None or not tamanho_pagina:
+        escrever(pedacos, saida)
+        return
+    pedacos = iter(pedacos)
+    topo = list(islice(pedacos, cabecalho))
+    fim = deque(islice(pedacos, rodape)) # os últimos pedaços lidos, retidos até saber se são o rodapé
+
+    def itens():
+        for pedaco in pedacos:
+            fim.append(pedaco)
+            yield fim.popleft()
+
+    for numero, pagina in enumerate(paginas(itens(), tamanho_pagina)):
+        if numero > 0 and input("Digite 1 para ver a próxima página ou 2 para parar: ") != '1':
+            return
+        escrever(topo + pagina)
+        topo = []
+    escrever(topo + list(fim))
+
+def definir_tamanho_pagina():
+    """
+    Solicita ao usuário o tamanho de página usado nas listagens e no relatório geral.
+    Com 0, tudo é exibido de uma vez (comportamento padrão).
+    """
+    global tamanho_pagina
+    novo_tamanho = int(input("Digite a quantidade de itens por página (0 para exibir tudo de uma vez): "))
+    if novo_tamanho < 0:
+        print("Tamanho de página não permitido!")
+        return
+    tamanho_pagina = novo_tamanho
+    print("Tamanho de página atualizado com sucesso!")
 
 def ordena_produtos():
     """
     Ordena a lista de produtos com base na quantidade, de acordo com a escolha do usuário.
 
     A função solicita ao usuário que escolha entre ordenar a lista de produtos por quantidade de forma crescente
-    ou decrescente. Em seguida, a lista é ordenada utilizando a função `sorted()`, com a chave sendo a quantidade
-    de cada produto. Após a ordenação, a função `listar_produtos` é chamada para exibir a lista ordenada no terminal.
+    ou decrescente. Em seguida, os produtos são percorridos pelo índice de quantidades do estoque, que já os mantém
+    ordenados a cada cadastro, remoção ou atualização, então nenhuma ordenação é feita no momento da consulta.
+    Produtos com a mesma quantidade aparecem na ordem de cadastro. A função `listar_produtos` é chamada para exibir
+    a lista ordenada no terminal.
 
     O usuário deve digitar:
     - 1 para ordenar de forma crescente (do menor para o maior valor de quantidade).
@@ -155,22 +209,22 @@ def ordena_produtos():
     """
     escolha = int(input("Digite 1 para ordenar por ordem crescente ou 2 para ordenar por ordem decrescente ")) # pede para o usuário escolher entre ordenar de forma crescente ou decrescente
 
-    if escolha == 1:
-        lista_ordem_crescente = sorted(lista_produtos, key=lambda x: int(x['quantidade'])) # ordena a lista de forma crescente
-        listar_produtos(lista_ordem_crescente)
-    elif escolha == 2:
-        lista_ordem_decrescente = sorted(lista_produtos, key=lambda x: int(x['quantidade']), reverse=True) # ordena a lista  de forma decrescente
-        listar_produtos(lista_ordem_decrescente)
+    with METRICAS.operacao('ordenar'): # mede a consulta e a exibição, sem o tempo da resposta acima
+        if escolha == 1:
+            listar_produtos(catalogo.ordena_produtos()) # percorre o índice de quantidades de forma crescente
+        elif escolha == 2:
+            listar_produtos(catalogo.ordena_produtos(decrescente=True)) # percorre o índice de quantidades de forma decrescente
 
 def buscar_produtos(**kwargs):
     """
-    Busca produtos na lista `lista_produtos` com base nos critérios fornecidos como parâmetros nomeados.
+    Busca produtos no estoque com base nos critérios fornecidos como parâmetros nomeados.
 
     A função permite realizar uma busca flexível pelos atributos dos produtos, como descrição e código.
     O usuário pode passar parâmetros nomeados para buscar produtos que atendam a determinados critérios.
 
     Parâmetros:
-    - descricao (str, opcional): A descrição do produto a ser buscada. A busca é feita de forma insensível a maiúsculas/minúsculas.
+    - descricao (str, opcional): A descrição do produto a ser buscada. A busca é feita de forma insensível a maiúsculas/minúsculas,
+                                 usando o índice de trigramas do estoque em vez de percorrer todos os produtos.
     - codigo (str, opcional): O código do produto a ser buscado. O código é comparado de forma exata (sem distinção de maiúsculas/minúsculas).
 
     A função verifica se os parâmetros 'descricao' ou 'codigo' foram fornecidos, e filtra os produtos com base
@@ -190,21 +244,8 @@ def buscar_produtos(**kwargs):
         {'codigo': '1', 'descricao': 'Produto A', 'quantidade': '10', 'preco': '15.99'}
     ]
     """
-    resultados = [] # lista para guardar os resultados
-
-    for produto in lista_produtos:
-        # Obtém os valores de 'descricao' e 'codigo' fornecidos como argumentos nomeados.
-        descricao = kwargs.get('descricao', '').lower()
-        codigo = kwargs.get('codigo', '').lower()
-
-        # Verifica se 'descricao' foi fornecida e se corresponde à descrição do produto (ignorando maiúsculas/minúsculas)
-        if descricao and descricao in produto['descricao'].lower():
-            resultados.append(produto)
-        # Verifica se 'codigo' foi fornecido e se corresponde exatamente ao código do produto    
-        elif codigo and codigo == str(produto['codigo']):
-            resultados.append(produto)
-
-    return resultados
+    # Obtém os valores de 'descricao' e 'codigo' fornecidos como argumentos nomeados e consulta os índices do catálogo
+    return catalogo.buscar_produtos(descricao=kwargs.get('descricao', ''), codigo=kwargs.get('codigo', ''))
 
 def entrada_usuario_busca():
     """
@@ -253,25 +294,22 @@ def remover_produto():
     4. Se o produto não for encontrado, uma mensagem informando que o produto não existe é exibida.
     """
     produto_escolhido = input("Digite o código do produto que deseja remover: ") # Solicita ao usuário o código do produto a ser removido
-    for produto in lista_produtos:
-        if produto_escolhido == produto['codigo']: # Verifica se o código existe na lista
-            lista_produtos.remove(produto) # Remove o produto da lista
-            print("Produto removido com sucesso!")
-            return
-    print('Produto não encontrado')
+    if produto_escolhido.isdigit() and catalogo.remover_produto(int(produto_escolhido)): # Remove o produto se o código existir no estoque
+        print("Produto removido com sucesso!")
+        return
+    print(PRODUTO_NAO_ENCONTRADO)
 
 def exibir_produtos_esgotados():
     """
     Exibe os produtos que estão esgotados na lista de produtos.
 
-    A função percorre a lista de produtos e verifica quais possuem quantidade igual a '0' (indicando que estão esgotados). 
-    Os produtos esgotados são então armazenados em uma lista e exibidos utilizando a função `listar_produtos`.
+    A função consulta o índice de quantidades do estoque, que mantém agrupados os produtos com quantidade igual a 0
+    (indicando que estão esgotados), sem percorrer o restante do catálogo. Os produtos esgotados são então exibidos
+    utilizando a função `listar_produtos`.
 
     Fluxo de operação:
-    1. A função percorre todos os produtos da lista `lista_produtos`.
-    2. Para cada produto, verifica se o valor da quantidade é igual a '0' (indicando que o produto está esgotado).
-    3. Adiciona os produtos esgotados à lista `produtos_esgotados`.
-    4. Exibe os produtos esgotados utilizando a função `listar_produtos`.
+    1. A função obtém do índice de quantidades os produtos com quantidade igual a 0, na ordem de cadastro.
+    2. Exibe os produtos esgotados utilizando a função `listar_produtos`.
 
     Exemplo de uso:
     Se a lista de produtos contiver:
@@ -287,30 +325,28 @@ def exibir_produtos_esgotados():
     quantidade: 0
     --------------------
     """
-    produtos_esgotados = [] # cria uma lista vazia para guardar os produtos esgotados
-    for produto in lista_produtos:
-        if produto['quantidade'] == '0': # verifica se existe produtos com a quantidade igual a 0
-            produtos_esgotados.append(produto) # se tiver, guarda na lista para ser exibido posteriormente
-    listar_produtos(produtos_esgotados) # chama a funcao de listar produtos passando aqueles que estão esgotados
+    with METRICAS.operacao('esgotados'):
+        produtos_esgotados = catalogo.produtos_esgotados() # obtém os produtos com a quantidade igual a 0
+        listar_produtos(produtos_esgotados) # chama a funcao de listar produtos passando aqueles que estão esgotados
 
 def filtrar_quantidade(qntd=7):
     """
     Filtra e exibe os produtos cuja quantidade é menor que o valor especificado.
 
-    A função percorre a lista de produtos e seleciona os produtos cuja quantidade (convertida para inteiro)
-    é menor que o valor fornecido no parâmetro `qntd`. A lista filtrada é então exibida utilizando a função `listar_produtos`.
+    A função consulta o índice de quantidades do estoque e seleciona apenas as faixas de quantidade menores que
+    o valor fornecido no parâmetro `qntd`, sem percorrer os demais produtos. A lista filtrada é então exibida utilizando a função `listar_produtos`.
 
     Parâmetros:
     qntd (int, opcional): O valor de referência para filtrar os produtos. Somente produtos com quantidade menor que
                           esse valor serão exibidos. O valor padrão é 7.
 
     Fluxo de operação:
-    1. A função percorre a lista de produtos e compara a quantidade de cada produto com o valor de `qntd`.
-    2. Produtos cuja quantidade é inferior a `qntd` são adicionados à lista `produtos_filtrados`.
+    1. A função obtém do índice de quantidades os produtos cuja quantidade é inferior a `qntd`, na ordem de cadastro.
+    2. Esses produtos são guardados na lista `produtos_filtrados`.
     3. A lista de produtos filtrados é exibida utilizando a função `listar_produtos`.
 
     Exemplo de uso:
-    - Se `lista_produtos` contiver os produtos:
+    - Se o estoque contiver os produtos:
     [
         {'codigo': '1', 'descricao': 'Produto A', 'quantidade': '5'},
         {'codigo': '2', 'descricao': 'Produto B', 'quantidade': '10'},
@@ -328,87 +364,108 @@ def filtrar_quantidade(qntd=7):
     quantidade: 3
     --------------------
     """
-    produtos_filtrados = [produto for produto in lista_produtos if int(produto['quantidade']) < qntd] # Filtra os produtos cuja quantidade é menor que o valor fornecido (padrão é 7)
-    listar_produtos(produtos_filtrados) # Chama a funcao de listar produtos passando aqueles que cumprem o requisito
+    with METRICAS.operacao('baixa'):
+        produtos_filtrados = catalogo.filtrar_quantidade(qntd) # Filtra os produtos cuja quantidade é menor que o valor fornecido (padrão é 7)
+        listar_produtos(produtos_filtrados) # Chama a funcao de listar produtos passando aqueles que cumprem o requisito
 
 def atualiza_quantidade():
     produto_escolhido = input("Digite o código do produto que deseja atualizar: ") # solicita ao usuário que digite o código do produto escolhido
-    for produto in lista_produtos:
-        if produto_escolhido == produto['codigo']: # verifica se o produto existe na lista
-            nova_quantidade = input("Digite a quantidade atualizada: ") # solicita a quantidade para atualizar
-            if int(nova_quantidade) < 0: # se for um número negativo, ele encerra a operaçao
-                print("Quantidade não permitida!")
-                return
-            else:    
-                produto['quantidade'] = nova_quantidade # se for um número válido, atualiza a quantidade na lista
-                print("Quantidade atualizada com sucesso!")
-                return
-    print('Produto não encontrado')
+    if not produto_escolhido.isdigit() or int(produto_escolhido) not in catalogo.estoque: # verifica se o produto existe no estoque
+        print(PRODUTO_NAO_ENCONTRADO)
+        return
+    nova_quantidade = int(input("Digite a quantidade atualizada: ")) # solicita a quantidade para atualizar
+    try:
+        catalogo.atualiza_quantidade(int(produto_escolhido), nova_quantidade) # se for um número válido, atualiza a quantidade no estoque
+    except ValueError as erro: # se for um número negativo, ele encerra a operaçao
+        print(erro)
+        return
+    print("Quantidade atualizada com sucesso!")
 
 def atualiza_preco():
     produto_escolhido = input("Digite o código do produto que deseja atualizar: ") # solicita ao usuário que digite o código do produto escolhido
-    for produto in lista_produtos:
-        if produto_escolhido == produto['codigo']: # verifica se o produto existe na lista
-            novo_preco = input("Digite o preço atualizado: ") # solicita o preço para atualizar
-            if float(novo_preco) < float(produto['custo_item']): # se for menor que o custo do item, a operaçao encerra
-                print("Novo preço é menor que o custo do item!")
-                return
-            else:    
-                produto['preco_venda'] = novo_preco # se for válido, ele atualiza o preço na lista
-                print("Preço atualizado com sucesso!")
-                return
-    print('Produto não encontrado') 
+    if not produto_escolhido.isdigit() or int(produto_escolhido) not in catalogo.estoque: # verifica se o produto existe no estoque
+        print(PRODUTO_NAO_ENCONTRADO)
+        return
+    novo_preco = para_centavos(input("Digite o preço atualizado: ")) # solicita o preço para atualizar, convertido para centavos
+    try:
+        catalogo.atualiza_preco(int(produto_escolhido), novo_preco) # se for válido, ele atualiza o preço no estoque
+    except ValueError as erro: # se for menor que o custo do item, a operaçao encerra
+        print(erro)
+        return
+    print("Preço atualizado com sucesso!")
 
 def valor_total():
-    valor_total = 0 # cria a variável para comportar o valor total
-
-    for produto in lista_produtos:
-        valor_total += int(produto['quantidade']) * float(produto['preco_venda']) # multiplica a quantidade pelo preço e soma na variável
-    print(f"O valor total do estoque é: R$ {valor_total:.2f}")   
+    valor_total = catalogo.valor_total() # soma de quantidade * preço mantida pelo estoque a cada alteração, em centavos
+    print(f"O valor total do estoque é: R$ {formatar_centavos(valor_total)}")   
 
 def lucro_presumido():
-    lucro_presumido = 0 # cria a variável para comportar o lucro presumido
+    lucro_presumido = catalogo.lucro_presumido() # diferença entre o valor total e o custo total mantidos pelo estoque, em centavos
+    print(f"O lucro total do estoque é R$ {formatar_centavos(lucro_presumido)}")
 
-    for produto in lista_produtos:
-        diferenca = float(produto['preco_venda']) - float(produto['custo_item']) # calcula a diferença do custo do item e o seu preço
-        lucro_presumido += diferenca * int(produto['quantidade']) # multiplica a diferença pela quantidade e soma no lucro presumido
+def relatorio_geral(saida=None, inicio=0, limite=None):
+    """
+    Exibe o relatório geral do estoque: uma linha por produto, com custo total e faturamento total do item,
+    seguida do total geral.
 
-    print(f"O lucro total do estoque é R$ {lucro_presumido:.2f}")
+    As linhas são produzidas por `linhas_relatorio` e gravadas em blocos grandes, então o relatório pode ser
+    enviado para um arquivo ou pipe com poucas escritas.
 
-def relatorio_geral():
-    # Cabeçalho do relatório
-    print(f"{'Descrição'.ljust(30)}{'Código'.rjust(10)}{'Quantidade'.rjust(15)}{'Custo'.rjust(10)}{'Preço Venda'.rjust(15)}{'Custo Total'.rjust(15)}{'Faturamento Total'.rjust(20)}")
-    print("="*120)  # Linha de separação
-    
-    custo_total_estoque = 0.0
-    faturamento_total_estoque = 0.0
-
-    # Exibe cada produto do estoque
-    for produto in lista_produtos:
-        descricao = produto['descricao'].ljust(30)
-        codigo = produto['codigo'].rjust(10)
-        quantidade = produto['quantidade'].rjust(15)
-        custo_item = produto['custo_item'].rjust(10)
-        preco_venda = produto['preco_venda'].rjust(15)
-        
-        # Calcula o custo total e faturamento total para o item
-        custo_total = float(produto['quantidade']) * float(produto['custo_item'])
-        faturamento_total = float(produto['quantidade']) * float(produto['preco_venda'])
-        
-        # Atualiza os totais do estoque
-        custo_total_estoque += custo_total
-        faturamento_total_estoque += faturamento_total
-        
-        # Formata os valores de custo total e faturamento total
-        custo_total_formatado = f"{custo_total:.2f}".rjust(15)
-        faturamento_total_formatado = f"{faturamento_total:.2f}".rjust(20)
-
-        # Imprime os dados formatados
-        print(f"{descricao}{codigo}{quantidade}{custo_item}{preco_venda}{custo_total_formatado}{faturamento_total_formatado}")
-
-    # Exibe o total geral do estoque
-    print("="*120)
-    print(f"{'TOTAL GERAL'.ljust(30)}{'':>10}{'':>15}{'':>10}{'':>15}{f'{custo_total_estoque:.2f}'.rjust(15)}{f'{faturamento_total_estoque:.2f}'.rjust(20)}")     
+    Parâmetros:
+    saida (objeto com `write`, opcional): Arquivo, pipe ou outro destino do texto. O padrão é o terminal.
+    inicio (int, opcional): Quantos produtos pular antes de começar a exibir. O padrão é 0.
+    limite (int, opcional): Quantidade máxima de produtos exibidos. O padrão (None) exibe todos.
+    """
+    with METRICAS.operacao('relatorio'):
+        linhas = catalogo.linhas_relatorio(inicio, limite) # linhas geradas pelo catálogo (ver `Catalogo.linhas_relatorio`)
+        if saida is None and tamanho_pagina:
+            # o motor paralelo entrega várias linhas por pedaço; para paginar, cada produto conta como um item
+            linhas = (linha for pedaco in linhas for linha in pedaco.splitlines(keepends=True))
+        exibir(linhas, saida, cabecalho=2, rodape=2) # cabeçalho e total geral ficam fora da contagem das páginas
+
+def importar_arquivo():
+    """
+    Solicita ao usuário o caminho de um arquivo de produtos e carrega os produtos no estoque.
+
+    O arquivo pode estar no mesmo formato de `estoque_inicial` (atributos separados por ';' e produtos por '#')
+    ou em CSV (arquivos terminados em .csv, uma linha por produto). A leitura é feita em blocos, então arquivos
+    grandes não precisam caber na memória. Registros mal formados ou com código repetido não interrompem a
+    carga: eles são contados e os primeiros são exibidos ao final.
+    """
+    caminho = input("Digite o caminho do arquivo de produtos: ").strip() # solicita o arquivo a ser importado
+    try:
+        resultado = catalogo.importar_arquivo(caminho)
+    except OSError as erro:
+        print(f"Não foi possível ler o arquivo: {erro}")
+        return
+    print(f"{resultado.carregados} produtos importados, {resultado.rejeitados} registros rejeitados.")
+    for erro in resultado.erros[:10]: # mostra apenas os primeiros erros
+        print(f"Registro {erro.posicao}: {erro.mensagem}")
+
+def exibir_metricas():
+    """
+    Exibe as métricas das operações (chamadas, erros, latência e linhas examinadas) e permite exportá-las
+    para um arquivo local, em JSON (arquivos terminados em .json) ou no formato de texto do Prometheus.
+
+    Se a coleta estiver desligada, a função pergunta se ela deve ser ligada; as operações feitas a partir
+    daí passam a ser medidas.
+    """
+    if not METRICAS.habilitado:
+        if input("A coleta de métricas está desligada. Digite 1 para ligá-la: ") == '1':
+            METRICAS.habilitado = True
+            print("Coleta de métricas ligada.")
+        return
+    if not METRICAS.instantaneo():
+        print("Nenhuma operação medida até agora.")
+        return
+    escrever(METRICAS.linhas_resumo())
+    caminho = input("Digite o arquivo para exportar (.json ou .prom) ou deixe em branco: ").strip()
+    if caminho:
+        try:
+            METRICAS.exportar(caminho)
+        except OSError as erro:
+            print(f"Não foi possível gravar o arquivo: {erro}")
+            return
+        print(f"Métricas exportadas para {caminho}.")
 
 def menu_interativo():
     # loop de repetiçao para exibir o menu constantemente
@@ -427,7 +484,10 @@ def menu_interativo():
         print("10. Calcular valor total do estoque")
         print("11. Calcular lucro presumido")
         print("12. Relatório geral do estoque")
-        print("13. Sair")
+        print("13. Definir tamanho da página das listagens")
+        print("14. Importar produtos de arquivo")
+        print("15. Métricas das operações")
+        print("16. Sair")
         print("-" * 20)
         escolha = int(input("Digite o número da opção desejada: ")) # guarda a opcao digitada pelo usuário
 
@@ -437,7 +497,9 @@ def menu_interativo():
             case 1:
                 usuario_cadastra_produto()
             case 2:
-                listar_produtos(lista_produtos)
+                with METRICAS.operacao('listar'):
+                    METRICAS.linhas(len(catalogo.estoque))
+                    listar_produtos(catalogo.produtos())
             case 3:
                 ordena_produtos()
             case 4:
@@ -464,7 +526,13 @@ def menu_interativo():
             case 12:
                 relatorio_geral()
             case 13:
-                break    
+                definir_tamanho_pagina()
+            case 14:
+                importar_arquivo()
+            case 15:
+                exibir_metricas()
+            case 16:
+                break
 
         # permite que o usuário saia ou volte ao menu após a operacao ser encerrada        
         escolha_2 = int(input("Digite 1 para voltar ao menu ou 2 para sair: "))
@@ -474,17 +542,66 @@ def menu_interativo():
 
 # estoque inicial com os produtos
 estoque_inicial = "Notebook Dell;201;15;3200.00;4500.00#Notebook Lenovo;202;10;2800.00;4200.00#Mouse Logitech;203;50;70.00;150.00#Mouse Razer;204;40;120.00;250.00#Monitor Samsung;205;10;800.00;1200.00#Monitor LG;206;8;750.00;1150.00#Teclado Mecânico Corsair;207;30;180.00;300.00#Teclado Mecânico Razer;208;25;200.00;350.00#Impressora HP;209;5;400.00;650.00#Impressora Epson;210;3;450.00;700.00#Monitor Dell;211;12;850.00;1250.00#Monitor AOC;212;7;700.00;1100.00"
-produtos = estoque_inicial.split('#') # separando pelo demarcador
 
-lista_produtos = [] # lista que irá comportar os produtos
+tamanho_pagina = 0 # itens por página nas listagens do terminal (0 exibe tudo de uma vez)
 
-chaves = ['descricao', 'codigo', 'quantidade', 'custo_item', 'preco_venda'] # as chaves que os produtos terão
+# catálogo usado pelo menu; o estoque só é montado (ou recuperado do disco, se ESTOQUE_DADOS indicar
+# um diretório) na primeira operação, então importar este módulo não carrega nada
+catalogo = Catalogo(texto=estoque_inicial, diretorio=os.environ.get('ESTOQUE_DADOS'))
 
-# cadastra os produtos na lista
-for produto in produtos:
-    cadastrar_produto(produto)
-
-menu_interativo()    
+def main(argv=None):
+    """
+    Ponto de entrada da linha de comando: abre o menu interativo ou, com as opções abaixo, executa
+    comandos em lote, atende pela rede ou envia comandos a um serviço.
+    """
+    # módulos usados só pela linha de comando, importados aqui para não pesar em quem importa este arquivo
+    import argparse
+    import asyncio
+
+    from comandos import executar_lote
+    from servidor import ServidorEstoque, encaminhar_lote, endereco
+
+    parser = argparse.ArgumentParser(description="Controle de estoque")
+    parser.add_argument('--lote', metavar='ARQUIVO',
+                        help="executa os comandos do arquivo (ou '-' para a entrada padrão) sem perguntas e escreve os resultados em JSON")
+    parser.add_argument('--servir', metavar='[HOST:]PORTA',
+                        help="atende comandos pela rede (TCP), compartilhando este estoque entre vários terminais")
+    parser.add_argument('--metricas', metavar='ARQUIVO',
+                        help="liga a coleta de métricas e grava-as no arquivo ao sair (.json ou formato Prometheus)")
+    parser.add_argument('--processos', metavar='N', type=int,
+                        help="divide o relatório geral e as buscas em catálogos grandes entre N processos")
+    parser.add_argument('--conectar', metavar='HOST:PORTA',
+                        help="envia os comandos de --lote (ou da entrada padrão) a um serviço iniciado com --servir")
+    argumentos = parser.parse_args(argv)
+    if argumentos.metricas:
+        METRICAS.habilitado = True
+    if argumentos.processos:
+        catalogo.processos = argumentos.processos
+
+    if argumentos.conectar is not None: # apenas envia comandos: o catálogo local nem é carregado
+        host, porta = endereco(argumentos.conectar)
+        if argumentos.lote in (None, '-'):
+            asyncio.run(encaminhar_lote(host, porta, sys.stdin))
+        else:
+            with open(argumentos.lote, encoding='utf-8') as arquivo_comandos:
+                asyncio.run(encaminhar_lote(host, porta, arquivo_comandos))
+    elif argumentos.servir is not None:
+        host, porta = endereco(argumentos.servir)
+        try:
+            asyncio.run(ServidorEstoque(catalogo.estoque, host, porta).servir())
+        except KeyboardInterrupt:
+            pass
+    elif argumentos.lote is None:
+        menu_interativo()
+    elif argumentos.lote == '-':
+        executar_lote(catalogo.estoque, sys.stdin)
+    else:
+        with open(argumentos.lote, encoding='utf-8') as arquivo_comandos:
+            executar_lote(catalogo.estoque, arquivo_comandos)
 
+    catalogo.fechar() # sincroniza o diário antes de sair, se o estoque for gravado em disco
+    if argumentos.metricas:
+        METRICAS.exportar(argumentos.metricas)
 
-          
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Medição de desempenho das operações do estoque em catálogos sintéticos.
+
+Para cada tamanho de catálogo, o programa gera os produtos (no mesmo formato de `estoque_inicial`, com
+uma semente fixa, para que toda execução meça exatamente o mesmo catálogo), carrega-os num estoque
+novo e cronometra as funções de `at.py` chamada a chamada:
+
+    cadastrar_produto, gerar_codigo_unico, buscar_produtos (por descrição e por código),
+    atualiza_quantidade, atualiza_preco, ordena_produtos, filtrar_quantidade,
+    exibir_produtos_esgotados, relatorio_geral e remover_produto
+
+As funções interativas recebem as respostas de um roteiro (no lugar de `input`) e a saída delas vai
+para /dev/null, então o tempo medido inclui a formatação do texto. De cada operação são registrados a
+vazão (chamadas por segundo), os percentis de latência e a memória de pico (alocações do Python numa
+chamada, medidas à parte com `tracemalloc`). Cada tamanho roda num processo próprio, para que a memória
+de pico do processo (RSS) também seja registrada.
+
+Os resultados podem ser gravados em JSON e usados como linha de base: com `--comparar`, as medidas
+atuais são comparadas com as da linha de base e as regressões acima da tolerância são listadas (e o
+programa termina com código 1).
+
+Exemplo de uso:
+python benchmark.py --tamanhos 1000 100000 1000000 --saida base.json
+python benchmark.py --tamanhos 1000 100000 1000000 --comparar base.json --tolerancia 0.25
+python benchmark.py --gerar catalogo.txt --tamanhos 10000000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError: # indisponível no Windows: a memória de pico do processo não é registrada
+    resource = None
+
+from estoque import SEPARADOR_PRODUTOS, formatar_centavos
+
+TAMANHOS = (1000, 10000, 100000)
+REPETICOES = 1000 # chamadas das operações pontuais (busca, cadastro, atualização, remoção)
+VARREDURAS = 5 # chamadas das operações que percorrem o catálogo inteiro
+TOLERANCIA = 0.2 # piora relativa aceita antes de apontar uma regressão
+PISOS = {'p50_us': 1.0, 'memoria_pico_bytes': 4096} # medidas comparadas e diferenças absolutas ignoradas
+
+TIPOS = ('Notebook', 'Mouse', 'Monitor', 'Teclado Mecânico', 'Impressora', 'Headset', 'Webcam', 'Roteador', 'SSD', 'Cabo HDMI')
+MARCAS = ('Dell', 'Lenovo', 'Logitech', 'Razer', 'Samsung', 'LG', 'Corsair', 'HP', 'Epson', 'AOC')
+
+def gerar_registros(quantidade, semente=0, primeiro_codigo=1):
+    """
+    Gera `quantidade` registros de produtos no formato 'descricao;codigo;quantidade;custo_item;preco_venda',
+    com códigos consecutivos a partir de `primeiro_codigo`. A mesma semente gera sempre os mesmos registros.
+
+    Cerca de 5% dos produtos são gerados esgotados, e o preço de venda nunca é menor que o custo.
+    """
+    aleatorio = random.Random(semente)
+    for codigo in range(primeiro_codigo, primeiro_codigo + quantidade):
+        descricao = f"{aleatorio.choice(TIPOS)} {aleatorio.choice(MARCAS)} {aleatorio.randrange(10000)}"
+        estoque_item = 0 if aleatorio.random() < 0.05 else aleatorio.randrange(1, 200)
+        custo = aleatorio.randrange(500, 500000) # em centavos
+        preco = custo + aleatorio.randrange(custo + 1)
+        yield f"{descricao};{codigo};{estoque_item};{formatar_centavos(custo)};{formatar_centavos(preco)}"
+
+def gerar_catalogo(quantidade, semente=0):
+    """
+    Retorna um catálogo sintético como texto, no mesmo formato de `estoque_inicial`.
+    """
+    return SEPARADOR_PRODUTOS.join(gerar_registros(quantidade, semente))
+
+def gravar_catalogo(caminho, quantidade, semente=0):
+    """
+    Grava um catálogo sintético num arquivo (no formato 'registros' de `carregador.carregar_arquivo`),
+    sem montá-lo inteiro na memória.
+    """
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        for numero, registro in enumerate(gerar_registros(quantidade, semente)):
+            arquivo.write(registro if numero == 0 else SEPARADOR_PRODUTOS + '\n' + registro)
+
+class _Roteiro:
+    """
+    Substitui `input` nas funções interativas, devolvendo as respostas preparadas em ordem.
+    """
+
+    def __init__(self):
+        self.respostas = deque()
+
+    def __call__(self, mensagem=''):
+        return self.respostas.popleft()
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+def _medir(chamadas, produtos=None):
+    """
+    Executa as chamadas (funções sem argumentos): a primeira sob `tracemalloc`, para medir a memória de
+    pico, e as demais cronometradas uma a uma.
+    """
+    tracemalloc.start()
+    chamadas[0]()
+    memoria_pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    relogio = time.perf_counter_ns
+    tempos = []
+    for chamada in chamadas[1:]:
+        inicio = relogio()
+        chamada()
+        tempos.append(relogio() - inicio)
+    tempos.sort()
+    total = sum(tempos) / 1e9
+    medida = {
+        'chamadas': len(tempos),
+        'total_s': round(total, 6),
+        'por_segundo': round(len(tempos) / total, 1) if total else None,
+        'p50_us': round(_percentil(tempos, 50) / 1000, 2),
+        'p90_us': round(_percentil(tempos, 90) / 1000, 2),
+        'p99_us': round(_percentil(tempos, 99) / 1000, 2),
+        'max_us': round(tempos[-1] / 1000, 2),
+        'memoria_pico_bytes': memoria_pico,
+    }
+    if produtos is not None and total: # operações que percorrem o catálogo: vazão em produtos por segundo
+        medida['produtos_por_segundo'] = round(produtos * len(tempos) / total, 1)
+    return medida
+
+def medir_tamanho(tamanho, repeticoes=REPETICOES, varreduras=VARREDURAS, semente=0):
+    """
+    Gera um catálogo de `tamanho` produtos, carrega-o e mede todas as operações.
+
+    Retorna:
+    dict: {'carga': medida, 'operacoes': {nome: medida}, 'memoria_pico_processo_bytes': int ou None}
+    """
+    import at
+    from carregador import carregar_registros
+    from catalogo import Catalogo
+
+    at.catalogo = Catalogo() # catálogo vazio e só em memória: nunca usa o estoque em disco do usuário
+    estoque = at.catalogo.estoque
+    at.tamanho_pagina = 0
+    roteiro = at.input = _Roteiro()
+    aleatorio = random.Random(semente + 1)
+    operacoes = {}
+    try:
+        inicio = time.perf_counter()
+        carregar_registros(estoque, enumerate(gerar_registros(tamanho, semente), 1))
+        duracao = time.perf_counter() - inicio
+        carga = {'total_s': round(duracao, 6), 'produtos_por_segundo': round(tamanho / duracao, 1)}
+
+        with open(os.devnull, 'w', encoding='utf-8') as descarte, redirect_stdout(descarte):
+            n = repeticoes + 1 # a primeira chamada de cada operação mede a memória
+            codigos = [aleatorio.randrange(1, tamanho + 1) for _ in range(n)]
+
+            operacoes['gerar_codigo_unico'] = _medir([at.gerar_codigo_unico] * n)
+
+            novos = gerar_registros(n, semente + 2, primeiro_codigo=estoque.alocador.proximo)
+            operacoes['cadastrar_produto'] = _medir([partial(at.cadastrar_produto, registro) for registro in novos])
+
+            termos = [' '.join(estoque.descricoes[estoque.localizar(codigo)].split()[-2:]) for codigo in codigos]
+            operacoes['buscar_produtos[descricao]'] = _medir([partial(at.buscar_produtos, descricao=termo) for termo in termos])
+            operacoes['buscar_produtos[codigo]'] = _medir([partial(at.buscar_produtos, codigo=str(codigo)) for codigo in codigos])
+
+            for codigo in codigos:
+                roteiro.respostas.extend((str(codigo), str(aleatorio.randrange(200))))
+            operacoes['atualiza_quantidade'] = _medir([at.atualiza_quantidade] * n)
+
+            for codigo in codigos:
+                custo = estoque.custos[estoque.localizar(codigo)]
+                roteiro.respostas.extend((str(codigo), formatar_centavos(custo + aleatorio.randrange(10000))))
+            operacoes['atualiza_preco'] = _medir([at.atualiza_preco] * n)
+
+            v = varreduras + 1
+            roteiro.respostas.extend('1' if numero % 2 else '2' for numero in range(v))
+            operacoes['ordena_produtos'] = _medir([at.ordena_produtos] * v, len(estoque))
+            operacoes['filtrar_quantidade'] = _medir([at.filtrar_quantidade] * v, len(estoque))
+            operacoes['exibir_produtos_esgotados'] = _medir([at.exibir_produtos_esgotados] * v, len(estoque))
+            operacoes['relatorio_geral'] = _medir([partial(at.relatorio_geral, descarte)] * v, len(estoque))
+
+            removidos = aleatorio.sample(range(1, tamanho + 1), min(n, tamanho))
+            roteiro.respostas.extend(map(str, removidos))
+            operacoes['remover_produto'] = _medir([at.remover_produto] * len(removidos))
+    finally:
+        del at.input
+
+    memoria_processo = None
+    if resource is not None: # ru_maxrss é dado em KiB no Linux e em bytes no macOS
+        memoria_processo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return {'carga': carga, 'operacoes': operacoes, 'memoria_pico_processo_bytes': memoria_processo}
+
+def executar(tamanhos=TAMANHOS, repeticoes=REPETICOES, varreduras=VARREDURAS, semente=0):
+    """
+    Mede todos os tamanhos, cada um num processo novo.
+
+    Retorna:
+    dict: O relatório completo, pronto para ser gravado em JSON.
+    """
+    resultados = {}
+    for tamanho in tamanhos:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            resultados[str(tamanho)] = pool.submit(medir_tamanho, tamanho, repeticoes, varreduras, semente).result()
+    return {
+        'versao': 1,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'semente': semente,
+        'repeticoes': repeticoes,
+        'varreduras': varreduras,
+        'resultados': resultados,
+    }
+
+def comparar(atual, base, tolerancia=TOLERANCIA):
+    """
+    Compara dois relatórios e lista as medidas que pioraram mais que a tolerância (latência mediana e
+    memória de pico de cada operação, para os tamanhos presentes nos dois relatórios). O p99 não é
+    comparado: com poucas chamadas ele é praticamente o máximo e varia demais de uma execução para outra.
+
+    Retorna:
+    list: Tuplas (tamanho, operação, medida, valor na base, valor atual).
+    """
+    regressoes = []
+    for tamanho, dados in atual['resultados'].items():
+        dados_base = base['resultados'].get(tamanho)
+        if dados_base is None:
+            continue
+        for nome, medida in dados['operacoes'].items():
+            medida_base = dados_base['operacoes'].get(nome)
+            if medida_base is None:
+                continue
+            for campo, piso in PISOS.items():
+                anterior, valor = medida_base[campo], medida[campo]
+                if valor > anterior * (1 + tolerancia) and valor - anterior > piso:
+                    regressoes.append((tamanho, nome, campo, anterior, valor))
+    return regressoes
+
+def resumo(relatorio):
+    """
+    Gera as linhas de uma tabela com as principais medidas de cada tamanho.
+    """
+    for tamanho, dados in relatorio['resultados'].items():
+        memoria = dados['memoria_pico_processo_bytes']
+        yield f"\n{int(tamanho):,} produtos (carga: {dados['carga']['produtos_por_segundo']:,.0f} produtos/s" + \
+              (f", memória de pico: {memoria / 2**20:,.1f} MiB)\n" if memoria else ")\n")
+        yield f"{'Operação'.ljust(28)}{'chamadas/s'.rjust(14)}{'p50 (µs)'.rjust(12)}{'p90 (µs)'.rjust(12)}{'p99 (µs)'.rjust(12)}{'memória (KiB)'.rjust(15)}\n"
+        for nome, medida in dados['operacoes'].items():
+            yield (f"{nome:<28}{medida['por_segundo'] or 0:>14,.1f}{medida['p50_us']:>12,.1f}{medida['p90_us']:>12,.1f}"
+                   f"{medida['p99_us']:>12,.1f}{medida['memoria_pico_bytes'] / 1024:>15,.1f}\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark das operações do estoque")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS), metavar='N',
+                        help="tamanhos dos catálogos gerados (ex.: 1000 100000 10000000)")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES, help="chamadas das operações pontuais")
+    parser.add_argument('--varreduras', type=int, default=VARREDURAS, help="chamadas das operações que percorrem o catálogo")
+    parser.add_argument('--semente', type=int, default=0, help="semente do gerador de catálogos")
+    parser.add_argument('--saida', metavar='ARQUIVO', help="grava os resultados em JSON (linha de base)")
+    parser.add_argument('--comparar', metavar='ARQUIVO', help="compara com uma linha de base gravada com --saida")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA, help="piora relativa aceita (0.2 = 20%%)")
+    parser.add_argument('--gerar', metavar='ARQUIVO', help="apenas grava um catálogo sintético do primeiro tamanho")
+    argumentos = parser.parse_args()
+
+    if argumentos.gerar:
+        gravar_catalogo(argumentos.gerar, argumentos.tamanhos[0], argumentos.semente)
+        sys.exit(0)
+
+    relatorio = executar(argumentos.tamanhos, argumentos.repeticoes, argumentos.varreduras, argumentos.semente)
+    sys.stdout.writelines(resumo(relatorio))
+    if argumentos.saida:
+        with open(argumentos.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(relatorio, json.load(arquivo), argumentos.tolerancia)
+        for tamanho, nome, campo, anterior, valor in regressoes:
+            print(f"REGRESSÃO {int(tamanho):,} produtos, {nome}, {campo}: {anterior} -> {valor}")
+        if regressoes:
+            sys.exit(1)
+        print("\nNenhuma regressão acima da tolerância.")
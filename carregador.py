@@ -0,0 +1,276 @@
+"""
+Carga em massa de produtos a partir de arquivos.
+
+Aceita dois formatos:
+
+- 'registros': o mesmo formato de `estoque_inicial`, com os atributos separados por ';' e os produtos
+  separados por '#' (quebras de linha entre os registros são ignoradas);
+- 'csv': uma linha por produto, com as colunas na ordem de `CHAVES` separadas por ';' (ou por outro
+  delimitador informado). Uma primeira linha de cabeçalho com os nomes das colunas é ignorada.
+
+O arquivo é lido em blocos (ou mapeado em memória, com `usar_mmap=True`), então arquivos de qualquer
+tamanho são carregados com memória limitada. Os produtos válidos são inseridos no estoque em lotes
+(`Estoque.adicionar_lote`), e os registros com problema são contados e relatados sem interromper a
+carga. Com `processos` maior que 1, a conversão dos lotes é feita em paralelo por um pool de processos,
+mantendo a ordem do arquivo.
+
+Exemplo de uso:
+resultado = carregar_arquivo(estoque, 'fornecedor.txt', processos=4)
+print(resultado.carregados, resultado.rejeitados)
+for erro in resultado.erros:
+    print(erro.posicao, erro.mensagem)
+"""
+import codecs
+import csv
+import io
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+from estoque import CHAVES, SEPARADOR_ATRIBUTOS, SEPARADOR_PRODUTOS, formatar_centavos, interpretar_atributos
+
+FORMATOS = ('registros', 'csv')
+TAMANHO_BLOCO = 1 << 20 # bytes lidos do arquivo por vez
+TAMANHO_LOTE = 10000 # produtos convertidos e inseridos por vez
+MAX_ERROS = 1000 # erros guardados no resultado (os demais só são contados)
+BYTES_INVALIDOS = re.compile('[\udc80-\udcff]') # bytes que não puderam ser decodificados (ver `_blocos_texto`)
+
+class ErroCarga:
+    """
+    Um registro rejeitado durante a carga.
+
+    Atributos:
+    posicao (int): Posição do registro no arquivo (número do registro no formato 'registros' ou
+                   número da linha no formato 'csv'), começando em 1.
+    registro (str): O texto do registro rejeitado.
+    mensagem (str): O motivo da rejeição.
+    """
+
+    def __init__(self, posicao, registro, mensagem):
+        self.posicao = posicao
+        self.registro = registro
+        self.mensagem = mensagem
+
+    def __repr__(self):
+        return f"ErroCarga({self.posicao}, {self.registro!r}, {self.mensagem!r})"
+
+class ResultadoCarga:
+    """
+    Resumo de uma carga: quantos produtos foram carregados, quantos foram rejeitados e os primeiros
+    erros encontrados (até `MAX_ERROS`).
+    """
+
+    def __init__(self, max_erros=MAX_ERROS):
+        self.carregados = 0
+        self.rejeitados = 0
+        self.erros = []
+        self._max_erros = max_erros
+
+    def rejeitar(self, posicao, registro, mensagem):
+        self.rejeitados += 1
+        if len(self.erros) < self._max_erros:
+            self.erros.append(ErroCarga(posicao, registro, mensagem))
+
+    def __repr__(self):
+        return f"ResultadoCarga(carregados={self.carregados}, rejeitados={self.rejeitados})"
+
+def _blocos_texto(caminho, tamanho_bloco, usar_mmap, encoding):
+    """
+    Gera o conteúdo do arquivo em blocos de texto, decodificando de forma incremental para não
+    quebrar caracteres de vários bytes na fronteira entre blocos. Bytes inválidos para a codificação
+    não interrompem a leitura: viram caracteres substitutos ('surrogateescape'), e o registro que os
+    contém é rejeitado em `_interpretar_lote`.
+    """
+    decodificador = codecs.getincrementaldecoder(encoding)('surrogateescape')
+    with open(caminho, 'rb') as arquivo:
+        if usar_mmap and os.fstat(arquivo.fileno()).st_size > 0:
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                for inicio in range(0, len(mapa), tamanho_bloco):
+                    yield decodificador.decode(mapa[inicio:inicio + tamanho_bloco])
+        else:
+            while True:
+                bloco = arquivo.read(tamanho_bloco)
+                if not bloco:
+                    break
+                yield decodificador.decode(bloco)
+    resto = decodificador.decode(b'', final=True)
+    if resto:
+        yield resto
+
+def _registros(blocos, separador=SEPARADOR_PRODUTOS):
+    """
+    Separa os blocos de texto em registros numerados (posição, texto), emendando o registro que ficou
+    partido entre dois blocos. Espaços e quebras de linha nas pontas são removidos e registros vazios
+    são ignorados.
+    """
+    posicao = 0
+    pendente = ''
+    for bloco in blocos:
+        partes = (pendente + bloco).split(separador)
+        pendente = partes.pop() # o último pedaço pode continuar no próximo bloco
+        for parte in partes:
+            parte = parte.strip()
+            if parte:
+                posicao += 1
+                yield posicao, parte
+    pendente = pendente.strip()
+    if pendente:
+        yield posicao + 1, pendente
+
+def _linhas_csv(blocos, delimitador):
+    """
+    Gera as linhas de um CSV como (número da linha, campos), ignorando linhas vazias e o cabeçalho.
+    """
+    leitor = csv.reader(_linhas(blocos), delimiter=delimitador)
+    for campos in leitor:
+        if not campos or (leitor.line_num == 1 and tuple(campo.strip() for campo in campos) == CHAVES):
+            continue
+        yield leitor.line_num, campos
+
+def _linhas(blocos):
+    """
+    Gera as linhas (com a quebra de linha) de uma sequência de blocos de texto. Como num arquivo aberto
+    com newline='', só '\n', '\r\n' e '\r' terminam linhas; outros separadores de linha do Unicode
+    ('\x85', '\u2028', ...) continuam dentro dos campos.
+    """
+    pendente = ''
+    for bloco in blocos:
+        linhas = io.StringIO(pendente + bloco, newline='').readlines()
+        # a última linha fica pendente se não terminou ou se termina num '\r' que pode ser o começo de
+        # um '\r\n' partido entre dois blocos
+        pendente = linhas.pop() if linhas and not linhas[-1].endswith('\n') else ''
+        yield from linhas
+    if pendente:
+        yield pendente
+
+def _interpretar_lote(lote):
+    """
+    Converte um lote de (posição, atributos) em produtos tipados.
+
+    Roda tanto no processo principal quanto nos processos do pool, por isso recebe e retorna apenas
+    tipos simples.
+
+    Retorna:
+    tuple: (produtos, posições dos produtos, erros como (posição, registro, mensagem))
+    """
+    produtos, posicoes, erros = [], [], []
+    for posicao, atributos in lote:
+        registro = atributos if isinstance(atributos, str) else SEPARADOR_ATRIBUTOS.join(atributos)
+        if BYTES_INVALIDOS.search(registro):
+            erros.append((posicao, BYTES_INVALIDOS.sub('\ufffd', registro), "bytes inválidos para a codificação do arquivo"))
+            continue
+        try:
+            if isinstance(atributos, str):
+                atributos = atributos.split(SEPARADOR_ATRIBUTOS)
+            produtos.append(interpretar_atributos(atributos)) # também confere se os números cabem nas colunas
+            posicoes.append(posicao)
+        except ValueError as erro:
+            erros.append((posicao, registro, str(erro)))
+    return produtos, posicoes, erros
+
+def _lotes(itens, tamanho):
+    itens = iter(itens)
+    while True:
+        lote = list(islice(itens, tamanho))
+        if not lote:
+            return
+        yield lote
+
+def _lotes_interpretados(lotes, processos):
+    """
+    Converte os lotes, em ordem, no próprio processo ou num pool com no máximo `2 * processos`
+    lotes em andamento (para não ler o arquivo inteiro antes de inserir). Os processos do pool são
+    iniciados com 'spawn', como em `paralelo`: um 'fork' copiaria o estado do processo principal
+    (inclusive travas de outras threads, como as do servidor) no meio da carga.
+    """
+    if processos <= 1:
+        yield from map(_interpretar_lote, lotes)
+        return
+    with ProcessPoolExecutor(max_workers=processos, mp_context=get_context('spawn')) as pool:
+        pendentes = deque()
+        for lote in lotes:
+            pendentes.append(pool.submit(_interpretar_lote, lote))
+            if len(pendentes) >= 2 * processos:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+def _registro_texto(produto):
+    descricao, codigo, quantidade, custo, preco = produto
+    return SEPARADOR_ATRIBUTOS.join((descricao, str(codigo), str(quantidade), formatar_centavos(custo), formatar_centavos(preco)))
+
+def carregar_registros(estoque, registros, tamanho_lote=TAMANHO_LOTE, processos=1, max_erros=MAX_ERROS):
+    """
+    Carrega no estoque uma sequência de registros (posição, atributos), onde os atributos são o texto
+    'descricao;codigo;quantidade;custo_item;preco_venda' ou a lista de campos já separada.
+
+    Registros mal formados (inclusive com números que não cabem nas colunas ou com bytes inválidos para
+    a codificação) e códigos repetidos são rejeitados e relatados no resultado; o restante do lote é
+    carregado normalmente.
+
+    Retorna:
+    ResultadoCarga
+    """
+    resultado = ResultadoCarga(max_erros)
+    for produtos, posicoes, erros in _lotes_interpretados(_lotes(registros, tamanho_lote), processos):
+        for erro in erros:
+            resultado.rejeitar(*erro)
+
+        # descarta códigos que já existem no estoque ou que se repetem dentro do lote
+        validos = []
+        vistos = set()
+        for produto, posicao in zip(produtos, posicoes):
+            codigo = produto[1]
+            if codigo < 0 or codigo in estoque or codigo in vistos:
+                resultado.rejeitar(posicao, _registro_texto(produto), f"código inválido ou já cadastrado: {codigo}")
+                continue
+            vistos.add(codigo)
+            validos.append(produto)
+
+        estoque.adicionar_lote(validos)
+        resultado.carregados += len(validos)
+    return resultado
+
+def carregar_texto(estoque, texto, **opcoes):
+    """
+    Carrega no estoque os produtos de um texto no formato 'registros' (como `estoque_inicial`).
+    Aceita as mesmas opções de `carregar_registros`.
+    """
+    return carregar_registros(estoque, _registros([texto]), **opcoes)
+
+def carregar_arquivo(estoque, caminho, formato=None, delimitador=SEPARADOR_ATRIBUTOS, tamanho_bloco=TAMANHO_BLOCO,
+                     usar_mmap=False, encoding='utf-8', **opcoes):
+    """
+    Carrega no estoque os produtos de um arquivo, lendo-o em blocos.
+
+    Parâmetros:
+    estoque (Estoque): O estoque que receberá os produtos.
+    caminho (str): O caminho do arquivo.
+    formato (str, opcional): 'registros' ou 'csv'. O padrão é 'csv' para arquivos terminados em .csv
+                             e 'registros' para os demais.
+    delimitador (str, opcional): Separador das colunas no formato 'csv'. O padrão é ';'.
+    tamanho_bloco (int, opcional): Quantidade de bytes lidos por vez.
+    usar_mmap (bool, opcional): Se True, mapeia o arquivo em memória em vez de lê-lo com `read`.
+    encoding (str, opcional): Codificação do arquivo. O padrão é 'utf-8'.
+    tamanho_lote, processos, max_erros: Repassados para `carregar_registros`.
+
+    Retorna:
+    ResultadoCarga
+
+    Levanta:
+    ValueError: Se o formato não for reconhecido.
+    """
+    if formato is None:
+        formato = 'csv' if caminho.lower().endswith('.csv') else 'registros'
+    if formato not in FORMATOS:
+        raise ValueError(f"formato inválido: {formato!r} (use {' ou '.join(FORMATOS)})")
+    blocos = _blocos_texto(caminho, tamanho_bloco, usar_mmap, encoding)
+    if formato == 'csv':
+        registros = _linhas_csv(blocos, delimitador)
+    else:
+        registros = _registros(blocos)
+    return carregar_registros(estoque, registros, **opcoes)
@@ -0,0 +1,323 @@
+"""
+API do controle de estoque para uso como biblioteca, sem o menu interativo.
+
+Um `Catalogo` reúne um estoque e a sua origem (o texto inicial, um arquivo de produtos e/ou um
+diretório de persistência) e oferece as mesmas operações do menu de `at.py`, só que retornando os
+resultados em vez de exibi-los. Importar este módulo ou criar um catálogo não lê nada: o estoque só
+é montado na primeira operação (ou ao chamar `carregar`). Os módulos de carga, persistência e análise
+também só são importados quando são usados pela primeira vez, para que processos curtos não paguem
+por eles.
+
+Cada catálogo é independente, então um mesmo processo pode manter vários.
+
+Exemplo de uso:
+from catalogo import Catalogo
+
+loja = Catalogo(texto="Mouse Logitech;203;50;70.00;150.00#Mouse Razer;204;40;120.00;250.00")
+deposito = Catalogo(diretorio='dados/deposito')
+
+loja.buscar_produtos(descricao='mouse') -> [{'descricao': 'Mouse Logitech', 'codigo': '203', ...}, ...]
+loja.atualiza_quantidade(203, 45)
+loja.consultar('preco>=200.00 ou descricao~logitech', ordem='-quantidade', limite=10)
+formatar_centavos(loja.valor_total()) -> '16750.00'
+deposito.fechar()
+"""
+import threading
+from bisect import bisect_left
+
+from estoque import Estoque, formatar_centavos
+from metricas import METRICAS
+
+MINIMO_PARALELO = 200000 # abaixo disso, distribuir o trabalho entre processos custa mais do que economiza
+
+def linha_relatorio(descricao, codigo, quantidade, custo, preco, custo_total, faturamento_total):
+    """
+    Formata a linha de um produto no relatório geral (valores em centavos), com a quebra de linha.
+    """
+    return (f"{descricao:<30}{codigo:>10}{quantidade:>15}{formatar_centavos(custo):>10}"
+            f"{formatar_centavos(preco):>15}{formatar_centavos(custo_total):>15}{formatar_centavos(faturamento_total):>20}\n")
+
+class Catalogo:
+    """
+    Um estoque com carga sob demanda.
+
+    Parâmetros:
+    texto (str, opcional): Produtos iniciais no formato de `estoque_inicial`.
+    arquivo (str, opcional): Arquivo de produtos ('registros' ou CSV) carregado junto com o texto.
+    diretorio (str, opcional): Diretório onde o estoque é gravado (ver `persistencia.py`). Se ele já
+                               tiver dados, o estoque é recuperado dali e o texto e o arquivo são
+                               ignorados; senão, eles são carregados e passam a ser gravados ali.
+    processos (int, opcional): Com 2 ou mais, o relatório geral e as buscas por descrição que
+                               percorreriam boa parte do catálogo são divididos entre esse número de
+                               processos (ver `paralelo.py`), a partir de `MINIMO_PARALELO` produtos.
+    **opcoes_estoque: Repassadas para o `Estoque` (sem_acentos, verificar).
+    """
+
+    def __init__(self, texto=None, arquivo=None, diretorio=None, processos=None, **opcoes_estoque):
+        self.texto = texto
+        self.arquivo = arquivo
+        self.diretorio = diretorio
+        self.processos = processos
+        self.opcoes_estoque = opcoes_estoque
+        self.armazenamento = None
+        self._estoque = None
+        self._paralelo = None # MotorParalelo, criado na primeira operação que compensa dividir
+        self._trava = threading.Lock() # evita que duas threads carreguem o mesmo catálogo ao mesmo tempo
+
+    @property
+    def estoque(self):
+        """
+        O `Estoque` do catálogo, montado no primeiro acesso.
+        """
+        estoque = self._estoque
+        if estoque is None:
+            with self._trava:
+                if self._estoque is None:
+                    self._estoque = self._carregar()
+                estoque = self._estoque
+        return estoque
+
+    @property
+    def carregado(self):
+        return self._estoque is not None
+
+    def carregar(self):
+        """
+        Monta o estoque agora, em vez de esperar a primeira operação. Retorna o `Estoque`.
+        """
+        return self.estoque
+
+    def _carregar(self):
+        novo = True
+        if self.diretorio is not None:
+            from persistencia import ArmazenamentoEstoque
+            self.armazenamento = ArmazenamentoEstoque(self.diretorio, **self.opcoes_estoque)
+            estoque = self.armazenamento.abrir() # recupera o último instantâneo mais o diário de alterações
+            novo = self.armazenamento.novo
+        else:
+            estoque = Estoque(**self.opcoes_estoque)
+        if novo and (self.texto or self.arquivo):
+            from carregador import carregar_arquivo, carregar_texto
+            if self.texto:
+                carregar_texto(estoque, self.texto)
+            if self.arquivo:
+                carregar_arquivo(estoque, self.arquivo)
+        return estoque
+
+    def fechar(self):
+        """
+        Sincroniza e fecha a persistência, se houver, e descarta o estoque da memória. Um novo acesso
+        ao catálogo o carrega de novo.
+        """
+        with self._trava:
+            if self._paralelo is not None:
+                self._paralelo.fechar()
+                self._paralelo = None
+            if self.armazenamento is not None:
+                self.armazenamento.fechar()
+                self.armazenamento = None
+            self._estoque = None
+
+    def _motor_paralelo(self):
+        """
+        Retorna o `MotorParalelo` do catálogo, ou None se ele não estiver habilitado ou se o catálogo for
+        pequeno demais para compensar.
+        """
+        estoque = self.estoque
+        if not self.processos or self.processos < 2 or len(estoque) < MINIMO_PARALELO:
+            return None
+        if self._paralelo is None:
+            from paralelo import MotorParalelo
+            self._paralelo = MotorParalelo(estoque, self.processos)
+        return self._paralelo
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        self.fechar()
+
+    def alertas(self, limite=None, intervalo=0):
+        """
+        Começa a acompanhar as situações de estoque baixo e esgotado do catálogo (ver `alertas.py`).
+        Retorna o `Alertas`, onde as funções de aviso são assinadas. Ele deixa de valer se o catálogo
+        for fechado.
+
+        Exemplo de uso:
+        catalogo.alertas(limite=10).assinar(repor)
+        """
+        from alertas import LIMITE_PADRAO, Alertas
+        return Alertas(self.estoque, LIMITE_PADRAO if limite is None else limite, intervalo)
+
+    # alterações
+
+    def cadastrar_produto(self, produto):
+        """
+        Cadastra um produto a partir do texto 'descricao;codigo;quantidade;custo_item;preco_venda'.
+
+        Levanta:
+        ValueError: Se o registro for inválido ou o código já existir.
+        """
+        with METRICAS.operacao('cadastrar'):
+            self.estoque.cadastrar(produto)
+
+    def gerar_codigo_unico(self):
+        """
+        Retorna um código que ainda não foi usado por nenhum produto.
+        """
+        return self.estoque.alocador.novo()
+
+    def remover_produto(self, codigo):
+        """
+        Remove o produto com o código informado. Retorna False se ele não existir.
+        """
+        with METRICAS.operacao('remover'):
+            return self.estoque.remover(codigo)
+
+    def atualiza_quantidade(self, codigo, quantidade):
+        """
+        Define a quantidade em estoque de um produto.
+
+        Levanta:
+        ValueError: Se o produto não existir ou a quantidade for negativa.
+        """
+        with METRICAS.operacao('quantidade'):
+            self.estoque.definir_quantidade(codigo, quantidade)
+
+    def atualiza_preco(self, codigo, preco):
+        """
+        Define o preço de venda (em centavos) de um produto.
+
+        Levanta:
+        ValueError: Se o produto não existir ou o preço for menor que o custo do item.
+        """
+        with METRICAS.operacao('preco'):
+            self.estoque.definir_preco(codigo, preco)
+
+    def importar_arquivo(self, caminho, **opcoes):
+        """
+        Carrega os produtos de um arquivo (ver `carregador.carregar_arquivo`). Retorna o `ResultadoCarga`.
+        """
+        from carregador import carregar_arquivo
+        with METRICAS.operacao('importar'):
+            return carregar_arquivo(self.estoque, caminho, **opcoes)
+
+    # consultas
+
+    def produtos(self):
+        """
+        Gera todos os produtos (dicionários), na ordem de cadastro.
+        """
+        return self.estoque.produtos()
+
+    def buscar_produtos(self, descricao='', codigo=''):
+        """
+        Busca produtos cuja descrição contém `descricao` (sem diferenciar maiúsculas de minúsculas) ou
+        cujo código é igual a `codigo`. Retorna a lista de produtos (dicionários) na ordem de cadastro.
+        """
+        with METRICAS.operacao('buscar'):
+            estoque = self.estoque
+            resultados = self._buscar_descricao(descricao) if descricao else []
+            codigo = str(codigo)
+            slot = estoque.localizar(int(codigo)) if codigo.isdigit() else None
+            if slot is not None:
+                posicao = bisect_left(resultados, slot) # mantém os resultados na ordem de cadastro
+                if posicao == len(resultados) or resultados[posicao] != slot:
+                    resultados.insert(posicao, slot)
+            return list(estoque.produtos(resultados))
+
+    def _buscar_descricao(self, descricao):
+        estoque = self.estoque
+        motor = self._motor_paralelo()
+        # uma linha varrida custa cerca de metade de um candidato do índice de trigramas; a varredura
+        # dividida entre os processos compensa quando o índice teria muitos candidatos
+        if motor is not None and 2 * estoque.indice_descricoes.estimar(descricao) * motor.processos > len(estoque):
+            return motor.buscar(descricao)
+        return estoque.buscar_descricao(descricao)
+
+    def ordena_produtos(self, decrescente=False):
+        """
+        Gera os produtos ordenados por quantidade (empates na ordem de cadastro).
+        """
+        return self.estoque.produtos(self.estoque.ordenar_por_quantidade(decrescente=decrescente))
+
+    def produtos_esgotados(self):
+        """
+        Gera os produtos com quantidade igual a zero, na ordem de cadastro.
+        """
+        return self.estoque.produtos(self.estoque.esgotados())
+
+    def filtrar_quantidade(self, qntd=7):
+        """
+        Gera os produtos com quantidade menor que `qntd`, na ordem de cadastro.
+        """
+        return self.estoque.produtos(self.estoque.quantidade_menor_que(qntd))
+
+    def consultar(self, onde=None, ordem=None, limite=None):
+        """
+        Executa uma consulta composta (ver `consultas.py`) e retorna a lista de produtos (dicionários).
+
+        Parâmetros:
+        onde (Predicado ou str, opcional): O filtro, montado com os predicados de `consultas` ou escrito
+                                           em texto (ex.: 'quantidade<7 margem>30% ordem=-valor limite=50').
+        ordem (str, opcional): Campo de ordenação, com '-' na frente para ordem decrescente.
+        limite (int, opcional): Quantidade máxima de produtos.
+
+        Levanta:
+        ValueError: Se a consulta ou a ordem forem inválidas.
+        """
+        from consultas import consultar, interpretar_consulta
+        if isinstance(onde, str):
+            onde, ordem_texto, limite_texto = interpretar_consulta(onde)
+            ordem = ordem if ordem is not None else ordem_texto
+            limite = limite if limite is not None else limite_texto
+        with METRICAS.operacao('consultar'):
+            return list(self.estoque.produtos(consultar(self.estoque, onde, ordem, limite)))
+
+    def valor_total(self):
+        """
+        Retorna o valor total do estoque (soma de quantidade * preço de venda), em centavos.
+        """
+        return self.estoque.valor_total
+
+    def lucro_presumido(self):
+        """
+        Retorna o lucro presumido do estoque (valor total menos custo total), em centavos.
+        """
+        return self.estoque.lucro_presumido
+
+    def linhas_relatorio(self, inicio=0, limite=None):
+        """
+        Gera as linhas de texto do relatório geral (cabeçalho, produtos e total geral), cada uma terminada em quebra de linha.
+        O total geral sempre se refere ao estoque inteiro, mesmo quando apenas uma parte dos produtos é exibida.
+        """
+        from analitico import motor_analitico
+        from renderizacao import paginar
+
+        estoque = self.estoque
+
+        # Cabeçalho do relatório
+        yield f"{'Descrição'.ljust(30)}{'Código'.rjust(10)}{'Quantidade'.rjust(15)}{'Custo'.rjust(10)}{'Preço Venda'.rjust(15)}{'Custo Total'.rjust(15)}{'Faturamento Total'.rjust(20)}\n"
+        yield "=" * 120 + "\n"  # Linha de separação
+
+        custo_total_estoque, faturamento_total_estoque = estoque.totais() # totais em centavos, mantidos pelo estoque
+
+        motor = self._motor_paralelo()
+        if motor is not None:
+            # as linhas são formatadas em paralelo, em fragmentos, e chegam na ordem de cadastro
+            yield from motor.linhas_relatorio(inicio, limite)
+        else:
+            # Calcula de uma só vez o custo total e o faturamento total de cada item (com NumPy, se estiver instalado)
+            slots, custos_totais, faturamentos_totais = motor_analitico(estoque).totais_por_item()
+            if not isinstance(slots, list): # vetores NumPy: converte de uma vez, em vez de ler elemento por elemento
+                slots, custos_totais, faturamentos_totais = slots.tolist(), custos_totais.tolist(), faturamentos_totais.tolist()
+
+            descricoes, codigos, quantidades, custos, precos = estoque.descricoes, estoque.codigos, estoque.quantidades, estoque.custos, estoque.precos
+
+            # Gera uma linha formatada para cada produto do estoque
+            for slot, custo_total, faturamento_total in paginar(zip(slots, custos_totais, faturamentos_totais), inicio, limite):
+                yield linha_relatorio(descricoes[slot], codigos[slot], quantidades[slot], custos[slot], precos[slot], custo_total, faturamento_total)
+
+        # Exibe o total geral do estoque
+        yield "=" * 120 + "\n"
+        yield f"{'TOTAL GERAL'.ljust(30)}{'':>10}{'':>15}{'':>10}{'':>15}{formatar_centavos(custo_total_estoque).rjust(15)}{formatar_centavos(faturamento_total_estoque).rjust(20)}\n"
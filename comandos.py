@@ -0,0 +1,282 @@
+"""
+Modo de comandos em lote, sem perguntas ao usuário.
+
+Lê uma sequência de comandos (de um arquivo ou da entrada padrão), um por linha, executa cada um no
+estoque e escreve uma linha JSON de resultado por comando. Os comandos são:
+
+    cadastrar <descricao;codigo;quantidade;custo_item;preco_venda>   (código vazio gera um novo)
+    quantidade <codigo> <nova quantidade>
+    preco <codigo> <novo preço>
+    remover <codigo>
+    movimentar <codigo>:<variação> [<codigo>:<variação> ...]          (ex.: 203:+10 204:-2)
+    reprecificar <codigo>:<novo preço> [<codigo>:<novo preço> ...]
+    buscar <descrição ou código>
+    consultar <condições> [ordem=<campo>] [limite=<n>]               (ex.: quantidade<7 margem>30% ordem=-valor)
+    listar [inicio] [limite]
+    ordenar [crescente|decrescente]
+    esgotados
+    baixa [quantidade]                                               (padrão 7)
+    valor_total
+    lucro
+    relatorio [inicio] [limite]                                      (os totais são sempre do estoque inteiro)
+
+Linhas em branco são ignoradas. Os comandos `inicio`, `confirmar` e `desfazer` delimitam uma
+transação: se um comando dentro dela falhar, todas as alterações da transação são desfeitas e os
+comandos seguintes são ignorados (com erro) até o `confirmar` ou `desfazer`. Uma transação aberta no
+fim da entrada é desfeita.
+
+Cada resultado tem o formato
+    {"linha": 3, "comando": "quantidade", "ok": true, "resultado": ...}
+ou, em caso de erro,
+    {"linha": 3, "comando": "quantidade", "ok": false, "erro": "Quantidade não permitida!"}
+
+As condições de `consultar` estão descritas em `consultas.interpretar_consulta`.
+
+`movimentar` e `reprecificar` são tudo ou nada: se algum item for rejeitado, nenhum é aplicado e o
+resultado traz também "erros", uma lista de [posição do item, código, mensagem].
+
+Exemplo de uso (pela linha de comando):
+python at.py --lote movimentos.txt > resultados.jsonl
+"""
+import json
+
+from estoque import PRODUTO_NAO_ENCONTRADO, SEPARADOR_ATRIBUTOS, LoteRejeitado, Transacao, formatar_centavos, interpretar_atributos, para_centavos
+from consultas import consultar, interpretar_consulta
+from metricas import METRICAS
+from renderizacao import escrever, paginar
+
+TRANSACAO_DESFEITA = 'transação desfeita por erro anterior'
+
+def _codigo(texto):
+    texto = texto.strip()
+    if not texto.isdigit():
+        raise ValueError(PRODUTO_NAO_ENCONTRADO)
+    return int(texto)
+
+def _argumentos(texto, minimo, maximo):
+    partes = texto.split()
+    if not minimo <= len(partes) <= maximo:
+        raise ValueError(f"esperado de {minimo} a {maximo} argumentos, recebido {len(partes)}")
+    return partes
+
+def _pares(texto, valor):
+    """
+    Converte 'codigo:valor codigo:valor ...' numa lista de pares (codigo, valor(texto)).
+    """
+    pares = []
+    for item in texto.split():
+        codigo, separador, quantia = item.partition(':')
+        if not separador:
+            raise ValueError(f"item inválido: {item!r} (use codigo:valor)")
+        pares.append((_codigo(codigo), valor(quantia)))
+    if not pares:
+        raise ValueError("nenhum item informado")
+    return pares
+
+class ExecutorComandos:
+    """
+    Executa comandos de texto no estoque e devolve os resultados como dicionários.
+
+    Parâmetros:
+    estoque (Estoque): O estoque em que os comandos são executados.
+    limite_padrao (int, opcional): Quantidade de produtos de `listar` e `relatorio` quando o comando não
+                                   informa o limite, e máximo de produtos de `buscar` por descrição.
+                                   O padrão (None) retorna todos.
+
+    Exemplo de uso:
+    executor = ExecutorComandos(estoque)
+    executor.executar('quantidade 203 45') -> {'comando': 'quantidade', 'ok': True, 'resultado': None}
+    """
+
+    def __init__(self, estoque, limite_padrao=None):
+        self.estoque = estoque
+        self.limite_padrao = limite_padrao
+        self.transacao = None
+        self.transacao_falhou = False
+        self._comandos = {
+            'cadastrar': self.cadastrar,
+            'quantidade': self.quantidade,
+            'preco': self.preco,
+            'remover': self.remover,
+            'movimentar': self.movimentar,
+            'reprecificar': self.reprecificar,
+            'buscar': self.buscar,
+            'consultar': self.consultar,
+            'listar': self.listar,
+            'ordenar': self.ordenar,
+            'esgotados': self.esgotados,
+            'baixa': self.baixa,
+            'valor_total': self.valor_total,
+            'lucro': self.lucro,
+            'relatorio': self.relatorio,
+            'inicio': self.inicio,
+            'confirmar': self.confirmar,
+            'desfazer': self.desfazer,
+        }
+
+    def executar(self, linha):
+        """
+        Executa uma linha de comando. Qualquer exceção do comando vira um resultado com 'ok' False (e
+        desfaz a transação aberta), para que um erro inesperado não interrompa os comandos seguintes.
+
+        Retorna:
+        dict: O resultado do comando ('comando', 'ok' e 'resultado' ou 'erro').
+        """
+        nome, _, argumentos = linha.strip().partition(' ')
+        funcao = self._comandos.get(nome)
+        if funcao is None:
+            return {'comando': nome, 'ok': False, 'erro': f"comando desconhecido: {nome!r}"}
+        if self.transacao_falhou and nome not in ('confirmar', 'desfazer'):
+            return {'comando': nome, 'ok': False, 'erro': TRANSACAO_DESFEITA}
+        try:
+            with METRICAS.operacao(nome):
+                resultado = funcao(argumentos)
+            return {'comando': nome, 'ok': True, 'resultado': resultado}
+        except Exception as erro:
+            if self.transacao is not None:
+                self.transacao.desfazer()
+                self.transacao = None
+                self.transacao_falhou = True
+            mensagem = str(erro) if isinstance(erro, ValueError) else f"erro interno: {erro!r}"
+            resultado = {'comando': nome, 'ok': False, 'erro': mensagem}
+            if isinstance(erro, LoteRejeitado):
+                resultado['erros'] = erro.erros
+            return resultado
+
+    def finalizar(self):
+        """
+        Desfaz uma transação que ficou aberta no fim da entrada.
+        """
+        if self.transacao is not None:
+            self.transacao.desfazer()
+            self.transacao = None
+        self.transacao_falhou = False
+
+    # comandos que alteram o estoque
+
+    def cadastrar(self, argumentos):
+        atributos = argumentos.split(SEPARADOR_ATRIBUTOS)
+        if len(atributos) > 1 and not atributos[1].strip():
+            atributos[1] = str(self.estoque.alocador.novo()) # código vazio: gera um código único
+        produto = interpretar_atributos(atributos)
+        self.estoque.adicionar(*produto)
+        return produto[1]
+
+    def quantidade(self, argumentos):
+        codigo, quantidade = _argumentos(argumentos, 2, 2)
+        self.estoque.definir_quantidade(_codigo(codigo), int(quantidade))
+
+    def preco(self, argumentos):
+        codigo, preco = _argumentos(argumentos, 2, 2)
+        self.estoque.definir_preco(_codigo(codigo), para_centavos(preco))
+
+    def remover(self, argumentos):
+        if not self.estoque.remover(_codigo(argumentos)):
+            raise ValueError(PRODUTO_NAO_ENCONTRADO)
+
+    def movimentar(self, argumentos):
+        self.estoque.movimentar_lote(_pares(argumentos, int))
+
+    def reprecificar(self, argumentos):
+        self.estoque.reprecificar_lote(_pares(argumentos, para_centavos))
+
+    # consultas
+
+    def _produtos(self, slots):
+        return list(self.estoque.produtos(slots))
+
+    def buscar(self, argumentos):
+        criterio = argumentos.strip()
+        if criterio.isdigit():
+            slot = self.estoque.localizar(int(criterio))
+            return self._produtos([] if slot is None else [slot])
+        return self._produtos(self.estoque.buscar_descricao(criterio, self.limite_padrao) if criterio else [])
+
+    def consultar(self, argumentos):
+        return self._produtos(consultar(self.estoque, *interpretar_consulta(argumentos)))
+
+    def _pagina(self, argumentos):
+        partes = [int(parte) for parte in _argumentos(argumentos, 0, 2)]
+        inicio = partes[0] if partes else 0
+        limite = partes[1] if len(partes) > 1 else self.limite_padrao
+        if inicio < 0 or (limite is not None and limite < 0):
+            raise ValueError(f"página inválida: {argumentos.strip()!r}")
+        METRICAS.linhas(len(self.estoque) if limite is None else min(limite, len(self.estoque)))
+        return paginar(self.estoque.slots(), inicio, limite)
+
+    def listar(self, argumentos):
+        return self._produtos(self._pagina(argumentos))
+
+    def ordenar(self, argumentos):
+        ordem = argumentos.strip() or 'crescente'
+        if ordem not in ('crescente', 'decrescente'):
+            raise ValueError(f"ordem inválida: {ordem!r}")
+        return self._produtos(self.estoque.ordenar_por_quantidade(decrescente=ordem == 'decrescente'))
+
+    def esgotados(self, argumentos):
+        return self._produtos(self.estoque.esgotados())
+
+    def baixa(self, argumentos):
+        limite = int(argumentos) if argumentos.strip() else 7
+        return self._produtos(self.estoque.quantidade_menor_que(limite))
+
+    def valor_total(self, argumentos):
+        return formatar_centavos(self.estoque.valor_total)
+
+    def lucro(self, argumentos):
+        return formatar_centavos(self.estoque.lucro_presumido)
+
+    def relatorio(self, argumentos):
+        estoque = self.estoque
+        custo_total, valor_total = estoque.totais()
+        itens = []
+        for slot in self._pagina(argumentos):
+            produto = estoque.produto(slot)
+            produto['custo_total'] = formatar_centavos(estoque.quantidades[slot] * estoque.custos[slot])
+            produto['faturamento_total'] = formatar_centavos(estoque.quantidades[slot] * estoque.precos[slot])
+            itens.append(produto)
+        return {'itens': itens, 'custo_total': formatar_centavos(custo_total), 'faturamento_total': formatar_centavos(valor_total)}
+
+    # transações
+
+    def inicio(self, argumentos):
+        if self.transacao is not None or self.transacao_falhou:
+            raise ValueError("já existe uma transação aberta")
+        self.transacao = Transacao(self.estoque)
+
+    def confirmar(self, argumentos):
+        if self.transacao_falhou:
+            self.transacao_falhou = False
+            raise ValueError(TRANSACAO_DESFEITA)
+        if self.transacao is None:
+            raise ValueError("nenhuma transação aberta")
+        self.transacao.confirmar()
+        self.transacao = None
+
+    def desfazer(self, argumentos):
+        if self.transacao_falhou:
+            self.transacao_falhou = False
+            return
+        if self.transacao is None:
+            raise ValueError("nenhuma transação aberta")
+        self.transacao.desfazer()
+        self.transacao = None
+
+def resultados(estoque, linhas):
+    """
+    Executa as linhas de comando e gera um resultado (linha JSON) por comando executado.
+    """
+    executor = ExecutorComandos(estoque)
+    for numero, linha in enumerate(linhas, 1):
+        if not linha.strip():
+            continue
+        resultado = executor.executar(linha)
+        yield json.dumps({'linha': numero, **resultado}, ensure_ascii=False) + '\n'
+    executor.finalizar()
+
+def executar_lote(estoque, entrada, saida=None):
+    """
+    Executa os comandos de `entrada` (arquivo ou qualquer iterável de linhas) e escreve os resultados
+    em `saida` (o padrão é o terminal), em blocos.
+    """
+    escrever(resultados(estoque, entrada), saida)
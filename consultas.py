@@ -0,0 +1,426 @@
+"""
+Consultas compostas sobre o estoque, com escolha do caminho de acesso pelos índices.
+
+Uma consulta combina predicados com E (`&`) e OU (`|`) e pode ter uma ordem e um limite:
+
+    Descricao('mouse')                    descrição contém o texto (sem diferenciar maiúsculas)
+    Codigo(203, 204)                      código é um dos informados
+    Quantidade(minimo=None, maximo=None)  faixas inclusivas; None deixa a faixa aberta
+    Custo(...), Preco(...)                em centavos
+    Margem(...)                           (preço - custo) / preço, de 0 a 1
+
+O planejador estima quantas linhas cada predicado indexado produziria (índice de códigos, índice de
+trigramas das descrições e índice de quantidades) e parte do mais seletivo, conferindo os demais
+predicados só nesses candidatos. Sem nenhum predicado indexado, o catálogo é percorrido uma vez.
+Sem ordem (ordem de cadastro), a execução para assim que chega ao limite. Ordenando por quantidade,
+o plano pode percorrer o próprio índice de quantidades já em ordem e parar no limite; nas demais
+ordens, apenas os `limite` melhores são mantidos (heap), sem ordenar todos os resultados. Empates
+ficam sempre na ordem de cadastro.
+
+Exemplo de uso ("estoque baixo E margem acima de 30%, pelos maiores valores em estoque, 50 primeiros"):
+consulta = Quantidade(maximo=6) & Margem(minimo=0.3)
+slots = consultar(estoque, consulta, ordem='-valor', limite=50)
+planejar(estoque, consulta, ordem='-valor', limite=50).descricao -> 'candidatos pelo índice (~120 linhas), ...'
+
+Pelos comandos em lote, a mesma consulta é escrita como
+    consultar quantidade<7 margem>0.3 ordem=-valor limite=50
+"""
+import heapq
+import math
+import re
+import shlex
+from abc import ABC, abstractmethod
+from itertools import count, islice
+from operator import itemgetter
+
+from estoque import para_centavos
+from metricas import METRICAS
+
+ORDENS = ('codigo', 'descricao', 'quantidade', 'custo', 'preco', 'valor', 'margem')
+
+def _margem(custo, preco):
+    return (preco - custo) / preco if preco else 0.0
+
+def _unir(listas):
+    """
+    Une listas ordenadas de slots, sem repetições, mantendo a ordem.
+    """
+    anterior = None
+    for slot in heapq.merge(*listas):
+        if slot != anterior:
+            yield slot
+            anterior = slot
+
+class Predicado(ABC):
+    """
+    Base dos predicados. Um predicado sabe conferir uma linha (`preparar`) e, se tiver um índice,
+    estimar (`estimar`) e listar (`candidatos`) as linhas que podem satisfazê-lo. Sem índice, os
+    candidatos são todas as linhas do estoque.
+    """
+
+    def __and__(self, outro):
+        return E(self, outro)
+
+    def __or__(self, outro):
+        return Ou(self, outro)
+
+    def estimar(self, estoque):
+        """
+        Retorna quantas linhas os candidatos do índice teriam, ou None se não houver índice.
+        """
+        return None
+
+    def candidatos(self, estoque):
+        """
+        Retorna os slots candidatos (um superconjunto das respostas), em ordem de cadastro.
+        """
+        return list(estoque.slots()) # sem índice, qualquer linha pode satisfazer o predicado
+
+    @abstractmethod
+    def preparar(self, estoque):
+        """
+        Retorna a função slot -> bool que confere o predicado nas colunas do estoque.
+        """
+
+class Descricao(Predicado):
+    def __init__(self, texto):
+        self.texto = texto
+
+    def estimar(self, estoque):
+        return estoque.indice_descricoes.estimar(self.texto)
+
+    def candidatos(self, estoque):
+        return estoque.buscar_descricao(self.texto)
+
+    def preparar(self, estoque):
+        indice = estoque.indice_descricoes
+        consulta = indice.normalizar(self.texto)
+        return lambda slot: indice.contem(slot, consulta)
+
+    def __repr__(self):
+        return f"Descricao({self.texto!r})"
+
+class Codigo(Predicado):
+    def __init__(self, *codigos):
+        self.codigos = frozenset(codigos)
+
+    def estimar(self, estoque):
+        return len(self.codigos)
+
+    def candidatos(self, estoque):
+        slots = (estoque.localizar(codigo) for codigo in self.codigos)
+        return sorted(slot for slot in slots if slot is not None)
+
+    def preparar(self, estoque):
+        codigos, aceitos = estoque.codigos, self.codigos
+        return lambda slot: codigos[slot] in aceitos
+
+    def __repr__(self):
+        return f"Codigo({', '.join(map(str, sorted(self.codigos)))})"
+
+class _Faixa(Predicado):
+    # faixa inclusiva [minimo, maximo] sobre uma coluna; None deixa a faixa aberta daquele lado
+    def __init__(self, minimo=None, maximo=None):
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @abstractmethod
+    def _valor(self, estoque):
+        """
+        Retorna a função slot -> valor da coluna comparada com a faixa.
+        """
+
+    def preparar(self, estoque):
+        valor, minimo, maximo = self._valor(estoque), self.minimo, self.maximo
+        if minimo is None:
+            return lambda slot: valor(slot) <= maximo
+        if maximo is None:
+            return lambda slot: minimo <= valor(slot)
+        return lambda slot: minimo <= valor(slot) <= maximo
+
+    def __repr__(self):
+        return f"{type(self).__name__}(minimo={self.minimo!r}, maximo={self.maximo!r})"
+
+class Quantidade(_Faixa):
+    def estimar(self, estoque):
+        return estoque.indice_quantidades.contar_entre(self.minimo, self.maximo)
+
+    def candidatos(self, estoque):
+        return estoque.indice_quantidades.entre(self.minimo, self.maximo)
+
+    def _valor(self, estoque):
+        return estoque.quantidades.__getitem__
+
+class Custo(_Faixa):
+    def _valor(self, estoque):
+        return estoque.custos.__getitem__
+
+class Preco(_Faixa):
+    def _valor(self, estoque):
+        return estoque.precos.__getitem__
+
+class Margem(_Faixa):
+    def _valor(self, estoque):
+        custos, precos = estoque.custos, estoque.precos
+        return lambda slot: _margem(custos[slot], precos[slot])
+
+class E(Predicado):
+    def __init__(self, *predicados):
+        self.predicados = predicados
+
+    def _mais_seletivo(self, estoque):
+        estimativas = [(estimativa, predicado) for predicado in self.predicados
+                       for estimativa in [predicado.estimar(estoque)] if estimativa is not None]
+        return min(estimativas, key=lambda par: par[0], default=(None, None))
+
+    def estimar(self, estoque):
+        return self._mais_seletivo(estoque)[0]
+
+    def candidatos(self, estoque):
+        predicado = self._mais_seletivo(estoque)[1]
+        if predicado is None: # nenhum predicado tem índice
+            return super().candidatos(estoque)
+        return predicado.candidatos(estoque)
+
+    def preparar(self, estoque):
+        testes = [predicado.preparar(estoque) for predicado in self.predicados]
+        return lambda slot: all(teste(slot) for teste in testes)
+
+    def __repr__(self):
+        return ' & '.join(f"({predicado!r})" if isinstance(predicado, Ou) else repr(predicado) for predicado in self.predicados)
+
+class Ou(Predicado):
+    def __init__(self, *predicados):
+        self.predicados = predicados
+
+    def estimar(self, estoque):
+        estimativas = [predicado.estimar(estoque) for predicado in self.predicados]
+        return None if None in estimativas else sum(estimativas)
+
+    def candidatos(self, estoque):
+        return list(_unir([predicado.candidatos(estoque) for predicado in self.predicados]))
+
+    def preparar(self, estoque):
+        testes = [predicado.preparar(estoque) for predicado in self.predicados]
+        return lambda slot: any(teste(slot) for teste in testes)
+
+    def __repr__(self):
+        return ' | '.join(map(repr, self.predicados))
+
+def _chave(estoque, campo):
+    """
+    Retorna a função slot -> valor usada para ordenar pelo campo.
+    """
+    if campo == 'codigo':
+        return estoque.codigos.__getitem__
+    if campo == 'descricao':
+        return estoque.descricoes.__getitem__
+    if campo == 'quantidade':
+        return estoque.quantidades.__getitem__
+    if campo == 'custo':
+        return estoque.custos.__getitem__
+    if campo == 'preco':
+        return estoque.precos.__getitem__
+    quantidades, custos, precos = estoque.quantidades, estoque.custos, estoque.precos
+    if campo == 'valor':
+        return lambda slot: quantidades[slot] * precos[slot]
+    return lambda slot: _margem(custos[slot], precos[slot])
+
+class Plano:
+    """
+    O plano escolhido para uma consulta. Criado por `planejar`; `descricao` explica a escolha e
+    `executar` retorna os slots.
+    """
+
+    def __init__(self, estoque, onde, campo, decrescente, limite, acesso, estimativa):
+        self.estoque = estoque
+        self.onde = onde
+        self.campo = campo
+        self.decrescente = decrescente
+        self.limite = limite
+        self.acesso = acesso # 'varredura', 'indice' ou 'ordem_quantidades'
+        self.estimativa = estimativa
+
+    @property
+    def descricao(self):
+        if self.acesso == 'ordem_quantidades':
+            partes = ["percorre o índice de quantidades já em ordem"]
+        elif self.acesso == 'indice':
+            partes = [f"candidatos pelo índice (~{self.estimativa} linhas)"]
+        elif self.limite is not None and self.campo is None:
+            partes = ["percorre o catálogo na ordem de cadastro"]
+        else:
+            partes = [f"varredura do catálogo ({len(self.estoque)} linhas)"]
+        if self.onde is not None:
+            partes.append(f"filtro {self.onde!r}")
+        if self.campo is not None and self.acesso != 'ordem_quantidades':
+            partes.append(f"{'maiores' if self.decrescente else 'menores'} {self.limite} por {self.campo} (heap)"
+                          if self.limite is not None else f"ordena por {self.campo}")
+        if self.limite is not None and (self.campo is None or self.acesso == 'ordem_quantidades'):
+            partes.append(f"para em {self.limite} resultados")
+        return ', '.join(partes)
+
+    def executar(self):
+        """
+        Executa o plano e retorna a lista de slots.
+        """
+        estoque = self.estoque
+        if self.limite is not None and self.limite <= 0:
+            return []
+        if self.acesso == 'ordem_quantidades':
+            fonte = estoque.ordenar_por_quantidade(decrescente=self.decrescente)
+        elif self.acesso == 'indice':
+            fonte = self.onde.candidatos(estoque)
+        else:
+            fonte = estoque.slots()
+
+        contador = None
+        if self.acesso == 'varredura' and METRICAS.habilitado: # os índices já informam as linhas que leram
+            contador = count()
+            fonte = map(itemgetter(0), zip(fonte, contador)) # conta as linhas lidas, mesmo parando antes do fim
+
+        linhas = fonte
+        if self.onde is not None:
+            linhas = filter(self.onde.preparar(estoque), linhas)
+        if self.campo is None or self.acesso == 'ordem_quantidades':
+            resultado = list(islice(linhas, self.limite)) # já está na ordem pedida: para no limite
+        else:
+            chave = _chave(estoque, self.campo)
+            if self.limite is None:
+                resultado = sorted(linhas, key=chave, reverse=self.decrescente)
+            elif self.decrescente:
+                resultado = heapq.nlargest(self.limite, linhas, key=chave)
+            else:
+                resultado = heapq.nsmallest(self.limite, linhas, key=chave)
+        if contador is not None:
+            METRICAS.linhas(next(contador))
+        return resultado
+
+def planejar(estoque, onde=None, ordem=None, limite=None):
+    """
+    Escolhe como executar uma consulta.
+
+    Parâmetros:
+    estoque (Estoque): O estoque consultado.
+    onde (Predicado, opcional): O filtro. Sem filtro, todos os produtos são considerados.
+    ordem (str, opcional): Um dos campos de `ORDENS`, com '-' na frente para ordem decrescente
+                           (ex.: '-valor'). Sem ordem, os resultados vêm na ordem de cadastro.
+    limite (int, opcional): Quantidade máxima de resultados.
+
+    Retorna:
+    Plano
+
+    Levanta:
+    ValueError: Se a ordem não for reconhecida.
+    """
+    campo, decrescente = None, False
+    if ordem:
+        decrescente = ordem.startswith('-')
+        campo = ordem.lstrip('-+')
+        if campo not in ORDENS:
+            raise ValueError(f"ordem inválida: {ordem!r} (use {', '.join(ORDENS)})")
+
+    total = len(estoque)
+    estimativa = onde.estimar(estoque) if onde is not None else None
+    acesso = 'varredura' if estimativa is None else 'indice'
+    if estimativa is None:
+        estimativa = total
+
+    if campo in (None, 'quantidade'):
+        # nessas ordens há uma fonte que já entrega as linhas na ordem pedida (o próprio catálogo ou o
+        # índice de quantidades), e a execução pode parar no limite
+        em_ordem = 'varredura' if campo is None else 'ordem_quantidades'
+        if limite is not None and acesso == 'indice':
+            # percorrer a fonte em ordem custa cerca de limite / seletividade linhas até achar
+            # `limite` respostas; partir dos candidatos custa a estimativa inteira
+            if limite * total / max(estimativa, 1) < estimativa:
+                acesso = em_ordem
+        elif acesso == 'varredura':
+            acesso = em_ordem # na ordem de quantidade, o índice evita ordenar tudo
+    return Plano(estoque, onde, campo, decrescente, limite, acesso, estimativa)
+
+def consultar(estoque, onde=None, ordem=None, limite=None):
+    """
+    Executa uma consulta e retorna a lista de slots. Mesmos parâmetros de `planejar`.
+
+    Exemplo de uso:
+    consultar(estoque, Descricao('mouse') | Descricao('teclado'), ordem='preco', limite=10)
+    """
+    return planejar(estoque, onde, ordem, limite).executar()
+
+_CONDICAO = re.compile(r'^(descricao|codigo|quantidade|custo|preco|margem)(<=|>=|=|<|>|~)(.+)$')
+
+def _condicao(campo, operador, texto):
+    """
+    Converte uma condição de texto (ex.: 'quantidade', '<', '7') num predicado.
+    """
+    if campo == 'descricao':
+        if operador != '~':
+            raise ValueError("use descricao~texto")
+        return Descricao(texto)
+    if operador == '~':
+        raise ValueError(f"o operador ~ só vale para a descrição, não para {campo}")
+    if campo == 'codigo':
+        if operador != '=':
+            raise ValueError("use codigo=N ou codigo=N,M,...")
+        return Codigo(*(int(parte) for parte in texto.split(',')))
+
+    if campo == 'margem':
+        valor = float(texto[:-1]) / 100 if texto.endswith('%') else float(texto)
+        antes, depois = math.nextafter(valor, -math.inf), math.nextafter(valor, math.inf)
+    else:
+        valor = int(texto) if campo == 'quantidade' else para_centavos(texto)
+        antes, depois = valor - 1, valor + 1
+    classe = {'quantidade': Quantidade, 'custo': Custo, 'preco': Preco, 'margem': Margem}[campo]
+    if operador == '=':
+        return classe(valor, valor)
+    if operador == '<':
+        return classe(maximo=antes)
+    if operador == '<=':
+        return classe(maximo=valor)
+    if operador == '>':
+        return classe(minimo=depois)
+    return classe(minimo=valor)
+
+def interpretar_consulta(texto):
+    """
+    Converte uma consulta escrita em texto em (onde, ordem, limite).
+
+    As condições separadas por espaço são combinadas com E, e a palavra 'ou' separa grupos
+    combinados com OU. Textos com espaços vão entre aspas.
+
+    Exemplo de uso:
+    interpretar_consulta('quantidade<7 margem>30% ordem=-valor limite=50')
+    interpretar_consulta('descricao~"mouse razer" ou codigo=203,204')
+
+    Levanta:
+    ValueError: Se alguma parte não for reconhecida.
+    """
+    grupos = [[]]
+    ordem = limite = None
+    for parte in shlex.split(texto):
+        if parte == 'ou':
+            grupos.append([])
+        elif parte.startswith('ordem='):
+            ordem = parte[len('ordem='):]
+        elif parte.startswith('limite='):
+            limite = int(parte[len('limite='):])
+        else:
+            encontrado = _CONDICAO.match(parte)
+            if encontrado is None:
+                raise ValueError(f"condição inválida: {parte!r}")
+            try:
+                grupos[-1].append(_condicao(*encontrado.groups()))
+            except ValueError as erro:
+                raise ValueError(f"condição inválida: {parte!r} ({erro})") from None
+    if any(not grupo for grupo in grupos[1:]) or (len(grupos) > 1 and not grupos[0]):
+        raise ValueError("'ou' precisa de condições dos dois lados")
+
+    termos = [grupo[0] if len(grupo) == 1 else E(*grupo) for grupo in grupos if grupo]
+    if not termos:
+        onde = None
+    elif len(termos) == 1:
+        onde = termos[0]
+    else:
+        onde = Ou(*termos)
+    return onde, ordem, limite
@@ -0,0 +1,750 @@
+"""
+Armazenamento do estoque em colunas tipadas.
+
+Cada produto é convertido uma única vez, no cadastro, e seus atributos são guardados em colunas
+compactas (`array`) em vez de um dicionário de strings por produto:
+
+- codigos: código do produto (inteiro)
+- descricoes: descrição do produto (string internada)
+- quantidades: quantidade em estoque (inteiro)
+- custos: custo do item em centavos (inteiro, ponto fixo)
+- precos: preço de venda em centavos (inteiro, ponto fixo)
+
+Um produto é identificado internamente pela sua posição (slot) nas colunas. Assim, as funções de
+análise (valor total, lucro, relatórios, ordenação e filtros) trabalham direto com inteiros, sem
+precisar chamar `int()` ou `float()` a cada consulta.
+
+Um índice código -> slot torna a busca, a atualização e a remoção de um produto O(1). A remoção não
+desloca as colunas: o slot é marcado como removido (lápide) e as colunas são compactadas quando as
+lápides passam a ocupar metade do espaço.
+
+Os códigos novos vêm de um `AlocadorCodigos`, que guarda o maior código já visto e por isso gera um
+código em O(1), sem percorrer o estoque.
+
+As descrições ficam num índice de trigramas e as quantidades num índice ordenado por baldes (ver
+`indices.py`). Ambos são atualizados a cada cadastro, remoção ou edição, para que a busca por parte
+da descrição, a ordenação por quantidade e os filtros de estoque baixo e esgotado não precisem
+percorrer o catálogo inteiro.
+
+O custo total, o valor total (faturamento) e o lucro presumido do estoque são somas mantidas a cada
+alteração, em centavos inteiros, para que consultar os totais não exija uma passada pelo catálogo e
+para que deltas sucessivos não acumulem erro de arredondamento.
+
+Quem precisa acompanhar as alterações (o diário em disco de `persistencia.py` e os alertas de estoque
+baixo de `alertas.py`, por exemplo) se registra com `adicionar_ouvinte` e é chamado após cada
+alteração aplicada, com uma das operações:
+
+- ('cadastrar', produtos): lista de tuplas (descricao, codigo, quantidade, custo, preco)
+- ('remover', produto): a tupla do produto removido
+- ('quantidade', codigo, antiga, nova)
+- ('preco', codigo, antigo, novo)
+- ('descricao', codigo, antiga, nova)
+
+As alterações em massa (`movimentar_lote`, `reprecificar_lote` e quem usar `agrupar`) ficam entre as
+operações ('inicio_grupo',) e ('fim_grupo',), para que o ouvinte possa tratá-las de uma vez só (o
+diário, por exemplo, grava o grupo inteiro com uma única escrita).
+"""
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from indices import IndiceQuantidades, IndiceTrigramas
+
+CHAVES = ('descricao', 'codigo', 'quantidade', 'custo_item', 'preco_venda') # ordem dos atributos no registro de texto
+SEPARADOR_ATRIBUTOS = ';'
+SEPARADOR_PRODUTOS = '#'
+SEPARADOR_DESCRICOES = '\0' # separa as descrições nos instantâneos e no motor paralelo; não pode aparecer numa descrição
+
+PRODUTO_NAO_ENCONTRADO = 'Produto não encontrado'
+QUANTIDADE_NAO_PERMITIDA = 'Quantidade não permitida!'
+PRECO_MENOR_QUE_CUSTO = 'Novo preço é menor que o custo do item!'
+
+class LoteRejeitado(ValueError):
+    """
+    Erro de uma alteração em massa que não passou na validação. Nenhuma alteração do lote é aplicada.
+
+    Atributos:
+    erros (list): Uma tupla (posição, código, mensagem) para cada item rejeitado, com a posição
+                  começando em 1.
+    """
+
+    def __init__(self, erros):
+        super().__init__(f"itens rejeitados no lote: {len(erros)}")
+        self.erros = erros
+
+REMOVIDO = -1 # código gravado no slot de um produto removido (lápide)
+LIMITE_INTEIRO = (1 << 63) - 1 # maior valor que cabe nas colunas (inteiros de 64 bits com sinal)
+COMPACTACAO_MINIMA = 1024 # número mínimo de lápides antes de compactar as colunas
+
+def para_centavos(texto):
+    """
+    Converte um valor monetário em texto (ex.: '3200.00') para centavos (ex.: 320000).
+
+    O arredondamento é feito para o centavo mais próximo (meio para cima), usando `Decimal`
+    para não herdar os erros de representação do `float`.
+
+    Parâmetros:
+    texto (str): O valor monetário, com ponto como separador decimal.
+
+    Retorna:
+    int: O valor em centavos.
+
+    Levanta:
+    ValueError: Se o texto não representar um número.
+    """
+    try:
+        valor = Decimal(texto.strip())
+        if valor.is_finite():
+            # valores grandes demais para a precisão do Decimal também levantam InvalidOperation aqui
+            return int((valor * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        pass
+    raise ValueError(f"valor monetário inválido: {texto!r}")
+
+def formatar_centavos(centavos):
+    """
+    Formata um valor em centavos com duas casas decimais (ex.: 320000 -> '3200.00').
+    """
+    sinal = '-' if centavos < 0 else ''
+    reais, resto = divmod(abs(centavos), 100)
+    return f"{sinal}{reais}.{resto:02d}"
+
+def conferir_limite(valor, nome):
+    """
+    Confere se um valor inteiro cabe nas colunas do estoque e o retorna.
+
+    Levanta:
+    ValueError: Se o valor estiver fora do intervalo dos inteiros de 64 bits.
+    """
+    if not -LIMITE_INTEIRO - 1 <= valor <= LIMITE_INTEIRO:
+        raise ValueError(f"{nome} fora do limite permitido: {valor}")
+    return valor
+
+def conferir_descricao(descricao):
+    """
+    Levanta ValueError se a descrição não for um texto ou se contiver o caractere '\\0', usado como
+    separador das descrições nos instantâneos (`persistencia.py`) e no motor paralelo (`paralelo.py`).
+    """
+    if not isinstance(descricao, str) or SEPARADOR_DESCRICOES in descricao:
+        raise ValueError(f"descrição inválida: {descricao!r}")
+
+def _conferir_produto(produto):
+    conferir_descricao(produto[0])
+    for nome, valor in zip(CHAVES[1:], produto[1:]): # código, quantidade, custo e preço
+        conferir_limite(valor, nome)
+
+def interpretar_produto(texto):
+    """
+    Converte um registro de texto no formato 'descricao;codigo;quantidade;custo_item;preco_venda'
+    para uma tupla tipada.
+
+    Retorna:
+    tuple: (descricao, codigo, quantidade, custo_centavos, preco_centavos)
+
+    Levanta:
+    ValueError: Se o registro não tiver todos os atributos ou se algum valor for inválido.
+
+    Exemplo de uso:
+    interpretar_produto('Mouse Logitech;203;50;70.00;150.00')
+    -> ('Mouse Logitech', 203, 50, 7000, 15000)
+    """
+    return interpretar_atributos(texto.split(SEPARADOR_ATRIBUTOS))
+
+def interpretar_atributos(atributos):
+    """
+    Converte a lista de atributos de um produto, na ordem de `CHAVES`, para uma tupla tipada.
+    Mesmo retorno e mesmas exceções de `interpretar_produto`.
+    """
+    if len(atributos) != len(CHAVES):
+        raise ValueError(f"registro com {len(atributos)} atributos, esperado {len(CHAVES)}: {SEPARADOR_ATRIBUTOS.join(atributos)!r}")
+    descricao, codigo, quantidade, custo_item, preco_venda = atributos
+    produto = (descricao, int(codigo), int(quantidade), para_centavos(custo_item), para_centavos(preco_venda))
+    _conferir_produto(produto) # rejeita já na conversão o que não caberia nas colunas
+    return produto
+
+class AlocadorCodigos:
+    """
+    Gera códigos únicos de produto a partir de uma marca d'água (o próximo código livre).
+
+    A marca só avança: os códigos de produtos removidos nunca são emitidos de novo. O alocador é
+    alimentado pelo estoque a cada cadastro (`observar`), de modo que, após carregar o catálogo,
+    ele já sabe qual é o próximo código sem precisar procurar o maior.
+
+    Parâmetros:
+    primeiro (int, opcional): O código emitido quando nenhum produto foi cadastrado. O padrão é 1.
+
+    Exemplo de uso:
+    alocador = AlocadorCodigos()
+    alocador.observar(212)
+    alocador.novo() -> 213
+    alocador.reservar_bloco(3) -> range(214, 217)
+    """
+
+    def __init__(self, primeiro=1):
+        self._proximo = primeiro
+        self._trava = threading.Lock() # protege a marca quando vários cadastros rodam em paralelo
+
+    @property
+    def proximo(self):
+        """O próximo código que será emitido."""
+        return self._proximo
+
+    def observar(self, codigo):
+        """
+        Informa um código já em uso, avançando a marca d'água se necessário.
+        """
+        if codigo >= self._proximo:
+            with self._trava:
+                if codigo >= self._proximo:
+                    self._proximo = codigo + 1
+
+    def novo(self):
+        """
+        Emite um novo código único.
+        """
+        with self._trava:
+            codigo = self._proximo
+            self._proximo += 1
+        return codigo
+
+    def reservar_bloco(self, tamanho):
+        """
+        Reserva `tamanho` códigos consecutivos de uma só vez e os retorna como um `range`.
+
+        Útil para importações em massa: o importador reserva a faixa inteira com uma única
+        operação e depois usa os códigos sem disputar o alocador a cada produto.
+        """
+        if tamanho < 0:
+            raise ValueError(f"tamanho de bloco inválido: {tamanho}")
+        with self._trava:
+            inicio = self._proximo
+            self._proximo += tamanho
+        return range(inicio, inicio + tamanho)
+
+class Estoque:
+    """
+    Catálogo de produtos guardado em colunas tipadas.
+
+    As colunas são públicas para leitura (`codigos`, `descricoes`, `quantidades`, `custos` e `precos`),
+    mas toda alteração deve passar pelos métodos da classe. Slots removidos continuam nas colunas, com
+    código REMOVIDO e valores zerados, até a próxima compactação; por isso os slots só devem ser
+    percorridos através de `slots()` e não devem ser guardados de uma remoção para outra.
+
+    Parâmetros:
+    sem_acentos (bool, opcional): Se True, a busca por descrição ignora acentos. O padrão é False.
+    verificar (bool, opcional): Se True, cada consulta aos totais os recalcula do zero e os compara com as
+                                somas mantidas, levantando AssertionError em caso de divergência. Útil em
+                                testes; o padrão é False.
+
+    Exemplo de uso:
+    estoque = Estoque()
+    estoque.cadastrar('Mouse Logitech;203;50;70.00;150.00')
+    estoque.atualizar_quantidade(estoque.localizar(203), 45)
+    estoque.produto(estoque.localizar(203))
+    -> {'descricao': 'Mouse Logitech', 'codigo': '203', 'quantidade': '45', 'custo_item': '70.00', 'preco_venda': '150.00'}
+    """
+
+    def __init__(self, sem_acentos=False, verificar=False):
+        self.codigos = array('q')
+        self.descricoes = []
+        self.quantidades = array('q')
+        self.custos = array('q')
+        self.precos = array('q')
+        self._indice = {} # código -> slot
+        self._removidos = 0 # quantidade de lápides nas colunas
+        self.alocador = AlocadorCodigos() # gera os códigos dos novos produtos
+        self.indice_descricoes = IndiceTrigramas(sem_acentos, self.descricoes) # busca por substring da descrição
+        self.indice_quantidades = IndiceQuantidades() # ordenação e faixas de quantidade
+        self.verificar = verificar
+        self._custo_total = 0 # soma de quantidade * custo, em centavos
+        self._valor_total = 0 # soma de quantidade * preço, em centavos
+        self._ouvintes = [] # funções chamadas após cada alteração
+
+    def __len__(self):
+        return len(self._indice)
+
+    def __contains__(self, codigo):
+        return codigo in self._indice
+
+    def adicionar_ouvinte(self, ouvinte):
+        """
+        Registra uma função chamada como `ouvinte(operacao, *argumentos)` após cada alteração do estoque.
+        """
+        self._ouvintes.append(ouvinte)
+
+    def remover_ouvinte(self, ouvinte):
+        """
+        Cancela o registro de um ouvinte.
+        """
+        self._ouvintes.remove(ouvinte)
+
+    def _notificar(self, operacao, *argumentos):
+        for ouvinte in self._ouvintes:
+            ouvinte(operacao, *argumentos)
+
+    def adicionar(self, descricao, codigo, quantidade, custo, preco):
+        """
+        Adiciona um produto já convertido (custo e preço em centavos) e retorna o seu slot.
+
+        Levanta:
+        ValueError: Se o código for negativo, se já existir um produto com o mesmo código ou se algum
+                    valor não couber nas colunas.
+        """
+        if codigo in self._indice:
+            raise ValueError(f"código {codigo} já cadastrado")
+        if codigo < 0:
+            raise ValueError(f"código inválido: {codigo}")
+        if not isinstance(descricao, str) or not all(isinstance(valor, int) for valor in (codigo, quantidade, custo, preco)):
+            raise ValueError(f"produto inválido: {(descricao, codigo, quantidade, custo, preco)!r}")
+        _conferir_produto((descricao, codigo, quantidade, custo, preco))
+        # com tudo validado, as colunas e os índices secundários são alterados antes do índice de códigos,
+        # que só passa a apontar para o slot quando o produto já está completo
+        slot = len(self.codigos)
+        self.codigos.append(codigo)
+        self.descricoes.append(sys.intern(descricao)) # descrições repetidas compartilham a mesma string
+        self.quantidades.append(quantidade)
+        self.custos.append(custo)
+        self.precos.append(preco)
+        self.indice_descricoes.adicionar(slot, descricao)
+        self.indice_quantidades.adicionar(slot, quantidade)
+        self._custo_total += quantidade * custo
+        self._valor_total += quantidade * preco
+        self.alocador.observar(codigo) # mantém a marca d'água acima de todos os códigos cadastrados
+        self._indice[codigo] = slot
+        if self._ouvintes:
+            self._notificar('cadastrar', [(descricao, codigo, quantidade, custo, preco)])
+        return slot
+
+    def adicionar_lote(self, produtos):
+        """
+        Adiciona de uma vez uma lista de produtos já convertidos, cada um no formato retornado por
+        `interpretar_produto`. As colunas crescem com uma única extensão por lote.
+
+        A validação é feita antes de qualquer alteração: se algum código for negativo, já existir no
+        estoque ou aparecer repetido no lote, ou se algum valor não couber nas colunas, nada é adicionado.
+
+        Retorna:
+        range: Os slots ocupados pelos produtos do lote, na mesma ordem.
+
+        Levanta:
+        ValueError: Se algum código do lote for inválido.
+        """
+        produtos = list(produtos)
+        vistos = set()
+        for produto in produtos:
+            codigo = produto[1]
+            if codigo < 0 or codigo in self._indice or codigo in vistos:
+                raise ValueError(f"código inválido ou já cadastrado no lote: {codigo}")
+            _conferir_produto(produto)
+            vistos.add(codigo)
+        if not produtos:
+            return range(0)
+
+        inicio = len(self.codigos)
+        descricoes, codigos, quantidades, custos, precos = zip(*produtos)
+        self.codigos.extend(codigos)
+        self.descricoes.extend(map(sys.intern, descricoes))
+        self.quantidades.extend(quantidades)
+        self.custos.extend(custos)
+        self.precos.extend(precos)
+        self.alocador.observar(max(codigos))
+
+        indice, indice_descricoes, indice_quantidades = self._indice, self.indice_descricoes, self.indice_quantidades
+        for slot, codigo, descricao, quantidade in zip(range(inicio, len(self.codigos)), codigos, descricoes, quantidades):
+            indice[codigo] = slot
+            indice_descricoes.adicionar(slot, descricao)
+            indice_quantidades.adicionar(slot, quantidade)
+        self._custo_total += sum(map(int.__mul__, quantidades, custos))
+        self._valor_total += sum(map(int.__mul__, quantidades, precos))
+        if self._ouvintes:
+            self._notificar('cadastrar', produtos)
+        return range(inicio, len(self.codigos))
+
+    def cadastrar(self, texto):
+        """
+        Converte um registro no formato 'descricao;codigo;quantidade;custo_item;preco_venda' e o adiciona
+        ao estoque. Retorna o slot do produto.
+        """
+        return self.adicionar(*interpretar_produto(texto))
+
+    def localizar(self, codigo):
+        """
+        Retorna o slot do produto com o código informado, ou None se ele não existir.
+        """
+        return self._indice.get(codigo)
+
+    def remover(self, codigo):
+        """
+        Remove o produto com o código informado. Retorna True se o produto existia.
+        """
+        slot = self._indice.get(codigo)
+        if slot is None:
+            return False
+        if self._ouvintes:
+            removido = self.tupla(slot)
+        # o código só sai do índice depois dos passos que podem falhar
+        self.indice_descricoes.remover(slot)
+        self.indice_quantidades.remover(slot, self.quantidades[slot])
+        self._custo_total -= self.quantidades[slot] * self.custos[slot]
+        self._valor_total -= self.quantidades[slot] * self.precos[slot]
+        # marca o slot como lápide; os valores zerados não contam nos totais
+        self.codigos[slot] = REMOVIDO
+        self.descricoes[slot] = ''
+        self.quantidades[slot] = 0
+        self.custos[slot] = 0
+        self.precos[slot] = 0
+        del self._indice[codigo]
+        self._removidos += 1
+        if self._removidos >= COMPACTACAO_MINIMA and self._removidos * 2 >= len(self.codigos):
+            self.compactar()
+        if self._ouvintes:
+            self._notificar('remover', removido)
+        return True
+
+    def compactar(self):
+        """
+        Elimina as lápides deixadas pelas remoções, mantendo a ordem de cadastro dos produtos.
+        Os slots dos produtos mudam após a compactação.
+        """
+        vivos = list(self.slots())
+        self.codigos = array('q', [self.codigos[slot] for slot in vivos])
+        self.descricoes = [self.descricoes[slot] for slot in vivos]
+        self.quantidades = array('q', [self.quantidades[slot] for slot in vivos])
+        self.custos = array('q', [self.custos[slot] for slot in vivos])
+        self.precos = array('q', [self.precos[slot] for slot in vivos])
+        self._indice = {codigo: slot for slot, codigo in enumerate(self.codigos)}
+        self._removidos = 0
+        self.indice_descricoes.reconstruir(self.descricoes, self.slots())
+        self.indice_quantidades.reconstruir(self.quantidades, self.slots())
+
+    def atualizar_quantidade(self, slot, quantidade):
+        """
+        Altera a quantidade do produto no slot informado.
+        """
+        antiga = self.quantidades[slot]
+        diferenca = quantidade - antiga
+        self.quantidades[slot] = quantidade # primeiro a coluna: se o valor não couber, nada mais muda
+        self.indice_quantidades.mover(slot, antiga, quantidade)
+        self._custo_total += diferenca * self.custos[slot]
+        self._valor_total += diferenca * self.precos[slot]
+        if self._ouvintes:
+            self._notificar('quantidade', self.codigos[slot], antiga, quantidade)
+
+    def atualizar_preco(self, slot, preco):
+        """
+        Altera o preço de venda (em centavos) do produto no slot informado.
+        """
+        antigo = self.precos[slot]
+        self.precos[slot] = preco # primeiro a coluna: se o valor não couber, nada mais muda
+        self._valor_total += self.quantidades[slot] * (preco - antigo)
+        if self._ouvintes:
+            self._notificar('preco', self.codigos[slot], antigo, preco)
+
+    def definir_quantidade(self, codigo, quantidade):
+        """
+        Altera a quantidade do produto com o código informado, validando a operação.
+
+        Levanta:
+        ValueError: Se o produto não existir ou se a quantidade for negativa ou grande demais (com a
+                    mesma mensagem exibida no menu).
+        """
+        slot = self.localizar(codigo)
+        if slot is None:
+            raise ValueError(PRODUTO_NAO_ENCONTRADO)
+        if not 0 <= quantidade <= LIMITE_INTEIRO:
+            raise ValueError(QUANTIDADE_NAO_PERMITIDA)
+        self.atualizar_quantidade(slot, quantidade)
+
+    def definir_preco(self, codigo, preco):
+        """
+        Altera o preço de venda (em centavos) do produto com o código informado, validando a operação.
+
+        Levanta:
+        ValueError: Se o produto não existir ou se o preço for menor que o custo do item (com a mesma
+                    mensagem exibida no menu).
+        """
+        slot = self.localizar(codigo)
+        if slot is None:
+            raise ValueError(PRODUTO_NAO_ENCONTRADO)
+        conferir_limite(preco, 'preco_venda')
+        if preco < self.custos[slot]:
+            raise ValueError(PRECO_MENOR_QUE_CUSTO)
+        self.atualizar_preco(slot, preco)
+
+    @contextmanager
+    def agrupar(self):
+        """
+        Avisa aos ouvintes que as alterações feitas dentro do bloco `with` formam um grupo.
+        """
+        if self._ouvintes:
+            self._notificar('inicio_grupo')
+        try:
+            yield
+        finally:
+            if self._ouvintes:
+                self._notificar('fim_grupo')
+
+    def movimentar_lote(self, movimentos, relativo=True):
+        """
+        Aplica de uma vez uma lista de movimentações de estoque, tudo ou nada.
+
+        Todas as movimentações são validadas numa única passada, na ordem recebida, antes de qualquer
+        alteração: código e valor precisam ser inteiros, o produto precisa existir e a quantidade resultante não pode ficar negativa (nem passar
+        de `LIMITE_INTEIRO`). Um código repetido acumula as suas movimentações. Se algum item for
+        rejeitado, nada é alterado.
+
+        Parâmetros:
+        movimentos (iterável): Pares (codigo, valor).
+        relativo (bool, opcional): Se True (padrão), o valor é somado à quantidade atual (entrada ou
+                                   saída de mercadoria); se False, o valor é a nova quantidade.
+
+        Levanta:
+        LoteRejeitado: Com a lista de todos os itens rejeitados.
+
+        Exemplo de uso:
+        estoque.movimentar_lote([(203, +100), (204, -5), (203, -20)])
+        """
+        finais = {} # slot -> quantidade após as movimentações
+        erros = []
+        quantidades = self.quantidades
+        for posicao, (codigo, valor) in enumerate(movimentos, 1):
+            if not isinstance(codigo, int) or not isinstance(valor, int): # mesmos tipos aceitos por `adicionar`
+                erros.append((posicao, codigo, f"movimentação inválida: {(codigo, valor)!r}"))
+                continue
+            slot = self._indice.get(codigo)
+            if slot is None:
+                erros.append((posicao, codigo, PRODUTO_NAO_ENCONTRADO))
+                continue
+            nova = finais.get(slot, quantidades[slot]) + valor if relativo else valor
+            if not 0 <= nova <= LIMITE_INTEIRO:
+                erros.append((posicao, codigo, QUANTIDADE_NAO_PERMITIDA))
+                continue
+            finais[slot] = nova
+        if erros:
+            raise LoteRejeitado(erros)
+
+        with self.agrupar():
+            for slot, quantidade in finais.items():
+                if quantidades[slot] != quantidade:
+                    self.atualizar_quantidade(slot, quantidade)
+
+    def reprecificar_lote(self, precos):
+        """
+        Aplica de uma vez uma lista de novos preços de venda (em centavos), tudo ou nada.
+
+        Cada preço é validado antes de qualquer alteração: código e preço precisam ser inteiros, o produto
+        precisa existir e o preço não pode ser menor que o custo do item. Se um código se repetir, vale o último preço. Se algum item for
+        rejeitado, nada é alterado.
+
+        Parâmetros:
+        precos (iterável): Pares (codigo, novo_preco).
+
+        Levanta:
+        LoteRejeitado: Com a lista de todos os itens rejeitados.
+        """
+        finais = {} # slot -> novo preço
+        erros = []
+        custos = self.custos
+        for posicao, (codigo, preco) in enumerate(precos, 1):
+            if not isinstance(codigo, int) or not isinstance(preco, int): # mesmos tipos aceitos por `adicionar`
+                erros.append((posicao, codigo, f"preço inválido: {(codigo, preco)!r}"))
+                continue
+            slot = self._indice.get(codigo)
+            if slot is None:
+                erros.append((posicao, codigo, PRODUTO_NAO_ENCONTRADO))
+            elif not -LIMITE_INTEIRO - 1 <= preco <= LIMITE_INTEIRO:
+                erros.append((posicao, codigo, f"preco_venda fora do limite permitido: {preco}"))
+            elif preco < custos[slot]:
+                erros.append((posicao, codigo, PRECO_MENOR_QUE_CUSTO))
+            else:
+                finais[slot] = preco
+        if erros:
+            raise LoteRejeitado(erros)
+
+        with self.agrupar():
+            for slot, preco in finais.items():
+                if self.precos[slot] != preco:
+                    self.atualizar_preco(slot, preco)
+
+    def atualizar_descricao(self, slot, descricao):
+        """
+        Altera a descrição do produto no slot informado, reindexando-a.
+        """
+        conferir_descricao(descricao)
+        antiga = self.descricoes[slot]
+        self.indice_descricoes.atualizar(slot, descricao) # o índice ainda lê a descrição antiga na lista
+        self.descricoes[slot] = sys.intern(descricao)
+        if self._ouvintes:
+            self._notificar('descricao', self.codigos[slot], antiga, descricao)
+
+    def buscar_descricao(self, texto, limite=None):
+        """
+        Retorna, na ordem de cadastro, os slots dos produtos cuja descrição contém `texto`
+        (sem diferenciar maiúsculas de minúsculas). Com `limite`, retorna só os primeiros `limite` slots,
+        sem percorrer o resto do catálogo.
+        """
+        return self.indice_descricoes.buscar(texto, limite)
+
+    def ordenar_por_quantidade(self, decrescente=False):
+        """
+        Gera os slots ordenados por quantidade; empates ficam na ordem de cadastro.
+        """
+        if decrescente:
+            return self.indice_quantidades.decrescente()
+        return self.indice_quantidades.crescente()
+
+    def quantidade_menor_que(self, limite):
+        """
+        Retorna, na ordem de cadastro, os slots dos produtos com quantidade menor que `limite`.
+        """
+        return self.indice_quantidades.menores_que(limite)
+
+    def esgotados(self):
+        """
+        Retorna, na ordem de cadastro, os slots dos produtos com quantidade igual a zero.
+        """
+        return self.indice_quantidades.iguais_a(0)
+
+    @property
+    def custo_total(self):
+        """Custo total do estoque (soma de quantidade * custo do item), em centavos."""
+        return self.totais()[0]
+
+    @property
+    def valor_total(self):
+        """Valor total do estoque (soma de quantidade * preço de venda), em centavos."""
+        return self.totais()[1]
+
+    @property
+    def lucro_presumido(self):
+        """Lucro presumido do estoque (valor total - custo total), em centavos."""
+        custo, valor = self.totais()
+        return valor - custo
+
+    def totais(self):
+        """
+        Retorna a tupla (custo total, valor total) em centavos, a partir das somas mantidas.
+        No modo de verificação, confere as somas com um recálculo completo.
+        """
+        totais = (self._custo_total, self._valor_total)
+        if self.verificar:
+            recalculados = self.recalcular_totais()
+            if recalculados != totais:
+                raise AssertionError(f"totais divergentes: mantidos {totais}, recalculados {recalculados}")
+        return totais
+
+    def recalcular_totais(self):
+        """
+        Recalcula (custo total, valor total) em centavos percorrendo todas as colunas.
+        """
+        quantidades = self.quantidades
+        custo = sum(map(int.__mul__, quantidades, self.custos))
+        valor = sum(map(int.__mul__, quantidades, self.precos))
+        return custo, valor
+
+    def slots(self):
+        """
+        Retorna os slots dos produtos cadastrados, na ordem de cadastro, ignorando as lápides.
+        """
+        if not self._removidos:
+            return range(len(self.codigos))
+        return (slot for slot, codigo in enumerate(self.codigos) if codigo != REMOVIDO)
+
+    def tupla(self, slot):
+        """
+        Retorna o produto do slot como a tupla tipada (descricao, codigo, quantidade, custo, preco).
+        """
+        return (self.descricoes[slot], self.codigos[slot], self.quantidades[slot], self.custos[slot], self.precos[slot])
+
+    def produto(self, slot):
+        """
+        Retorna o produto do slot como um dicionário de strings, no mesmo formato usado na exibição.
+        """
+        return {
+            'descricao': self.descricoes[slot],
+            'codigo': str(self.codigos[slot]),
+            'quantidade': str(self.quantidades[slot]),
+            'custo_item': formatar_centavos(self.custos[slot]),
+            'preco_venda': formatar_centavos(self.precos[slot]),
+        }
+
+    def produtos(self, slots=None):
+        """
+        Gera os dicionários dos produtos nos slots informados (ou de todos, se `slots` for None).
+        """
+        if slots is None:
+            slots = self.slots()
+        for slot in slots:
+            yield self.produto(slot)
+
+class Transacao:
+    """
+    Agrupa alterações do estoque para que possam ser desfeitas juntas.
+
+    Enquanto a transação está aberta, cada alteração é anotada junto com a operação inversa. `desfazer`
+    aplica as inversas, da última para a primeira, e devolve o estoque ao estado do início da transação
+    (um produto removido e depois restaurado volta para o fim da ordem de cadastro). Usada como
+    gerenciador de contexto, a transação é desfeita automaticamente se ocorrer uma exceção.
+
+    Os ouvintes do estoque (como o diário em disco) recebem também as operações inversas, então o
+    estado gravado continua igual ao estado em memória.
+
+    Exemplo de uso:
+    with Transacao(estoque):
+        estoque.definir_quantidade(203, 10)
+        estoque.definir_preco(204, 9000) # se falhar, a quantidade do 203 volta ao valor anterior
+    """
+
+    def __init__(self, estoque):
+        self.estoque = estoque
+        self._inversas = []
+        estoque.adicionar_ouvinte(self._anotar)
+
+    def _anotar(self, operacao, *argumentos):
+        if operacao not in ('inicio_grupo', 'fim_grupo'):
+            self._inversas.append((operacao, argumentos))
+
+    def _encerrar(self):
+        if self._anotar in self.estoque._ouvintes:
+            self.estoque.remover_ouvinte(self._anotar)
+
+    def confirmar(self):
+        """
+        Encerra a transação mantendo as alterações.
+        """
+        self._encerrar()
+        self._inversas = []
+
+    def desfazer(self):
+        """
+        Encerra a transação desfazendo todas as alterações feitas desde o início.
+        """
+        self._encerrar()
+        estoque = self.estoque
+        while self._inversas:
+            operacao, argumentos = self._inversas.pop()
+            if operacao == 'cadastrar':
+                for produto in reversed(argumentos[0]):
+                    estoque.remover(produto[1])
+            elif operacao == 'remover':
+                estoque.adicionar(*argumentos[0])
+            else:
+                codigo, antigo, _ = argumentos
+                slot = estoque.localizar(codigo)
+                if operacao == 'quantidade':
+                    estoque.atualizar_quantidade(slot, antigo)
+                elif operacao == 'preco':
+                    estoque.atualizar_preco(slot, antigo)
+                else:
+                    estoque.atualizar_descricao(slot, antigo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        if tipo is None:
+            self.confirmar()
+        else:
+            self.desfazer()
@@ -0,0 +1,307 @@
+"""
+Índices secundários do estoque.
+
+Os índices guardam apenas slots (posições nas colunas do `Estoque`) e são mantidos pelo próprio
+estoque a cada cadastro, remoção ou alteração, de forma incremental. Quando o estoque compacta as
+colunas, os slots mudam e os índices são reconstruídos.
+"""
+import heapq
+from array import array
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+from metricas import METRICAS
+
+TAMANHO_NGRAMA = 3
+
+def remover_acentos(texto):
+    """
+    Remove os acentos de um texto (ex.: 'Mecânico' -> 'Mecanico').
+    """
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas sobre as descrições dos produtos, para busca por substring.
+
+    Cada descrição é normalizada (`casefold` e, opcionalmente, sem acentos) e quebrada em trigramas,
+    e cada trigrama aponta para a lista ordenada dos slots cujas descrições o contêm, guardada num
+    `array('q')` (8 bytes por slot, em vez de um objeto `int` por slot num conjunto). Uma busca por
+    uma substring de 3 ou mais caracteres parte da menor lista dos seus trigramas e só confere o texto
+    desses candidatos. Consultas com menos de 3 caracteres percorrem as descrições, e `limite` encerra
+    a varredura assim que houver resultados suficientes.
+
+    O índice não guarda uma cópia normalizada das descrições: lê a lista de descrições do estoque
+    (`descricoes`) e normaliza só os candidatos que precisa conferir. Por isso o estoque avisa o índice
+    (`remover`, `atualizar`) antes de trocar a descrição de um slot.
+
+    Parâmetros:
+    sem_acentos (bool, opcional): Se True, ignora acentos na indexação e na busca
+                                  ('mecanico' encontra 'Mecânico'). O padrão é False.
+    descricoes (list, opcional): A lista de descrições por slot, compartilhada com o estoque. Sem ela,
+                                 o índice mantém a sua própria lista.
+
+    Exemplo de uso:
+    indice = IndiceTrigramas()
+    indice.adicionar(0, 'Monitor Samsung')
+    indice.adicionar(1, 'Mouse Razer')
+    indice.buscar('MONI') -> [0]
+    indice.buscar('m') -> [0, 1]
+    indice.buscar('m', limite=1) -> [0]
+    """
+
+    def __init__(self, sem_acentos=False, descricoes=None):
+        self.sem_acentos = sem_acentos
+        self._proprias = descricoes is None # se o índice mantém a lista de descrições por conta própria
+        self._descricoes = [] if descricoes is None else descricoes # slot -> descrição ('' para slots vazios)
+        self._postagens = {} # trigrama -> array('q') com os slots em ordem crescente
+
+    def normalizar(self, texto):
+        """
+        Normaliza um texto para indexação e busca.
+        """
+        texto = texto.casefold()
+        if self.sem_acentos:
+            texto = remover_acentos(texto)
+        return texto
+
+    @staticmethod
+    def _trigramas(texto):
+        return {texto[i:i + TAMANHO_NGRAMA] for i in range(len(texto) - TAMANHO_NGRAMA + 1)}
+
+    def adicionar(self, slot, descricao):
+        """
+        Indexa a descrição do produto no slot informado.
+        """
+        if self._proprias:
+            if slot >= len(self._descricoes):
+                self._descricoes.extend([''] * (slot + 1 - len(self._descricoes)))
+            self._descricoes[slot] = descricao
+        postagens = self._postagens
+        for trigrama in self._trigramas(self.normalizar(descricao)):
+            lista = postagens.get(trigrama)
+            if lista is None:
+                postagens[trigrama] = array('q', (slot,))
+            elif lista[-1] < slot:
+                lista.append(slot) # caso comum: os slots novos vão para o fim das colunas
+            else:
+                insort(lista, slot)
+
+    def remover(self, slot):
+        """
+        Retira do índice a descrição do slot informado (ainda a descrição atual do slot).
+        """
+        postagens = self._postagens
+        for trigrama in self._trigramas(self.normalizar(self._descricoes[slot])):
+            lista = postagens[trigrama]
+            posicao = bisect_left(lista, slot)
+            if posicao < len(lista) and lista[posicao] == slot:
+                del lista[posicao]
+            if not lista:
+                del postagens[trigrama]
+        if self._proprias:
+            self._descricoes[slot] = ''
+
+    def atualizar(self, slot, descricao):
+        """
+        Reindexa o slot com uma nova descrição. Deve ser chamado antes de a lista de descrições mudar.
+        """
+        self.remover(slot)
+        self.adicionar(slot, descricao)
+
+    def reconstruir(self, descricoes, slots):
+        """
+        Refaz o índice do zero para os slots informados (usado após a compactação do estoque), passando a
+        ler a nova lista de descrições. Todos os slots informados são indexados, mesmo com a descrição vazia.
+        """
+        self._descricoes = list(descricoes) if self._proprias else descricoes
+        self._postagens = {}
+        for slot in slots:
+            self.adicionar(slot, descricoes[slot])
+
+    def buscar(self, consulta, limite=None):
+        """
+        Retorna, em ordem crescente, os slots cujas descrições contêm `consulta`; com `limite`, só os
+        primeiros `limite` slots.
+        """
+        if limite == 0:
+            return []
+        consulta = self.normalizar(consulta)
+        descricoes = self._descricoes
+        normalizar = self.normalizar if self.sem_acentos else str.casefold # evita uma chamada Python por descrição
+        if len(consulta) < TAMANHO_NGRAMA:
+            # trigramas não ajudam em consultas curtas; percorre as descrições até juntar `limite` slots
+            if limite is None:
+                resultados = [slot for slot, descricao in enumerate(descricoes) if descricao and consulta in normalizar(descricao)]
+            else:
+                resultados = list(islice((slot for slot, descricao in enumerate(descricoes)
+                                          if descricao and consulta in normalizar(descricao)), limite))
+            completa = limite is None or len(resultados) < limite
+            METRICAS.linhas(len(descricoes) if completa else resultados[-1] + 1)
+            return resultados
+
+        candidatos = None
+        for trigrama in self._trigramas(consulta):
+            lista = self._postagens.get(trigrama)
+            if lista is None: # um trigrama ausente já descarta a consulta inteira
+                return []
+            if candidatos is None or len(lista) < len(candidatos):
+                candidatos = lista
+
+        if len(consulta) == TAMANHO_NGRAMA:
+            resultados = candidatos[:limite].tolist() # o próprio trigrama já garante a correspondência
+        elif limite is None: # confirma a substring nos candidatos da menor lista (já em ordem crescente)
+            resultados = [slot for slot in candidatos if consulta in normalizar(descricoes[slot])]
+        else:
+            resultados = list(islice((slot for slot in candidatos if consulta in normalizar(descricoes[slot])), limite))
+        completa = limite is None or len(resultados) < limite
+        METRICAS.linhas(len(candidatos) if completa else bisect_right(candidatos, resultados[-1]))
+        return resultados
+
+    def estimar(self, consulta):
+        """
+        Retorna um limite superior barato para a quantidade de resultados de `buscar(consulta)`: o
+        tamanho da menor lista de trigramas (ou o total de slots, para consultas curtas).
+        """
+        consulta = self.normalizar(consulta)
+        if len(consulta) < TAMANHO_NGRAMA:
+            return len(self._descricoes)
+        postagens = self._postagens
+        return min(len(postagens.get(trigrama, ())) for trigrama in self._trigramas(consulta))
+
+    def contem(self, slot, consulta):
+        """
+        Indica se a descrição do slot contém `consulta`, que já deve estar normalizada (`normalizar`).
+        """
+        return consulta in self.normalizar(self._descricoes[slot])
+
+class IndiceQuantidades:
+    """
+    Índice ordenado dos produtos por quantidade, organizado em baldes.
+
+    Cada quantidade distinta tem um balde com os slots dos produtos que a possuem, em ordem crescente
+    de slot (ou seja, na ordem de cadastro), e as quantidades distintas ficam numa lista ordenada.
+    Como o número de quantidades distintas é pequeno perto do número de produtos, inserir, remover
+    ou mover um produto custa pouco, e as consultas não precisam tocar no resto do catálogo:
+
+    - `crescente()` e `decrescente()` percorrem os baldes em ordem, sem ordenar nada;
+    - `menores_que(limite)` visita só os baldes abaixo do limite;
+    - `iguais_a(0)` é o balde dos esgotados.
+
+    Produtos com a mesma quantidade saem na ordem de cadastro, assim como aconteceria com `sorted()`.
+
+    Exemplo de uso:
+    indice = IndiceQuantidades()
+    indice.adicionar(0, 15)
+    indice.adicionar(1, 0)
+    indice.adicionar(2, 5)
+    list(indice.crescente()) -> [1, 2, 0]
+    indice.menores_que(7) -> [1, 2]
+    indice.iguais_a(0) -> [1]
+    """
+
+    def __init__(self):
+        self._chaves = [] # quantidades distintas, em ordem crescente
+        self._baldes = {} # quantidade -> lista ordenada de slots
+
+    def adicionar(self, slot, quantidade):
+        """
+        Indexa o slot com a quantidade informada.
+        """
+        balde = self._baldes.get(quantidade)
+        if balde is None:
+            insort(self._chaves, quantidade)
+            self._baldes[quantidade] = [slot]
+        elif balde[-1] < slot: # caso comum: o slot novo é o último cadastrado
+            balde.append(slot)
+        else:
+            insort(balde, slot)
+
+    def remover(self, slot, quantidade):
+        """
+        Retira o slot do balde da quantidade informada.
+        """
+        balde = self._baldes[quantidade]
+        del balde[bisect_left(balde, slot)]
+        if not balde:
+            del self._baldes[quantidade]
+            del self._chaves[bisect_left(self._chaves, quantidade)]
+
+    def mover(self, slot, antiga, nova):
+        """
+        Move o slot do balde da quantidade antiga para o da nova.
+        """
+        if antiga != nova:
+            self.remover(slot, antiga)
+            self.adicionar(slot, nova)
+
+    def reconstruir(self, quantidades, slots):
+        """
+        Refaz o índice do zero para os slots informados (usado após a compactação do estoque).
+        """
+        self._chaves = []
+        self._baldes = {}
+        for slot in slots:
+            self.adicionar(slot, quantidades[slot])
+
+    def crescente(self):
+        """
+        Gera os slots em ordem crescente de quantidade.
+        """
+        baldes = self._baldes
+        for quantidade in self._chaves:
+            METRICAS.linhas(len(baldes[quantidade]))
+            yield from baldes[quantidade]
+
+    def decrescente(self):
+        """
+        Gera os slots em ordem decrescente de quantidade (empates na ordem de cadastro).
+        """
+        baldes = self._baldes
+        for quantidade in reversed(self._chaves):
+            METRICAS.linhas(len(baldes[quantidade]))
+            yield from baldes[quantidade]
+
+    def menores_que(self, limite):
+        """
+        Retorna, na ordem de cadastro, os slots com quantidade menor que `limite`.
+        """
+        baldes = [self._baldes[quantidade] for quantidade in self._chaves[:bisect_left(self._chaves, limite)]]
+        METRICAS.linhas(sum(map(len, baldes)))
+        if len(baldes) == 1:
+            return list(baldes[0])
+        return list(heapq.merge(*baldes)) # junta os baldes já ordenados por slot
+
+    def _chaves_entre(self, minimo, maximo):
+        chaves = self._chaves
+        inicio = 0 if minimo is None else bisect_left(chaves, minimo)
+        fim = len(chaves) if maximo is None else bisect_right(chaves, maximo)
+        return chaves[inicio:fim]
+
+    def entre(self, minimo=None, maximo=None):
+        """
+        Retorna, na ordem de cadastro, os slots com quantidade entre `minimo` e `maximo` (inclusive;
+        None deixa a faixa aberta daquele lado).
+        """
+        baldes = [self._baldes[quantidade] for quantidade in self._chaves_entre(minimo, maximo)]
+        METRICAS.linhas(sum(map(len, baldes)))
+        if len(baldes) == 1:
+            return list(baldes[0])
+        return list(heapq.merge(*baldes))
+
+    def contar_entre(self, minimo=None, maximo=None):
+        """
+        Conta os slots com quantidade entre `minimo` e `maximo` (inclusive), sem montar a lista.
+        """
+        baldes = self._baldes
+        return sum(len(baldes[quantidade]) for quantidade in self._chaves_entre(minimo, maximo))
+
+    def iguais_a(self, quantidade):
+        """
+        Retorna, na ordem de cadastro, os slots com exatamente a quantidade informada.
+        """
+        slots = list(self._baldes.get(quantidade, ()))
+        METRICAS.linhas(len(slots))
+        return slots
@@ -0,0 +1,214 @@
+"""
+Métricas das operações do estoque: contagem de chamadas, histograma de latência e linhas lidas.
+
+As operações (busca, ordenação, filtros, atualizações, relatório...) são medidas com
+`METRICAS.operacao(nome)`, e os índices informam quantas linhas (produtos) cada consulta precisou
+examinar com `METRICAS.linhas(n)`. As linhas lidas por uma operação incluem as das operações
+chamadas dentro dela.
+
+A coleta começa desligada. Desligada, `operacao` devolve sempre o mesmo objeto vazio e `linhas`
+retorna na primeira comparação, então as chamadas espalhadas pelo código quase não custam nada.
+Ela pode ser ligada pelo menu, pela variável de ambiente ESTOQUE_METRICAS=1 ou pelo código
+(`METRICAS.habilitado = True`).
+
+Os dados podem ser lidos com `instantaneo()` (dicionário) ou exportados para um arquivo em JSON ou no
+formato de texto do Prometheus.
+
+Exemplo de uso:
+METRICAS.habilitado = True
+with METRICAS.operacao('buscar'):
+    slots = estoque.buscar_descricao('mouse')
+METRICAS.exportar('metricas.prom')
+"""
+import os
+import time
+from bisect import bisect_left
+
+# limites superiores (em segundos) dos baldes do histograma de latência: de 1 µs a 10 s
+LIMITES = tuple(float(f'{base}e{expoente}') for expoente in range(-6, 1) for base in (1, 2.5, 5)) + (10.0,)
+FORMATOS = ('json', 'prometheus')
+
+class _Nada:
+    """
+    Medidor usado com a coleta desligada: não faz nada.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        return False
+
+_NADA = _Nada()
+
+class _Operacao:
+    """
+    Números acumulados de uma operação, usado também como o medidor de cada chamada.
+    """
+
+    def __init__(self, metricas, nome):
+        self._metricas = metricas
+        self.nome = nome
+        self.chamadas = 0
+        self.erros = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+        self.linhas = 0
+        self.contagens = [0] * (len(LIMITES) + 1) # o último balde é o +Inf
+        self._inicios = [] # (instante, linhas acumuladas) das chamadas em andamento
+
+    def __enter__(self):
+        self._inicios.append((time.perf_counter(), self._metricas._linhas))
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        inicio, linhas = self._inicios.pop()
+        segundos = time.perf_counter() - inicio
+        self.chamadas += 1
+        self.segundos += segundos
+        self.maximo = max(self.maximo, segundos)
+        self.linhas += self._metricas._linhas - linhas
+        self.contagens[bisect_left(LIMITES, segundos)] += 1
+        if tipo is not None:
+            self.erros += 1
+        return False
+
+    def quantil(self, q):
+        """
+        Estima o quantil `q` (0 a 1) da latência pelo limite do balde em que ele cai (sem passar da
+        maior latência observada).
+        """
+        if not self.chamadas:
+            return None
+        alvo = q * self.chamadas
+        acumulado = 0
+        for limite, contagem in zip(LIMITES, self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+class Metricas:
+    """
+    Registro das métricas das operações.
+
+    Parâmetros:
+    habilitado (bool, opcional): Se a coleta começa ligada. O padrão é False.
+    """
+
+    def __init__(self, habilitado=False):
+        self.habilitado = habilitado
+        self._operacoes = {}
+        self._linhas = 0 # contador global de linhas lidas; cada operação guarda a diferença
+
+    def operacao(self, nome):
+        """
+        Retorna o medidor da operação `nome`, para ser usado com `with`. O tempo do bloco é registrado
+        no histograma da operação, e uma exceção dentro do bloco conta como erro.
+        """
+        if not self.habilitado:
+            return _NADA
+        operacao = self._operacoes.get(nome)
+        if operacao is None:
+            operacao = self._operacoes[nome] = _Operacao(self, nome)
+        return operacao
+
+    def linhas(self, quantidade):
+        """
+        Soma `quantidade` às linhas lidas pelas operações em andamento.
+        """
+        if self.habilitado:
+            self._linhas += quantidade
+
+    def zerar(self):
+        """
+        Descarta todas as medidas.
+        """
+        self._operacoes = {}
+
+    def instantaneo(self):
+        """
+        Retorna as medidas atuais de cada operação, em ordem alfabética.
+
+        Retorna:
+        dict: nome -> {'chamadas', 'erros', 'segundos', 'maximo_s', 'linhas', 'p50_s', 'p99_s',
+                       'baldes': [[limite, contagem acumulada], ..., ['+Inf', total]]}
+        """
+        resultado = {}
+        for nome in sorted(self._operacoes):
+            operacao = self._operacoes[nome]
+            acumulado = 0
+            baldes = []
+            for limite, contagem in zip(LIMITES + ('+Inf',), operacao.contagens):
+                acumulado += contagem
+                baldes.append([limite, acumulado])
+            resultado[nome] = {
+                'chamadas': operacao.chamadas,
+                'erros': operacao.erros,
+                'segundos': operacao.segundos,
+                'maximo_s': operacao.maximo,
+                'linhas': operacao.linhas,
+                'p50_s': operacao.quantil(0.5),
+                'p99_s': operacao.quantil(0.99),
+                'baldes': baldes,
+            }
+        return resultado
+
+    def prometheus(self):
+        """
+        Retorna as medidas no formato de texto do Prometheus.
+        """
+        instantaneo = self.instantaneo()
+        linhas = ["# HELP estoque_operacao_segundos Latência das operações do estoque.",
+                  "# TYPE estoque_operacao_segundos histogram"]
+        for nome, medida in instantaneo.items():
+            for limite, contagem in medida['baldes']:
+                le = limite if limite == '+Inf' else repr(limite)
+                linhas.append(f'estoque_operacao_segundos_bucket{{operacao="{nome}",le="{le}"}} {contagem}')
+            linhas.append(f'estoque_operacao_segundos_sum{{operacao="{nome}"}} {medida["segundos"]!r}')
+            linhas.append(f'estoque_operacao_segundos_count{{operacao="{nome}"}} {medida["chamadas"]}')
+        for metrica, campo, ajuda in (('estoque_operacao_erros_total', 'erros', "Operações que terminaram com erro."),
+                                      ('estoque_operacao_linhas_total', 'linhas', "Linhas (produtos) examinadas pelas operações.")):
+            linhas.append(f"# HELP {metrica} {ajuda}")
+            linhas.append(f"# TYPE {metrica} counter")
+            for nome, medida in instantaneo.items():
+                linhas.append(f'{metrica}{{operacao="{nome}"}} {medida[campo]}')
+        return '\n'.join(linhas) + '\n'
+
+    def exportar(self, caminho, formato=None):
+        """
+        Grava as medidas num arquivo local, substituindo-o de forma atômica.
+
+        Parâmetros:
+        caminho (str): O arquivo de destino.
+        formato (str, opcional): 'json' ou 'prometheus'. O padrão é 'json' para arquivos terminados em
+                                 .json e 'prometheus' para os demais.
+
+        Levanta:
+        ValueError: Se o formato não for reconhecido.
+        """
+        if formato is None:
+            formato = 'json' if caminho.lower().endswith('.json') else 'prometheus'
+        if formato not in FORMATOS:
+            raise ValueError(f"formato inválido: {formato!r} (use {' ou '.join(FORMATOS)})")
+        if formato == 'json':
+            import json # só é necessário na exportação
+            texto = json.dumps({'operacoes': self.instantaneo()}, ensure_ascii=False, indent=2)
+        else:
+            texto = self.prometheus()
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+        os.replace(temporario, caminho)
+
+    def linhas_resumo(self):
+        """
+        Gera as linhas de uma tabela com as medidas de cada operação, para exibir no terminal.
+        """
+        yield f"{'Operação'.ljust(16)}{'Chamadas'.rjust(10)}{'Erros'.rjust(8)}{'Média (ms)'.rjust(12)}{'p50 (ms)'.rjust(10)}{'p99 (ms)'.rjust(10)}{'Linhas'.rjust(14)}\n"
+        for nome, medida in self.instantaneo().items():
+            media = medida['segundos'] / medida['chamadas'] * 1000
+            yield (f"{nome:<16}{medida['chamadas']:>10}{medida['erros']:>8}{media:>12.3f}"
+                   f"{medida['p50_s'] * 1000:>10.3f}{medida['p99_s'] * 1000:>10.3f}{medida['linhas']:>14}\n")
+
+METRICAS = Metricas(habilitado=os.environ.get('ESTOQUE_METRICAS', '') not in ('', '0'))
@@ -0,0 +1,262 @@
+"""
+Execução em vários processos para varreduras e agregações sobre catálogos muito grandes.
+
+O `MotorParalelo` publica as colunas do estoque num bloco de memória compartilhada
+(`multiprocessing.shared_memory`) e divide os produtos em fragmentos de linhas consecutivas, na ordem
+de cadastro. Cada fragmento é processado por um processo de um pool, que lê as colunas direto do bloco
+compartilhado: só o nome do bloco e a faixa de linhas vão para o processo, e só o resultado do
+fragmento volta. Como os fragmentos são consecutivos, juntar os resultados na ordem dos fragmentos dá
+exatamente a mesma ordem (e, com a aritmética inteira em centavos, os mesmos totais) do processo único.
+
+O bloco tem, para cada produto ativo (sem as lápides), o código, a quantidade, o custo, o preço e o
+slot no estoque, como inteiros de 64 bits, e as descrições em UTF-8 separadas por '\\0', com o
+deslocamento de cada uma:
+
+    codigos | quantidades | custos | precos | slots | deslocamentos | descrições
+
+O motor se registra como ouvinte do estoque: alterações de quantidade e de preço são copiadas para o
+bloco na hora, e cadastros, remoções e alterações de descrição fazem o bloco ser publicado de novo na
+próxima operação.
+
+Os totais mantidos pelo estoque (`valor_total`, `lucro_presumido`) já não percorrem o catálogo; aqui
+eles podem ser recalculados em paralelo, para conferência.
+
+Exemplo de uso:
+with MotorParalelo(estoque, processos=8) as motor:
+    escrever(motor.linhas_relatorio(), arquivo) # linhas dos produtos do relatório geral, na ordem de cadastro
+    motor.buscar('ra') -> [slot, slot, ...]     # mesmo resultado de estoque.buscar_descricao('ra')
+    motor.totais() -> (custo total, valor total)
+"""
+import os
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from multiprocessing import get_context, shared_memory
+
+from estoque import SEPARADOR_DESCRICOES
+from metricas import METRICAS
+
+TAMANHO_FRAGMENTO = 1 << 16 # linhas por tarefa enviada ao pool
+SEPARADOR = SEPARADOR_DESCRICOES # o estoque não aceita esse caractere dentro de uma descrição
+SECOES = ('codigos', 'quantidades', 'custos', 'precos', 'slots')
+
+# blocos compartilhados abertos neste processo (nos processos do pool): nome -> SharedMemory
+_BLOCOS = {}
+
+def _abrir_bloco(nome):
+    bloco = _BLOCOS.get(nome)
+    if bloco is None:
+        for antigo in _BLOCOS.values(): # uma publicação nova substitui as anteriores
+            antigo.close()
+        _BLOCOS.clear()
+        # os processos do pool ('spawn') usam o mesmo rastreador de recursos do processo principal, que
+        # continua sendo o único a remover o bloco
+        bloco = _BLOCOS[nome] = shared_memory.SharedMemory(nome)
+    return bloco
+
+def _coluna(bloco, publicacao, secao, inicio, fim):
+    deslocamento = publicacao['secoes'][secao]
+    return bloco.buf[deslocamento + 8 * inicio:deslocamento + 8 * fim].cast('q')
+
+def _descricoes(bloco, publicacao, inicio, fim):
+    """
+    Retorna as descrições das linhas [inicio, fim) como um único texto, separadas por '\\0'.
+    """
+    deslocamentos = _coluna(bloco, publicacao, 'deslocamentos', inicio, fim + 1)
+    base = publicacao['secoes']['descricoes']
+    return str(bloco.buf[base + deslocamentos[0]:base + deslocamentos[-1] - 1], 'utf-8')
+
+def _somar(publicacao, inicio, fim):
+    """
+    Tarefa do pool: retorna (custo total, valor total) das linhas [inicio, fim), em centavos.
+    """
+    bloco = _abrir_bloco(publicacao['nome'])
+    quantidades = _coluna(bloco, publicacao, 'quantidades', inicio, fim)
+    custos = _coluna(bloco, publicacao, 'custos', inicio, fim)
+    precos = _coluna(bloco, publicacao, 'precos', inicio, fim)
+    return sum(map(int.__mul__, quantidades, custos)), sum(map(int.__mul__, quantidades, precos))
+
+def _buscar(publicacao, inicio, fim, consulta, sem_acentos):
+    """
+    Tarefa do pool: retorna as linhas de [inicio, fim) cuja descrição contém `consulta` (já normalizada).
+    """
+    from indices import IndiceTrigramas
+    bloco = _abrir_bloco(publicacao['nome'])
+    # normaliza o fragmento inteiro de uma vez; os separadores não mudam com a normalização
+    texto = IndiceTrigramas(sem_acentos).normalizar(_descricoes(bloco, publicacao, inicio, fim))
+    linhas = []
+    linha, posicao = inicio, 0
+    while True:
+        encontrado = texto.find(consulta, posicao)
+        if encontrado < 0:
+            return linhas
+        linha += texto.count(SEPARADOR, posicao, encontrado)
+        linhas.append(linha)
+        posicao = texto.find(SEPARADOR, encontrado + len(consulta)) + 1 # segue da próxima descrição
+        if posicao == 0:
+            return linhas
+        linha += 1
+
+def _relatorio(publicacao, inicio, fim):
+    """
+    Tarefa do pool: retorna o texto do relatório geral das linhas [inicio, fim).
+    """
+    from catalogo import linha_relatorio
+    bloco = _abrir_bloco(publicacao['nome'])
+    descricoes = _descricoes(bloco, publicacao, inicio, fim).split(SEPARADOR)
+    codigos, quantidades, custos, precos = (_coluna(bloco, publicacao, secao, inicio, fim) for secao in SECOES[:4])
+    return ''.join([linha_relatorio(descricao, codigo, quantidade, custo, preco, quantidade * custo, quantidade * preco)
+                    for descricao, codigo, quantidade, custo, preco in zip(descricoes, codigos, quantidades, custos, precos)])
+
+class MotorParalelo:
+    """
+    Varreduras e agregações do estoque divididas entre vários processos.
+
+    Parâmetros:
+    estoque (Estoque): O estoque analisado.
+    processos (int, opcional): Tamanho do pool. O padrão é a quantidade de núcleos da máquina.
+    tamanho_fragmento (int, opcional): Linhas por tarefa. O padrão é `TAMANHO_FRAGMENTO`.
+
+    O pool e o bloco compartilhado são criados na primeira operação e liberados por `fechar`.
+    """
+
+    def __init__(self, estoque, processos=None, tamanho_fragmento=TAMANHO_FRAGMENTO):
+        self.estoque = estoque
+        self.processos = processos or os.cpu_count() or 1
+        self.tamanho_fragmento = tamanho_fragmento
+        self._pool = None
+        self._bloco = None
+        self._publicacao = None # descrição do bloco enviada às tarefas: nome, linhas e deslocamento de cada seção
+        self._colunas = {} # vistas das seções numéricas do bloco, neste processo
+        self._compacto = True # se a linha de cada produto no bloco é o seu próprio slot (sem lápides)
+        estoque.adicionar_ouvinte(self._observar)
+
+    def fechar(self):
+        """
+        Encerra o pool e remove o bloco compartilhado.
+        """
+        self.estoque.remover_ouvinte(self._observar)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._descartar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        self.fechar()
+
+    def _descartar(self):
+        self._publicacao = None
+        for vista in self._colunas.values():
+            vista.release()
+        self._colunas = {}
+        if self._bloco is not None:
+            self._bloco.close()
+            self._bloco.unlink()
+            self._bloco = None
+
+    def _observar(self, operacao, *argumentos):
+        """
+        Ouvinte do estoque: mantém o bloco em dia com as alterações de quantidade e de preço, e marca o
+        bloco para ser publicado de novo nas demais alterações (que mudam as linhas).
+        """
+        if self._publicacao is None or operacao in ('inicio_grupo', 'fim_grupo'):
+            return
+        if operacao in ('quantidade', 'preco'):
+            codigo, _, novo = argumentos
+            slot = self.estoque.localizar(codigo)
+            linha = slot if self._compacto else bisect_left(self._colunas['slots'], slot)
+            self._colunas['quantidades' if operacao == 'quantidade' else 'precos'][linha] = novo
+        else:
+            self._descartar()
+
+    def publicar(self):
+        """
+        Copia o estado atual do estoque para um novo bloco compartilhado. As operações chamam este
+        método sozinhas quando o bloco está desatualizado.
+        """
+        self._descartar()
+        estoque = self.estoque
+        self._compacto = len(estoque) == len(estoque.codigos)
+        if self._compacto:
+            slots = range(len(estoque.codigos))
+            colunas = [estoque.codigos, estoque.quantidades, estoque.custos, estoque.precos, array('q', slots)]
+            descricoes = estoque.descricoes
+        else:
+            slots = array('q', estoque.slots())
+            colunas = [array('q', map(coluna.__getitem__, slots))
+                       for coluna in (estoque.codigos, estoque.quantidades, estoque.custos, estoque.precos)] + [slots]
+            descricoes = [estoque.descricoes[slot] for slot in slots]
+        linhas = len(slots)
+
+        texto = SEPARADOR.join(descricoes)
+        dados = texto.encode('utf-8')
+        tamanhos = map(len, descricoes) if len(dados) == len(texto) else (len(descricao.encode('utf-8')) for descricao in descricoes)
+        deslocamentos = array('q', [0])
+        deslocamentos.extend(accumulate(tamanho + 1 for tamanho in tamanhos)) # início de cada descrição (+1 do separador)
+
+        secoes = {}
+        tamanho = 0
+        for secao, conteudo in zip(SECOES + ('deslocamentos',), colunas + [deslocamentos]):
+            secoes[secao] = tamanho
+            tamanho += 8 * len(conteudo)
+        secoes['descricoes'] = tamanho
+        tamanho += len(dados)
+
+        self._bloco = bloco = shared_memory.SharedMemory(create=True, size=max(tamanho, 1))
+        for secao, conteudo in zip(SECOES + ('deslocamentos',), colunas + [deslocamentos]):
+            bloco.buf[secoes[secao]:secoes[secao] + 8 * len(conteudo)] = memoryview(conteudo).cast('B')
+        bloco.buf[secoes['descricoes']:tamanho] = dados
+        self._publicacao = {'nome': bloco.name, 'linhas': linhas, 'secoes': secoes}
+        self._colunas = {secao: _coluna(bloco, self._publicacao, secao, 0, linhas) for secao in ('quantidades', 'precos', 'slots')}
+        return self._publicacao
+
+    def _executar(self, tarefa, *argumentos, inicio=0, fim=None):
+        """
+        Executa a tarefa nos fragmentos das linhas [inicio, fim) e gera os resultados na ordem dos fragmentos.
+        """
+        publicacao = self._publicacao or self.publicar()
+        if self._pool is None:
+            # 'spawn' não copia o estado do processo (threads, laço asyncio) para os processos do pool
+            self._pool = ProcessPoolExecutor(max_workers=self.processos, mp_context=get_context('spawn'))
+        fim = publicacao['linhas'] if fim is None else min(fim, publicacao['linhas'])
+        inicios = range(min(inicio, fim), fim, self.tamanho_fragmento)
+        fins = [min(posicao + self.tamanho_fragmento, fim) for posicao in inicios]
+        METRICAS.linhas(fim - inicios.start)
+        repetidos = [[valor] * len(inicios) for valor in (publicacao, *argumentos)]
+        return self._pool.map(tarefa, repetidos[0], inicios, fins, *repetidos[1:])
+
+    def totais(self):
+        """
+        Recalcula (custo total, valor total) do estoque em centavos, somando os fragmentos em paralelo.
+        """
+        custo = valor = 0
+        for custo_fragmento, valor_fragmento in self._executar(_somar):
+            custo += custo_fragmento
+            valor += valor_fragmento
+        return custo, valor
+
+    def buscar(self, texto):
+        """
+        Retorna, na ordem de cadastro, os slots dos produtos cuja descrição contém `texto` (sem diferenciar
+        maiúsculas de minúsculas), percorrendo as descrições em paralelo.
+        """
+        indice = self.estoque.indice_descricoes
+        consulta = indice.normalizar(texto)
+        if not consulta:
+            return list(self.estoque.slots())
+        linhas = [linha for resultado in self._executar(_buscar, consulta, indice.sem_acentos) for linha in resultado]
+        if self._compacto:
+            return linhas
+        slots = self._colunas['slots']
+        return [slots[linha] for linha in linhas]
+
+    def linhas_relatorio(self, inicio=0, limite=None):
+        """
+        Gera o texto das linhas de produtos do relatório geral (ver `Catalogo.linhas_relatorio`), um pedaço
+        por fragmento, na ordem de cadastro. `inicio` e `limite` selecionam uma parte dos produtos.
+        """
+        return self._executar(_relatorio, inicio=inicio, fim=None if limite is None else inicio + limite)
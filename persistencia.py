@@ -0,0 +1,304 @@
+"""
+Persistência do estoque em disco: diário de alterações, instantâneos e compactação.
+
+Cada alteração do estoque (cadastro, remoção, quantidade, preço e descrição) é acrescentada ao final
+de um diário (`diario.log`), uma linha JSON por operação, com um número de sequência crescente. De
+tempos em tempos, o estado inteiro é gravado num instantâneo compacto (`instantaneo.dat`) e o diário é
+reiniciado. Ao abrir, o estoque é reconstruído a partir do último instantâneo mais as operações do
+diário com sequência posterior a ele.
+
+Durabilidade:
+- cada operação é gravada no sistema operacional assim que aplicada, então a queda do processo não
+  perde nenhuma alteração já concluída;
+- a queda da máquina pode perder as operações ainda não sincronizadas com `fsync`, que é feito a
+  cada `sincronizar_a_cada` operações e/ou a cada `intervalo_sincronizacao` segundos (verificado a
+  cada gravação) e sempre ao fechar;
+- uma última linha incompleta no diário (gravação interrompida) é descartada na abertura.
+
+Formato do instantâneo: uma linha de cabeçalho JSON, seguida das colunas de códigos, quantidades,
+custos e preços (inteiros de 64 bits, como em `array('q')`) e das descrições em UTF-8 separadas por
+'\\0'. O arquivo é gravado ao lado e renomeado por cima do anterior, então nunca fica pela metade.
+
+Exemplo de uso:
+armazenamento = ArmazenamentoEstoque('dados', sincronizar_a_cada=100)
+estoque = armazenamento.abrir()
+estoque.atualizar_quantidade(estoque.localizar(203), 45) # gravado no diário automaticamente
+armazenamento.fechar()
+"""
+import json
+import os
+import sys
+import time
+from array import array
+
+from estoque import SEPARADOR_DESCRICOES, Estoque
+
+ARQUIVO_DIARIO = 'diario.log'
+ARQUIVO_INSTANTANEO = 'instantaneo.dat'
+VERSAO_INSTANTANEO = 1
+
+def _sincronizar_diretorio(caminho):
+    """
+    Força a gravação física (`fsync`) do diretório do arquivo, para que uma troca de nome feita com
+    `os.replace` sobreviva a uma queda da máquina. Em sistemas que não permitem abrir diretórios
+    (Windows), não faz nada.
+    """
+    try:
+        descritor = os.open(os.path.dirname(os.path.abspath(caminho)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descritor)
+    finally:
+        os.close(descritor)
+
+class ArmazenamentoEstoque:
+    """
+    Mantém um `Estoque` gravado em disco, num diretório próprio.
+
+    Parâmetros:
+    diretorio (str): Diretório onde ficam o diário e o instantâneo (criado se não existir).
+    sincronizar_a_cada (int, opcional): Faz `fsync` do diário a cada N operações. Com 1, toda operação
+                                        sobrevive à queda da máquina; com 0, só o intervalo e o
+                                        fechamento sincronizam. O padrão é 1.
+    intervalo_sincronizacao (float, opcional): Faz `fsync` se já se passaram esses segundos desde o
+                                               último. O padrão (None) desativa o critério de tempo.
+    instantaneo_a_cada (int, opcional): Grava um instantâneo e reinicia o diário a cada N operações.
+                                        Com 0, só quando `gravar_instantaneo` é chamado. O padrão é 100000.
+    opcoes_estoque: Repassadas para o construtor do `Estoque` (ex.: sem_acentos=True).
+    """
+
+    def __init__(self, diretorio, sincronizar_a_cada=1, intervalo_sincronizacao=None, instantaneo_a_cada=100000,
+                 **opcoes_estoque):
+        self.diretorio = diretorio
+        self.sincronizar_a_cada = sincronizar_a_cada
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self.instantaneo_a_cada = instantaneo_a_cada
+        self._opcoes_estoque = opcoes_estoque
+        self.estoque = None
+        self.novo = None # após abrir: True se o diretório ainda não tinha nenhum dado gravado
+        self._diario = None
+        self._sequencia = 0 # sequência da última operação gravada
+        self._pendentes = 0 # operações gravadas desde o último fsync
+        self._grupo = 0 # profundidade de grupos de alterações abertos
+        self._linhas_grupo = [] # linhas acumuladas enquanto um grupo está aberto
+        self._desde_instantaneo = 0 # operações gravadas desde o último instantâneo
+        self._ultima_sincronizacao = time.monotonic()
+
+    @property
+    def caminho_diario(self):
+        return os.path.join(self.diretorio, ARQUIVO_DIARIO)
+
+    @property
+    def caminho_instantaneo(self):
+        return os.path.join(self.diretorio, ARQUIVO_INSTANTANEO)
+
+    def abrir(self):
+        """
+        Reconstrói o estoque a partir do disco e passa a gravar as suas alterações.
+
+        Retorna:
+        Estoque: O estoque recuperado (vazio, se o diretório for novo).
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.estoque = Estoque(**self._opcoes_estoque)
+        self.novo = not os.path.exists(self.caminho_instantaneo)
+        sequencia_instantaneo = self._ler_instantaneo()
+        self._sequencia = sequencia_instantaneo
+        tamanho_valido = self._reaplicar_diario(sequencia_instantaneo)
+        self.novo = self.novo and self._sequencia == 0
+
+        self._diario = open(self.caminho_diario, 'ab')
+        self._diario.truncate(tamanho_valido) # descarta uma última linha incompleta, se houver
+        self._ultima_sincronizacao = time.monotonic()
+        self.estoque.adicionar_ouvinte(self._registrar)
+        return self.estoque
+
+    def fechar(self):
+        """
+        Sincroniza e fecha o diário. O estoque deixa de ser gravado.
+        """
+        if self._diario is None:
+            return
+        self.estoque.remover_ouvinte(self._registrar)
+        self.sincronizar()
+        self._diario.close()
+        self._diario = None
+
+    def __enter__(self):
+        return self.abrir()
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def sincronizar(self):
+        """
+        Força a gravação física (`fsync`) das operações pendentes do diário.
+        """
+        self._diario.flush()
+        os.fsync(self._diario.fileno())
+        self._pendentes = 0
+        self._ultima_sincronizacao = time.monotonic()
+
+    def _registrar(self, operacao, *argumentos):
+        """
+        Ouvinte do estoque: acrescenta a operação ao diário. As operações de um grupo são acumuladas
+        e gravadas juntas quando o grupo termina.
+        """
+        if operacao == 'inicio_grupo':
+            self._grupo += 1
+            return
+        if operacao == 'fim_grupo':
+            self._grupo -= 1
+            if self._grupo == 0 and self._linhas_grupo:
+                linhas, self._linhas_grupo = self._linhas_grupo, []
+                self._gravar(linhas)
+            return
+
+        if operacao == 'cadastrar':
+            linhas = []
+            for produto in argumentos[0]:
+                self._sequencia += 1
+                linhas.append(json.dumps([self._sequencia, 'cadastrar', *produto], ensure_ascii=False))
+        elif operacao == 'remover':
+            self._sequencia += 1
+            linhas = [json.dumps([self._sequencia, 'remover', argumentos[0][1]])]
+        else: # quantidade, preco, descricao: grava o código e o valor novo
+            codigo, _, novo = argumentos
+            self._sequencia += 1
+            linhas = [json.dumps([self._sequencia, operacao, codigo, novo], ensure_ascii=False)]
+
+        if self._grupo:
+            self._linhas_grupo.extend(linhas)
+        else:
+            self._gravar(linhas)
+
+    def _gravar(self, linhas):
+        """
+        Acrescenta as linhas ao diário e aplica as regras de sincronização e de instantâneo.
+        """
+        self._diario.write(('\n'.join(linhas) + '\n').encode('utf-8'))
+        self._diario.flush() # entrega ao sistema operacional: a queda do processo não perde a operação
+        self._pendentes += len(linhas)
+        self._desde_instantaneo += len(linhas)
+
+        if (self.sincronizar_a_cada and self._pendentes >= self.sincronizar_a_cada) or \
+                (self.intervalo_sincronizacao is not None
+                 and time.monotonic() - self._ultima_sincronizacao >= self.intervalo_sincronizacao):
+            self.sincronizar()
+        if self.instantaneo_a_cada and self._desde_instantaneo >= self.instantaneo_a_cada:
+            self.gravar_instantaneo()
+
+    def _reaplicar_diario(self, sequencia_instantaneo):
+        """
+        Reaplica no estoque as operações do diário posteriores ao instantâneo.
+
+        Retorna:
+        int: O tamanho, em bytes, da parte válida do diário.
+        """
+        if not os.path.exists(self.caminho_diario):
+            return 0
+        estoque = self.estoque
+        valido = 0
+        lote = [] # cadastros consecutivos são aplicados juntos
+        with open(self.caminho_diario, 'rb') as diario:
+            for linha in diario:
+                if not linha.endswith(b'\n'):
+                    break # gravação interrompida no meio da linha
+                valido += len(linha)
+                sequencia, operacao, *argumentos = json.loads(linha)
+                self._sequencia = max(self._sequencia, sequencia)
+                if sequencia <= sequencia_instantaneo:
+                    continue # já incluída no instantâneo
+                if operacao == 'cadastrar':
+                    lote.append(tuple(argumentos))
+                    continue
+                if lote:
+                    estoque.adicionar_lote(lote)
+                    lote = []
+                if operacao == 'remover':
+                    estoque.remover(argumentos[0])
+                    continue
+                codigo, novo = argumentos
+                slot = estoque.localizar(codigo)
+                if operacao == 'quantidade':
+                    estoque.atualizar_quantidade(slot, novo)
+                elif operacao == 'preco':
+                    estoque.atualizar_preco(slot, novo)
+                elif operacao == 'descricao':
+                    estoque.atualizar_descricao(slot, novo)
+                else:
+                    raise ValueError(f"operação desconhecida no diário: {operacao!r}")
+        if lote:
+            estoque.adicionar_lote(lote)
+        return valido
+
+    def _ler_instantaneo(self):
+        """
+        Carrega o instantâneo no estoque, se existir.
+
+        Retorna:
+        int: A sequência da última operação incluída no instantâneo (0 se não houver instantâneo).
+        """
+        if not os.path.exists(self.caminho_instantaneo):
+            return 0
+        with open(self.caminho_instantaneo, 'rb') as arquivo:
+            cabecalho = json.loads(arquivo.readline())
+            if cabecalho['versao'] != VERSAO_INSTANTANEO:
+                raise ValueError(f"versão de instantâneo não suportada: {cabecalho['versao']}")
+            quantidade = cabecalho['produtos']
+            colunas = []
+            for _ in range(4): # códigos, quantidades, custos e preços
+                coluna = array('q')
+                coluna.fromfile(arquivo, quantidade)
+                if cabecalho['ordem_bytes'] != sys.byteorder:
+                    coluna.byteswap()
+                colunas.append(coluna)
+            descricoes = arquivo.read().decode('utf-8').split(SEPARADOR_DESCRICOES) if quantidade else []
+            if len(descricoes) != quantidade: # as descrições não se casariam com as colunas
+                raise ValueError(f"instantâneo corrompido: {len(descricoes)} descrições para {quantidade} produtos")
+        codigos, quantidades, custos, precos = colunas
+        self.estoque.adicionar_lote(zip(descricoes, codigos, quantidades, custos, precos))
+        self.estoque.alocador.observar(cabecalho['proximo_codigo'] - 1) # não reemite códigos já usados
+        return cabecalho['sequencia']
+
+    def gravar_instantaneo(self):
+        """
+        Grava o estado atual do estoque num instantâneo e reinicia o diário.
+        """
+        estoque = self.estoque
+        if len(estoque) == len(estoque.codigos): # sem lápides: as colunas podem ser gravadas diretamente
+            codigos, quantidades, custos, precos, descricoes = \
+                estoque.codigos, estoque.quantidades, estoque.custos, estoque.precos, estoque.descricoes
+        else:
+            vivos = list(estoque.slots())
+            codigos = array('q', [estoque.codigos[slot] for slot in vivos])
+            quantidades = array('q', [estoque.quantidades[slot] for slot in vivos])
+            custos = array('q', [estoque.custos[slot] for slot in vivos])
+            precos = array('q', [estoque.precos[slot] for slot in vivos])
+            descricoes = [estoque.descricoes[slot] for slot in vivos]
+
+        cabecalho = {
+            'versao': VERSAO_INSTANTANEO,
+            'sequencia': self._sequencia,
+            'produtos': len(codigos),
+            'proximo_codigo': estoque.alocador.proximo,
+            'ordem_bytes': sys.byteorder,
+        }
+        temporario = self.caminho_instantaneo + '.tmp'
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(json.dumps(cabecalho).encode('utf-8') + b'\n')
+            for coluna in (codigos, quantidades, custos, precos):
+                coluna.tofile(arquivo)
+            arquivo.write(SEPARADOR_DESCRICOES.join(descricoes).encode('utf-8'))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho_instantaneo)
+        _sincronizar_diretorio(self.caminho_instantaneo) # sem isso, a troca pode se perder numa queda depois de o diário já ter sido truncado
+
+        # o instantâneo já contém todas as operações do diário; as linhas antigas seriam ignoradas
+        # na abertura (pela sequência), então reiniciar o diário é seguro mesmo se o processo cair aqui
+        self._diario.truncate(0)
+        self._diario.seek(0)
+        self.sincronizar()
+        self._desde_instantaneo = 0
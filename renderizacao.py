@@ -0,0 +1,90 @@
+"""
+Renderização das listagens e relatórios em blocos de texto.
+
+As funções de exibição produzem o texto como geradores de pedaços (um pedaço por produto ou por
+linha do relatório), e `escrever` junta esses pedaços em blocos grandes antes de gravá-los na saída.
+Assim, listar 100 mil produtos custa algumas dezenas de escritas, em vez de várias chamadas a
+`print()` por produto. A saída pode ser qualquer objeto com o método `write` (terminal, arquivo,
+pipe, `io.StringIO`).
+
+Exemplo de uso:
+with open('produtos.txt', 'w') as arquivo:
+    escrever(paginar(blocos_produtos(estoque.produtos()), inicio=100, limite=50), arquivo)
+"""
+import sys
+from itertools import islice
+
+TAMANHO_BUFFER = 1 << 16 # quantidade de caracteres acumulados antes de cada escrita
+SEPARADOR_PRODUTO = "-" * 20
+
+def escrever(pedacos, saida=None, tamanho_buffer=TAMANHO_BUFFER):
+    """
+    Grava os pedaços de texto na saída, acumulando-os em blocos de pelo menos `tamanho_buffer` caracteres.
+
+    Parâmetros:
+    pedacos (iterável de str): Os pedaços de texto, já com as quebras de linha.
+    saida (objeto com `write`, opcional): Onde gravar o texto. O padrão é `sys.stdout`. Se a saída
+                                          tiver `flush`, ele é chamado no final.
+    tamanho_buffer (int, opcional): Tamanho mínimo de cada bloco gravado.
+
+    Retorna:
+    int: A quantidade de caracteres gravados.
+    """
+    if saida is None:
+        saida = sys.stdout
+    buffer = []
+    acumulado = 0
+    total = 0
+    for pedaco in pedacos:
+        buffer.append(pedaco)
+        acumulado += len(pedaco)
+        if acumulado >= tamanho_buffer:
+            saida.write(''.join(buffer))
+            total += acumulado
+            buffer.clear()
+            acumulado = 0
+    if buffer:
+        saida.write(''.join(buffer))
+        total += acumulado
+    flush = getattr(saida, 'flush', None) # basta `write`: nem toda saída tem `flush`
+    if flush is not None:
+        flush()
+    return total
+
+def paginar(pedacos, inicio=0, limite=None):
+    """
+    Retorna apenas os pedaços a partir da posição `inicio`, até no máximo `limite` pedaços
+    (todos, se `limite` for None).
+    """
+    if inicio == 0 and limite is None:
+        return iter(pedacos)
+    fim = None if limite is None else inicio + limite
+    return islice(pedacos, inicio, fim)
+
+def paginas(pedacos, tamanho):
+    """
+    Agrupa os pedaços em páginas (listas) de até `tamanho` pedaços cada.
+    """
+    pedacos = iter(pedacos)
+    while True:
+        pagina = list(islice(pedacos, tamanho))
+        if not pagina:
+            return
+        yield pagina
+
+def bloco_produto(produto):
+    """
+    Formata um produto (dicionário de atributos) no mesmo formato usado por `listar_produtos`.
+
+    Exemplo de uso:
+    bloco_produto({'descricao': 'Mouse Razer', 'codigo': '204'})
+    -> 'Produto:\\ndescricao: Mouse Razer\\ncodigo: 204\\n--------------------\\n'
+    """
+    atributos = ''.join([f"{chave}: {valor}\n" for chave, valor in produto.items()])
+    return f"Produto:\n{atributos}{SEPARADOR_PRODUTO}\n"
+
+def blocos_produtos(produtos):
+    """
+    Gera o texto de cada produto de um iterável de dicionários.
+    """
+    return map(bloco_produto, produtos)
@@ -0,0 +1,348 @@
+"""
+Serviço de rede local (TCP) para vários terminais compartilharem o mesmo estoque.
+
+O protocolo é o mesmo do modo de comandos em lote (`comandos.py`): o cliente envia um comando por
+linha, em UTF-8, e recebe uma linha JSON de resultado por comando, na ordem em que os comandos foram
+enviados. O campo "linha" do resultado é o número da linha na conexão.
+
+    -> quantidade 203 45
+    <- {"linha": 1, "comando": "quantidade", "ok": true, "resultado": null}
+
+- Leituras (buscar, consultar, listar, ordenar, esgotados, baixa, valor_total, lucro, relatorio) são atendidas
+  assim que chegam, sem esperar a fila de escritas; várias conexões são atendidas ao mesmo tempo.
+- Escritas (cadastrar, quantidade, preco, remover, movimentar, reprecificar) vão para uma única fila
+  e são aplicadas uma a uma por um único escritor. As escritas que estiverem na fila são aplicadas
+  juntas, como um grupo (`Estoque.agrupar`), para que o diário em disco seja gravado e sincronizado
+  uma vez por grupo; a resposta de uma escrita só é enviada depois que o grupo foi aplicado.
+- O cliente pode enviar vários comandos sem esperar as respostas (pipelining). Uma leitura enviada
+  depois de uma escrita ainda pendente na mesma conexão entra na fila do escritor, logo atrás dela:
+  vê exatamente as escritas enviadas antes dela na conexão, e nenhuma das enviadas depois.
+- As alterações em massa usam os comandos `movimentar` e `reprecificar` (tudo ou nada).
+- As transações (`inicio`, `confirmar`, `desfazer`) não são aceitas pelo serviço, porque o estoque é
+  compartilhado entre as conexões.
+- `listar` e `relatorio` sem limite retornam no máximo `PAGINA_PADRAO` produtos por resposta; as
+  páginas seguintes são pedidas com `listar <inicio> <limite>` e `relatorio <inicio> <limite>`.
+
+Exemplo de uso:
+async with ServidorEstoque(estoque, porta=8765):
+    async with ClienteEstoque(porta=8765) as cliente:
+        await cliente.executar('movimentar 203:-2 204:-1')
+        resultados = await cliente.executar_varios(['buscar mouse', 'valor_total'])
+
+Pela linha de comando:
+python at.py --servir 8765
+python at.py --conectar 127.0.0.1:8765 --lote movimentos.txt
+"""
+import asyncio
+import json
+import traceback
+from collections import deque
+
+from comandos import ExecutorComandos
+from estoque import Transacao
+from renderizacao import escrever, paginas
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+ESCRITAS = frozenset(('cadastrar', 'quantidade', 'preco', 'remover', 'movimentar', 'reprecificar'))
+TRANSACOES = frozenset(('inicio', 'confirmar', 'desfazer'))
+TRANSACAO_NAO_SUPORTADA = 'transações não são aceitas pelo serviço (use movimentar ou reprecificar)'
+MAX_PENDENTES = 1024 # comandos de uma conexão aguardando resposta antes de parar de ler
+MAX_GRUPO = 1024 # escritas aplicadas juntas, no máximo
+LIMITE_LINHA = 1 << 24 # tamanho máximo de uma linha de comando ou de resposta (em bytes)
+PAGINA_PADRAO = 1000 # produtos de listar/relatorio sem limite: uma resposta não pode crescer com o catálogo
+
+def _erro_interno(linha, erro):
+    return {'comando': linha.partition(' ')[0], 'ok': False, 'erro': f"erro interno: {erro!r}"}
+
+def endereco(texto, host=HOST_PADRAO):
+    """
+    Converte '[host:]porta' em (host, porta).
+
+    Exemplo de uso:
+    endereco('8765') -> ('127.0.0.1', 8765)
+    endereco('0.0.0.0:8765') -> ('0.0.0.0', 8765)
+    """
+    nome, separador, porta = texto.rpartition(':')
+    return (nome if separador and nome else host), int(porta)
+
+class ServidorEstoque:
+    """
+    Serviço TCP que executa comandos de várias conexões sobre um único estoque.
+
+    Parâmetros:
+    estoque (Estoque): O estoque compartilhado.
+    host (str, opcional): Endereço de escuta. O padrão é '127.0.0.1' (apenas a própria máquina).
+    porta (int, opcional): Porta de escuta. Com 0, o sistema escolhe uma porta livre, que fica em
+                           `self.porta` depois de `iniciar`.
+    max_grupo (int, opcional): Quantidade máxima de escritas aplicadas num mesmo grupo.
+    pagina_padrao (int, opcional): Produtos retornados por `listar` e `relatorio` sem limite. O padrão é 1000.
+    """
+
+    def __init__(self, estoque, host=HOST_PADRAO, porta=PORTA_PADRAO, max_grupo=MAX_GRUPO, pagina_padrao=PAGINA_PADRAO):
+        self.estoque = estoque
+        self.host = host
+        self.porta = porta
+        self.max_grupo = max_grupo
+        self._executor = ExecutorComandos(estoque, limite_padrao=pagina_padrao)
+        self._fila = None # escritas pendentes: (linha, futuro)
+        self._escritor = None
+        self._servidor = None
+
+    async def iniciar(self):
+        """
+        Começa a aceitar conexões (retorna logo em seguida).
+        """
+        self._fila = asyncio.Queue()
+        self._escritor = asyncio.create_task(self._escrever())
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta, limit=LIMITE_LINHA)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+
+    async def fechar(self):
+        """
+        Para de aceitar conexões e espera o escritor aplicar as escritas que já estão na fila.
+        """
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        await self._fila.put(None)
+        await self._escritor
+
+    async def servir(self):
+        """
+        Inicia o serviço e atende as conexões até a tarefa ser cancelada (ex.: Ctrl+C).
+        """
+        await self.iniciar()
+        try:
+            await self._servidor.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.fechar()
+
+    async def __aenter__(self):
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, tipo, valor, rastro):
+        await self.fechar()
+
+    def _executar(self, linha):
+        nome = linha.partition(' ')[0]
+        if nome in TRANSACOES:
+            return {'comando': nome, 'ok': False, 'erro': TRANSACAO_NAO_SUPORTADA}
+        return self._executor.executar(linha)
+
+    async def _escrever(self):
+        """
+        O único escritor: aplica as escritas da fila (e as leituras que esperam por elas), em grupos, na
+        ordem de chegada. Um erro numa escrita
+        vira uma resposta com 'ok' False; o escritor nunca para antes de `fechar`. Se a gravação do grupo
+        falhar (ex.: `fsync` do diário), o grupo inteiro é desfeito antes de responder, para que um cliente
+        que repete uma movimentação relativa não a aplique duas vezes.
+        """
+        fila = self._fila
+        parar = False
+        while not parar:
+            item = await fila.get()
+            if item is None:
+                return
+            grupo = [item]
+            while len(grupo) < self.max_grupo and not fila.empty():
+                item = fila.get_nowait()
+                if item is None:
+                    parar = True
+                    break
+                grupo.append(item)
+
+            resultados = []
+            transacao = Transacao(self.estoque) # anota as inversas, caso o grupo precise ser desfeito
+            try:
+                with self.estoque.agrupar():
+                    for linha, _ in grupo:
+                        try:
+                            resultados.append(self._executar(linha))
+                        except Exception as erro:
+                            resultados.append(_erro_interno(linha, erro))
+                transacao.confirmar()
+            except Exception as erro: # o fim do grupo falhou (ex.: gravação do diário): nenhuma escrita é confirmada
+                resultados = [_erro_interno(linha, erro) for linha, _ in grupo]
+                try:
+                    with self.estoque.agrupar(): # as inversas vão juntas para o diário
+                        transacao.desfazer()
+                except Exception:
+                    traceback.print_exc() # as inversas já foram aplicadas na memória; só a gravação delas falhou
+            for (_, futuro), resultado in zip(grupo, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+    async def _atender(self, leitor, escritor):
+        """
+        Atende uma conexão: lê os comandos e enfileira as respostas na ordem de chegada.
+        """
+        laco = asyncio.get_running_loop()
+        respostas = asyncio.Queue(MAX_PENDENTES)
+        envio = asyncio.create_task(self._enviar(respostas, escritor))
+        ultima_escrita = None
+        numero = 0
+        try:
+            async for linha in leitor:
+                if escritor.is_closing(): # o cliente foi embora: não executa o resto
+                    break
+                numero += 1
+                texto = linha.decode('utf-8', errors='replace').strip()
+                if not texto:
+                    continue
+                if texto.partition(' ')[0] in ESCRITAS:
+                    futuro = ultima_escrita = laco.create_future()
+                    await self._fila.put((texto, futuro))
+                elif ultima_escrita is not None and not ultima_escrita.done():
+                    # leitura atrás de uma escrita pendente: o escritor a executa na posição certa da fila,
+                    # depois das escritas anteriores desta conexão e antes das seguintes
+                    futuro = laco.create_future()
+                    await self._fila.put((texto, futuro))
+                else: # leitura: executada na hora
+                    futuro = laco.create_future()
+                    futuro.set_result(self._executar(texto))
+                await respostas.put((numero, futuro))
+        except (ConnectionError, ValueError): # conexão caiu ou linha maior que LIMITE_LINHA
+            pass
+        finally:
+            await respostas.put(None)
+            await envio
+            escritor.close()
+
+    async def _enviar(self, respostas, escritor):
+        """
+        Envia as respostas de uma conexão na ordem dos comandos. Se a conexão cair, continua
+        consumindo a fila (sem enviar) para não travar a leitura.
+        """
+        conectado = True
+        while True:
+            item = await respostas.get()
+            if item is None:
+                break
+            numero, futuro = item
+            resultado = await futuro
+            if conectado and escritor.is_closing():
+                conectado = False
+            if not conectado:
+                continue
+            try:
+                escritor.write((json.dumps({'linha': numero, **resultado}, ensure_ascii=False) + '\n').encode('utf-8'))
+                if respostas.empty():
+                    await escritor.drain()
+            except ConnectionError:
+                conectado = False
+        if conectado:
+            try:
+                await escritor.drain()
+            except ConnectionError:
+                pass
+
+class ClienteEstoque:
+    """
+    Cliente do `ServidorEstoque`, com suporte a pipelining: vários comandos podem ser enviados sem
+    esperar as respostas, que são casadas com os comandos pela ordem.
+
+    Parâmetros:
+    host (str, opcional): Endereço do serviço. O padrão é '127.0.0.1'.
+    porta (int, opcional): Porta do serviço.
+
+    Exemplo de uso:
+    async with ClienteEstoque(porta=8765) as cliente:
+        resultado = await cliente.executar('buscar 203')
+        print(resultado['resultado'])
+    """
+
+    def __init__(self, host=HOST_PADRAO, porta=PORTA_PADRAO):
+        self.host = host
+        self.porta = porta
+        self._leitor = None
+        self._escritor = None
+        self._pendentes = deque() # futuros das respostas, na ordem dos comandos enviados
+        self._recebedor = None
+
+    async def conectar(self):
+        self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta, limit=LIMITE_LINHA)
+        self._recebedor = asyncio.create_task(self._receber())
+
+    async def fechar(self):
+        self._escritor.close()
+        await self._recebedor
+
+    async def __aenter__(self):
+        await self.conectar()
+        return self
+
+    async def __aexit__(self, tipo, valor, rastro):
+        await self.fechar()
+
+    async def _receber(self):
+        falha = ConnectionError("conexão encerrada pelo serviço")
+        try:
+            async for linha in self._leitor:
+                resultado = json.loads(linha)
+                futuro = self._pendentes.popleft()
+                if not futuro.done(): # quem esperava pode ter desistido (futuro cancelado)
+                    futuro.set_result(resultado)
+        except ConnectionError as erro:
+            falha = erro
+        except Exception as erro: # resposta maior que LIMITE_LINHA, JSON inválido ou resposta sem comando
+            falha = ConnectionError(f"resposta inválida do serviço: {erro!r}")
+            self._escritor.close() # as respostas seguintes não podem mais ser casadas com os comandos
+        while self._pendentes: # conexão encerrada com comandos sem resposta
+            futuro = self._pendentes.popleft()
+            if not futuro.done():
+                futuro.set_exception(falha)
+
+    def enviar(self, comando):
+        """
+        Envia um comando sem esperar a resposta.
+
+        Retorna:
+        asyncio.Future: O futuro que receberá o resultado (dicionário) do comando.
+
+        Levanta:
+        ValueError: Se o comando estiver vazio ou tiver mais de uma linha.
+        ConnectionError: Se a conexão já foi encerrada.
+        """
+        comando = comando.strip()
+        if not comando or '\n' in comando:
+            raise ValueError(f"comando inválido: {comando!r}")
+        if self._recebedor.done():
+            raise ConnectionError("conexão encerrada pelo serviço")
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes.append(futuro)
+        self._escritor.write((comando + '\n').encode('utf-8'))
+        return futuro
+
+    async def executar(self, comando):
+        """
+        Envia um comando e espera o resultado.
+        """
+        futuro = self.enviar(comando)
+        await self._escritor.drain()
+        return await futuro
+
+    async def executar_varios(self, comandos):
+        """
+        Envia vários comandos de uma vez (pipelining) e retorna a lista de resultados, na mesma ordem.
+        """
+        futuros = []
+        for comando in comandos:
+            futuros.append(self.enviar(comando))
+            if len(futuros) % MAX_PENDENTES == 0:
+                await self._escritor.drain()
+        await self._escritor.drain()
+        return await asyncio.gather(*futuros)
+
+async def encaminhar_lote(host, porta, entrada, saida=None, tamanho=MAX_PENDENTES):
+    """
+    Envia os comandos de `entrada` (iterável de linhas) ao serviço, em blocos de `tamanho` comandos
+    enviados sem esperar as respostas, e escreve os resultados (linhas JSON) em `saida` (o padrão é o
+    terminal).
+    """
+    async with ClienteEstoque(host, porta) as cliente:
+        for bloco in paginas((linha for linha in entrada if linha.strip()), tamanho):
+            resultados = await cliente.executar_varios(bloco)
+            escrever((json.dumps(resultado, ensure_ascii=False) + '\n' for resultado in resultados), saida)
@@ -0,0 +1,110 @@
+"""
+Testes dos alertas de estoque: entrega imediata, entrega em lote no fim dos grupos de alterações,
+limites próprios e entrega agendada com `intervalo`.
+"""
+import io
+import threading
+import unittest
+from contextlib import redirect_stderr
+
+from alertas import BAIXO, ESGOTADO, NORMAL, Alerta, Alertas
+from estoque import Estoque, interpretar_produto
+
+def estoque_exemplo():
+    estoque = Estoque(verificar=True)
+    estoque.adicionar_lote([interpretar_produto(f"Produto {codigo};{codigo};{10 * codigo};1.00;2.00") for codigo in range(1, 6)])
+    return estoque # quantidades 10, 20, 30, 40 e 50
+
+class TesteAlertas(unittest.TestCase):
+    def setUp(self):
+        self.estoque = estoque_exemplo()
+        self.entregas = []
+        self.alertas = Alertas(self.estoque, limite=15)
+        self.alertas.assinar(self.entregas.append)
+
+    def tearDown(self):
+        self.alertas.fechar()
+
+    def test_alteracao_avulsa_e_entregue_na_hora(self):
+        self.estoque.definir_quantidade(2, 5)
+        self.assertEqual(self.entregas, [[Alerta(2, NORMAL, BAIXO, 5, 15)]])
+        self.estoque.definir_quantidade(2, 3) # continua baixo: sem alerta
+        self.estoque.definir_quantidade(2, 0)
+        self.estoque.definir_quantidade(2, 40) # volta ao normal: também avisa
+        self.assertEqual(self.entregas[1:], [[Alerta(2, BAIXO, ESGOTADO, 0, 15)], [Alerta(2, ESGOTADO, NORMAL, 40, 15)]])
+
+    def test_movimentacao_em_massa_gera_uma_entrega(self):
+        self.estoque.movimentar_lote([(3, -30), (4, -30), (5, -45), (5, +45), (1, +20), (2, -20), (2, +1)])
+        self.assertEqual(len(self.entregas), 1)
+        self.assertEqual(self.entregas[0], [Alerta(3, NORMAL, ESGOTADO, 0, 15), Alerta(4, NORMAL, BAIXO, 10, 15),
+                                            Alerta(1, BAIXO, NORMAL, 30, 15), Alerta(2, NORMAL, BAIXO, 1, 15)])
+        # o produto 5 esgotou e voltou dentro do lote: nenhum alerta
+
+    def test_grupo_de_alteracoes_e_remocao(self):
+        with self.estoque.agrupar():
+            self.estoque.definir_quantidade(3, 1)
+            self.estoque.definir_quantidade(4, 2)
+            self.estoque.remover(4) # o alerta pendente do produto removido é descartado
+            self.assertEqual(self.entregas, [])
+        self.assertEqual(self.entregas, [[Alerta(3, NORMAL, BAIXO, 1, 15)]])
+
+    def test_cadastro_em_lote(self):
+        self.estoque.adicionar_lote([interpretar_produto('Novo;10;0;1.00;2.00'), interpretar_produto('Cheio;11;90;1.00;2.00'),
+                                     interpretar_produto('Pouco;12;4;1.00;2.00')])
+        self.assertEqual(self.entregas, [[Alerta(10, None, ESGOTADO, 0, 15), Alerta(12, None, BAIXO, 4, 15)]])
+
+    def test_limites(self):
+        self.alertas.definir_limite(35, codigo=3)
+        self.assertEqual(self.entregas, [[Alerta(3, NORMAL, BAIXO, 30, 35)]])
+        self.alertas.definir_limite(45) # o produto 3 tem limite próprio e não muda
+        self.assertEqual(self.entregas[1], [Alerta(2, NORMAL, BAIXO, 20, 45), Alerta(4, NORMAL, BAIXO, 40, 45)])
+        self.assertEqual(self.alertas.atuais(), [Alerta(1, None, BAIXO, 10, 45), Alerta(2, None, BAIXO, 20, 45),
+                                                 Alerta(3, None, BAIXO, 30, 35), Alerta(4, None, BAIXO, 40, 45)])
+        self.alertas.remover_limite(3) # volta ao limite de todos: continua baixo, sem alerta
+        self.assertEqual(len(self.entregas), 2)
+        self.assertEqual(self.alertas.limite_de(3), 45)
+
+    def test_assinante_com_erro_nao_interrompe_os_demais(self):
+        def falhar(alertas):
+            raise RuntimeError('falha simulada')
+        self.alertas.cancelar(self.entregas.append)
+        self.alertas.assinar(falhar)
+        self.alertas.assinar(self.entregas.append)
+        with redirect_stderr(io.StringIO()):
+            self.estoque.definir_quantidade(1, 0)
+        self.assertEqual(self.entregas, [[Alerta(1, BAIXO, ESGOTADO, 0, 15)]])
+        self.assertEqual(self.estoque.quantidades[self.estoque.localizar(1)], 0)
+
+class TesteAlertasComIntervalo(unittest.TestCase):
+    def test_alteracoes_seguidas_sao_entregues_juntas(self):
+        estoque = estoque_exemplo()
+        entregas, entregue = [], threading.Event()
+        def receber(alertas):
+            entregas.append(alertas)
+            entregue.set()
+        with Alertas(estoque, limite=15, intervalo=0.2) as alertas:
+            alertas.assinar(receber)
+            estoque.definir_quantidade(2, 5)
+            estoque.definir_quantidade(3, 0)
+            estoque.definir_quantidade(2, 1)
+            self.assertTrue(entregue.wait(5))
+            self.assertEqual(entregas, [[Alerta(2, NORMAL, BAIXO, 1, 15), Alerta(3, NORMAL, ESGOTADO, 0, 15)]])
+            entregue.clear()
+            estoque.definir_quantidade(4, 1)
+            self.assertTrue(entregue.wait(5)) # o temporizador é agendado de novo para as alterações seguintes
+            self.assertEqual(entregas[1], [Alerta(4, NORMAL, BAIXO, 1, 15)])
+
+    def test_fechar_entrega_os_pendentes(self):
+        estoque = estoque_exemplo()
+        entregas = []
+        alertas = Alertas(estoque, limite=15, intervalo=60)
+        alertas.assinar(entregas.append)
+        estoque.definir_quantidade(5, 0)
+        self.assertEqual(entregas, [])
+        alertas.fechar() # cancela o temporizador e entrega o que ficou pendente
+        self.assertEqual(entregas, [[Alerta(5, NORMAL, ESGOTADO, 0, 15)]])
+        estoque.definir_quantidade(5, 1) # já não acompanha o estoque
+        self.assertEqual(len(entregas), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Testes dos motores de análise: o motor NumPy (quando instalado) tem de dar as mesmas respostas do motor
+Python, inclusive quando as contas não cabem em int64.
+"""
+import random
+import unittest
+
+import analitico
+from analitico import MotorPython, motor_analitico, prefixo
+from catalogo import Catalogo
+from estoque import LIMITE_INTEIRO, Estoque
+
+def estoque_aleatorio(quantidade=3000, semente=7):
+    sorteio = random.Random(semente)
+    nomes = ['Monitor', 'Mouse', 'Teclado', 'Cabo', 'Impressora']
+    estoque = Estoque()
+    for codigo in range(1, quantidade + 1):
+        custo = sorteio.randint(0, 50000)
+        estoque.adicionar(f"{sorteio.choice(nomes)} {codigo % 17}", codigo, sorteio.randint(0, 300), custo,
+                          custo + sorteio.choice([0, sorteio.randint(0, 50000)]))
+    for codigo in sorteio.sample(range(1, quantidade + 1), quantidade // 5):
+        estoque.remover(codigo) # deixa lápides no meio das colunas
+    return estoque
+
+def respostas(motor):
+    slots, custos_totais, faturamentos_totais = motor.totais_por_item()
+    return {
+        'totais_por_item': (list(slots), list(map(int, custos_totais)), list(map(int, faturamentos_totais))),
+        'totais': motor.totais(),
+        'agrupar': motor.agrupar(),
+        'agrupar_duas_palavras': motor.agrupar(prefixo(2)),
+        'maiores_valor': motor.maiores(25, por='valor'),
+        'maiores_margem': motor.maiores(25, por='margem'),
+        'todos_por_margem': motor.maiores(10 ** 6, por='margem'),
+    }
+
+class TesteMotorPython(unittest.TestCase):
+    def test_totais_conferem_com_as_somas_do_estoque(self):
+        estoque = estoque_aleatorio()
+        self.assertEqual(MotorPython(estoque).totais(), estoque.recalcular_totais())
+        self.assertEqual(MotorPython(estoque).totais(), estoque.totais())
+
+    def test_criterio_invalido(self):
+        with self.assertRaises(ValueError):
+            MotorPython(estoque_aleatorio(10)).maiores(3, por='codigo')
+
+@unittest.skipIf(analitico.np is None, "NumPy não instalado")
+class TesteMotorNumpy(unittest.TestCase):
+    def test_mesmas_respostas_do_motor_python(self):
+        estoque = estoque_aleatorio()
+        self.assertEqual(respostas(motor_analitico(estoque, usar_numpy=True)), respostas(MotorPython(estoque)))
+
+    def test_estoque_vazio(self):
+        estoque = Estoque()
+        self.assertEqual(respostas(motor_analitico(estoque, usar_numpy=True)), respostas(MotorPython(estoque)))
+
+    def test_valores_que_estourariam_int64_usam_o_motor_python(self):
+        estoque = estoque_aleatorio(50)
+        estoque.adicionar('Lote gigante', 999, 10 ** 10, 10 ** 10, 10 ** 10) # 10^20 centavos não cabe em int64
+        motor = motor_analitico(estoque, usar_numpy=True)
+        self.assertFalse(motor.cabe_em_int64())
+        self.assertEqual(respostas(motor), respostas(MotorPython(estoque)))
+        self.assertEqual(motor.totais(), estoque.totais())
+
+        estoque.adicionar('Preço máximo', 1000, 0, 1, LIMITE_INTEIRO) # sem quantidade, mas preço - custo estouraria
+        estoque.remover(999)
+        self.assertFalse(motor.cabe_em_int64())
+        self.assertEqual(respostas(motor), respostas(MotorPython(estoque)))
+
+    def test_relatorio_igual_com_os_dois_motores(self):
+        catalogo = Catalogo()
+        catalogo._estoque = estoque_aleatorio(500)
+        linhas_numpy = list(catalogo.linhas_relatorio())
+        original = analitico.motor_analitico
+        analitico.motor_analitico = lambda estoque, usar_numpy=None: MotorPython(estoque)
+        try:
+            linhas_python = list(catalogo.linhas_relatorio())
+        finally:
+            analitico.motor_analitico = original
+        self.assertEqual(linhas_numpy, linhas_python)
+
+if __name__ == '__main__':
+    unittest.main()
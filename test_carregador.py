@@ -0,0 +1,80 @@
+"""
+Testes da carga em massa: registros com problema, quebras de linha do CSV e carga com vários processos.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from carregador import carregar_arquivo
+from estoque import Estoque
+
+class TesteCarregador(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def arquivo(self, nome, conteudo):
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_registros_com_problema_nao_interrompem_a_carga(self):
+        caminho = self.arquivo('produtos.txt',
+                               b'Caf\xe9;1;5;1.00;2.00#'                      # byte inválido em UTF-8
+                               b'Bom;2;3;1.00;2.00#'
+                               b'Grande;3;99999999999999999999;1.00;2.00#'    # quantidade fora do limite
+                               b'Caro;4;1;1e30;2.00#'                         # custo fora da precisão
+                               b'Repetido;2;1;1.00;2.00#'
+                               b'Incompleto;5;1#'
+                               b'Outro;6;1;1.00;2.00')
+        for tamanho_bloco in (4, 1 << 20):
+            estoque = Estoque(verificar=True)
+            resultado = carregar_arquivo(estoque, caminho, tamanho_bloco=tamanho_bloco)
+            self.assertEqual(resultado.carregados, 2)
+            self.assertEqual(resultado.rejeitados, 5)
+            self.assertEqual(sorted(erro.posicao for erro in resultado.erros), [1, 3, 4, 5, 6])
+            self.assertEqual([estoque.codigos[slot] for slot in estoque.slots()], [2, 6])
+            estoque.totais()
+
+    def test_csv_com_crlf_partido_entre_blocos(self):
+        linhas = ['descricao;codigo;quantidade;custo_item;preco_venda', 'Mouse;1;5;1.00;2.00', 'Teclado;2;3;1.00;2.00',
+                  'Incompleto;3', 'Cabo;4;1;1.00;2.00', 'Ruim;5;x;1.00;2.00']
+        conteudo = '\r\n'.join(linhas).encode() + b'\r\n'
+        caminho = self.arquivo('produtos.csv', conteudo)
+        # tamanhos de bloco que deixam o '\r' no fim de um bloco e o '\n' no começo do seguinte
+        cortes = [conteudo.index(b'\r\n', posicao) + 1 for posicao in range(0, len(conteudo) - 2, 7)]
+        for tamanho_bloco in sorted(set(cortes)) + [1, 1 << 20]:
+            estoque = Estoque(verificar=True)
+            resultado = carregar_arquivo(estoque, caminho, tamanho_bloco=tamanho_bloco)
+            self.assertEqual(resultado.carregados, 3, tamanho_bloco)
+            self.assertEqual([erro.posicao for erro in resultado.erros], [4, 6], tamanho_bloco) # números das linhas no arquivo
+            self.assertEqual([estoque.codigos[slot] for slot in estoque.slots()], [1, 2, 4])
+
+    def test_separadores_de_linha_do_unicode_ficam_dentro_dos_campos(self):
+        descricoes = ['Cabo\x85USB', 'Mouse sem fio', 'Hub\x1c\x1d\x1e4 portas', 'Fonte  12V', 'Tela\x0b\x0c']
+        conteudo = ''.join(f"{descricao};{codigo};1;1.00;2.00\n" for codigo, descricao in enumerate(descricoes, 1))
+        conteudo += 'Ruim;9;1\r' + 'Velho;10;1;1.00;2.00\r' # '\r' sozinho também termina a linha
+        caminho = self.arquivo('produtos.csv', conteudo.encode())
+        for tamanho_bloco in (3, 1 << 20):
+            estoque = Estoque(verificar=True)
+            resultado = carregar_arquivo(estoque, caminho, tamanho_bloco=tamanho_bloco)
+            self.assertEqual([estoque.descricoes[slot] for slot in estoque.slots()], descricoes + ['Velho'])
+            self.assertEqual([erro.posicao for erro in resultado.erros], [6])
+
+    def test_carga_com_varios_processos_mantem_a_ordem(self):
+        conteudo = ''.join(f"Produto {codigo};{codigo};{codigo % 5};1.00;2.00\r\n" if codigo % 50 else f"Ruim;{codigo}\r\n"
+                           for codigo in range(1, 1001))
+        caminho = self.arquivo('produtos.csv', conteudo.encode())
+        estoque = Estoque(verificar=True)
+        resultado = carregar_arquivo(estoque, caminho, tamanho_bloco=1000, tamanho_lote=64, processos=2)
+        self.assertEqual(resultado.carregados, 980)
+        self.assertEqual([erro.posicao for erro in resultado.erros], list(range(50, 1001, 50)))
+        self.assertEqual([estoque.codigos[slot] for slot in estoque.slots()], [codigo for codigo in range(1, 1001) if codigo % 50])
+        estoque.totais()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Testes do modo de comandos em lote: resultados em JSON, transações e erros que não interrompem a entrada.
+"""
+import io
+import json
+import unittest
+
+from comandos import TRANSACAO_DESFEITA, ExecutorComandos, executar_lote
+from estoque import Estoque, Transacao, interpretar_produto
+
+def estoque_exemplo(quantidade=10):
+    estoque = Estoque(verificar=True)
+    estoque.adicionar_lote([interpretar_produto(f"Produto {codigo};{codigo};{codigo % 7};{codigo}.50;{2 * codigo}.00")
+                            for codigo in range(1, quantidade + 1)])
+    return estoque
+
+def estado(estoque):
+    return [estoque.tupla(slot) for slot in estoque.slots()]
+
+def por_codigo(estoque): # desfazer uma remoção cadastra o produto de novo, no fim das colunas
+    return sorted(estado(estoque), key=lambda produto: produto[1])
+
+def executar(estoque, texto):
+    saida = io.StringIO()
+    executar_lote(estoque, io.StringIO(texto), saida)
+    return [json.loads(linha) for linha in saida.getvalue().splitlines()]
+
+class TesteTransacao(unittest.TestCase):
+    def test_transacao_desfeita_volta_ao_estado_inicial(self):
+        estoque = estoque_exemplo()
+        inicial, totais = estado(estoque), estoque.totais()
+        with self.assertRaises(ValueError):
+            with Transacao(estoque):
+                estoque.definir_quantidade(3, 100)
+                estoque.remover(5)
+                estoque.adicionar(*interpretar_produto('Novo;50;1;1.00;2.00'))
+                estoque.definir_quantidade(4, -1) # falha: tudo acima é desfeito
+        self.assertEqual(por_codigo(estoque), inicial)
+        self.assertEqual(estoque.totais(), totais)
+        self.assertNotIn(50, estoque)
+
+class TesteComandos(unittest.TestCase):
+    def test_resultados_em_json_por_linha(self):
+        estoque = estoque_exemplo()
+        resultados = executar(estoque, 'quantidade 3 40\n\npreco 3 9.99\nvoar 1\nbuscar 3\ncadastrar Novo;;2;1.00;3.00\n')
+        self.assertEqual([(resultado['linha'], resultado['comando'], resultado['ok']) for resultado in resultados],
+                         [(1, 'quantidade', True), (3, 'preco', True), (4, 'voar', False), (5, 'buscar', True),
+                          (6, 'cadastrar', True)])
+        self.assertEqual(resultados[3]['resultado'][0]['quantidade'], '40')
+        self.assertEqual(resultados[3]['resultado'][0]['preco_venda'], '9.99')
+        self.assertIn(11, estoque) # código vazio gera o próximo código livre
+        estoque.totais()
+
+    def test_erro_na_transacao_desfaz_e_ignora_ate_o_fim_dela(self):
+        estoque = estoque_exemplo()
+        inicial = estado(estoque)
+        resultados = executar(estoque, 'inicio\nquantidade 1 50\nremover 2\nquantidade 3 -1\nquantidade 4 9\nconfirmar\n'
+                                       'quantidade 5 8\n')
+        self.assertEqual([resultado['ok'] for resultado in resultados], [True, True, True, False, False, False, True])
+        self.assertEqual(resultados[4]['erro'], TRANSACAO_DESFEITA)
+        self.assertEqual(resultados[5]['erro'], TRANSACAO_DESFEITA)
+        self.assertEqual(por_codigo(estoque), [produto if produto[1] != 5 else produto[:2] + (8,) + produto[3:] for produto in inicial])
+        estoque.totais()
+
+    def test_transacao_aberta_no_fim_da_entrada_e_desfeita(self):
+        estoque = estoque_exemplo()
+        inicial = estado(estoque)
+        resultados = executar(estoque, 'inicio\nmovimentar 1:+5 2:-1\nremover 3\n')
+        self.assertTrue(all(resultado['ok'] for resultado in resultados))
+        self.assertEqual(por_codigo(estoque), inicial)
+
+    def test_lote_rejeitado_traz_os_erros(self):
+        estoque = estoque_exemplo()
+        resultado, = executar(estoque, 'movimentar 1:+5 99:+1 2:-100\n')
+        self.assertFalse(resultado['ok'])
+        self.assertEqual([erro[:2] for erro in resultado['erros']], [[2, 99], [3, 2]])
+        self.assertEqual(estoque.quantidades[estoque.localizar(1)], 1)
+
+    def test_executor_desfaz_a_transacao_em_erro_inesperado(self):
+        estoque = estoque_exemplo()
+        executor = ExecutorComandos(estoque)
+        executor.executar('inicio')
+        self.assertTrue(executor.executar('quantidade 1 50')['ok'])
+        def falhar(*argumentos):
+            raise OverflowError('falha simulada')
+        estoque.definir_preco = falhar
+        resultado = executor.executar('preco 1 3')
+        self.assertFalse(resultado['ok'])
+        self.assertEqual(estoque.quantidades[estoque.localizar(1)], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Testes das consultas compostas: o planejador tem de dar as mesmas respostas de uma varredura simples,
+qualquer que seja o caminho de acesso escolhido, e os ganchos de `Predicado` têm de valer para
+predicados novos.
+"""
+import random
+import unittest
+
+from consultas import (ORDENS, Codigo, Custo, Descricao, E, Margem, Ou, Predicado, Preco, Quantidade, _Faixa,
+                       consultar, interpretar_consulta, planejar)
+from estoque import Estoque
+
+NOMES = ['Mouse Razer', 'Mouse Logitech', 'Teclado', 'Monitor Samsung', 'Cabo USB', 'Hub']
+
+def estoque_aleatorio(quantidade=600, semente=5):
+    sorteio = random.Random(semente)
+    estoque = Estoque()
+    for codigo in range(1, quantidade + 1):
+        custo = sorteio.randint(100, 50000)
+        estoque.adicionar(f"{sorteio.choice(NOMES)} {codigo % 11}", codigo, sorteio.randint(0, 30), custo,
+                          custo + sorteio.randint(0, 50000))
+    for codigo in sorteio.sample(range(1, quantidade + 1), quantidade // 4):
+        estoque.remover(codigo) # deixa lápides no meio das colunas
+    return estoque, sorteio
+
+def margem(produto):
+    return (produto[4] - produto[3]) / produto[4] if produto[4] else 0.0
+
+def dentro(valor, minimo, maximo):
+    return (minimo is None or minimo <= valor) and (maximo is None or valor <= maximo)
+
+CHAVES = {'codigo': lambda produto: produto[1], 'descricao': lambda produto: produto[0],
+          'quantidade': lambda produto: produto[2], 'custo': lambda produto: produto[3],
+          'preco': lambda produto: produto[4], 'valor': lambda produto: produto[2] * produto[4], 'margem': margem}
+
+def predicado_aleatorio(sorteio, profundidade=0):
+    """
+    Sorteia um predicado e a função equivalente sobre a tupla do produto, escrita sem os índices.
+    """
+    tipo = sorteio.randrange(8 if profundidade < 2 else 6)
+    if tipo == 0:
+        texto = sorteio.choice(['mouse', 'MO', 'r', 'samsung', 'usb 1', 'xyz'])
+        return Descricao(texto), lambda produto: texto.casefold() in produto[0].casefold()
+    if tipo == 1:
+        codigos = {sorteio.randint(1, 700) for _ in range(sorteio.randint(1, 4))}
+        return Codigo(*codigos), lambda produto: produto[1] in codigos
+    if tipo in (2, 3, 4):
+        minimo = sorteio.choice([None, sorteio.randint(0, 20)])
+        maximo = sorteio.choice([None, sorteio.randint(0, 30)]) if minimo is not None else sorteio.randint(0, 30)
+        escala = 1 if tipo == 2 else 3000
+        minimo, maximo = [None if valor is None else valor * escala for valor in (minimo, maximo)]
+        classe, coluna = {2: (Quantidade, 2), 3: (Custo, 3), 4: (Preco, 4)}[tipo]
+        return classe(minimo, maximo), lambda produto: dentro(produto[coluna], minimo, maximo)
+    if tipo == 5:
+        minimo = sorteio.random()
+        return Margem(minimo=minimo), lambda produto: minimo <= margem(produto)
+    (esquerda, testar_esquerda), (direita, testar_direita) = [predicado_aleatorio(sorteio, profundidade + 1) for _ in range(2)]
+    if tipo == 6:
+        return esquerda & direita, lambda produto: testar_esquerda(produto) and testar_direita(produto)
+    return esquerda | direita, lambda produto: testar_esquerda(produto) or testar_direita(produto)
+
+def varredura(estoque, testar, ordem, limite):
+    slots = [slot for slot in estoque.slots() if testar(estoque.tupla(slot))]
+    if ordem:
+        chave = CHAVES[ordem.lstrip('-')]
+        slots.sort(key=lambda slot: chave(estoque.tupla(slot)), reverse=ordem.startswith('-')) # estável: empates na ordem de cadastro
+    return slots if limite is None else slots[:limite]
+
+class SemEstoque(Predicado):
+    """Predicado sem índice: usa os ganchos padrão de `Predicado`."""
+
+    def preparar(self, estoque):
+        quantidades = estoque.quantidades
+        return lambda slot: quantidades[slot] == 0
+
+class TestePredicado(unittest.TestCase):
+    def test_ganchos_abstratos(self):
+        with self.assertRaises(TypeError):
+            Predicado()
+        with self.assertRaises(TypeError):
+            _Faixa(1, 2) # falta `_valor`
+
+    def test_ganchos_padrao_de_um_predicado_novo(self):
+        estoque, _ = estoque_aleatorio()
+        esgotados = [slot for slot in estoque.slots() if estoque.quantidades[slot] == 0]
+        predicado = SemEstoque()
+        self.assertIsNone(predicado.estimar(estoque))
+        self.assertEqual(predicado.candidatos(estoque), list(estoque.slots()))
+        self.assertEqual(planejar(estoque, predicado, limite=5).acesso, 'varredura')
+        self.assertEqual(consultar(estoque, predicado), esgotados)
+        self.assertEqual(consultar(estoque, predicado, limite=3), esgotados[:3])
+
+        # combinado com E, o planejador parte do predicado que tem índice
+        combinado = predicado & Descricao('mouse')
+        self.assertEqual(combinado.estimar(estoque), Descricao('mouse').estimar(estoque))
+        self.assertEqual(planejar(estoque, combinado).acesso, 'indice')
+        self.assertEqual(consultar(estoque, combinado),
+                         [slot for slot in esgotados if 'mouse' in estoque.descricoes[slot].casefold()])
+        # com OU, um lado sem índice obriga a varrer o catálogo
+        self.assertIsNone((predicado | Codigo(1)).estimar(estoque))
+
+    def test_e_sem_nenhum_indice_varre_o_catalogo(self):
+        estoque, _ = estoque_aleatorio()
+        consulta = E(Preco(maximo=20000), Margem(minimo=0.5))
+        self.assertIsNone(consulta.estimar(estoque))
+        self.assertEqual(consulta.candidatos(estoque), list(estoque.slots()))
+        self.assertEqual(consultar(estoque, consulta, ordem='-margem'),
+                         varredura(estoque, lambda produto: produto[4] <= 20000 and margem(produto) >= 0.5, '-margem', None))
+
+class TesteConsultas(unittest.TestCase):
+    def test_mesmas_respostas_da_varredura(self):
+        estoque, sorteio = estoque_aleatorio()
+        for _ in range(1500):
+            onde, testar = (None, lambda produto: True) if sorteio.random() < 0.1 else predicado_aleatorio(sorteio)
+            ordem = sorteio.choice([None, None] + [sinal + campo for campo in ORDENS for sinal in ('', '-')])
+            limite = sorteio.choice([None, 0, 1, 5, 50, 10 ** 6])
+            self.assertEqual(consultar(estoque, onde, ordem, limite), varredura(estoque, testar, ordem, limite),
+                             planejar(estoque, onde, ordem, limite).descricao)
+
+    def test_consulta_em_texto(self):
+        estoque, _ = estoque_aleatorio()
+        onde, ordem, limite = interpretar_consulta('quantidade<7 margem>30% ordem=-valor limite=50')
+        self.assertEqual((ordem, limite), ('-valor', 50))
+        self.assertEqual(consultar(estoque, onde, ordem, limite),
+                         varredura(estoque, lambda produto: produto[2] < 7 and margem(produto) > 0.3, '-valor', 50))
+        onde, _, _ = interpretar_consulta('descricao~"mouse razer" ou codigo=3,4')
+        self.assertIsInstance(onde, Ou)
+        self.assertEqual(consultar(estoque, onde),
+                         varredura(estoque, lambda produto: 'mouse razer' in produto[0].casefold() or produto[1] in (3, 4), None, None))
+        for texto in ('quantidade<x', 'descricao=mouse', 'ou codigo=1', 'preco~1', 'ordem=-valor limite=a'):
+            with self.assertRaises(ValueError):
+                interpretar_consulta(texto)
+        with self.assertRaises(ValueError):
+            planejar(estoque, ordem='peso')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Testes do estoque: compactação, modo de verificação, limites das colunas e alterações em massa.
+
+Rodar com:
+python -m pytest -q
+ou
+python -m unittest test_estoque
+"""
+import unittest
+
+from estoque import (COMPACTACAO_MINIMA, LIMITE_INTEIRO, PRECO_MENOR_QUE_CUSTO, PRODUTO_NAO_ENCONTRADO, QUANTIDADE_NAO_PERMITIDA,
+                     Estoque, LoteRejeitado, interpretar_produto)
+
+def estoque_exemplo(quantidade=10, **opcoes):
+    estoque = Estoque(verificar=True, **opcoes)
+    estoque.adicionar_lote([interpretar_produto(f"Produto {codigo};{codigo};{codigo % 7};{codigo}.50;{2 * codigo}.00")
+                            for codigo in range(1, quantidade + 1)])
+    return estoque
+
+def estado(estoque):
+    return [estoque.tupla(slot) for slot in estoque.slots()]
+
+class TesteEstoque(unittest.TestCase):
+    def test_modo_de_verificacao_acusa_totais_divergentes(self):
+        estoque = estoque_exemplo()
+        estoque.definir_quantidade(2, 40)
+        estoque.totais() # somas mantidas corretas: não levanta
+        estoque._custo_total += 1
+        with self.assertRaises(AssertionError):
+            estoque.totais()
+
+    def test_compactacao_com_descricao_vazia(self):
+        estoque = estoque_exemplo(2 * COMPACTACAO_MINIMA)
+        estoque.adicionar('', 9999, 1, 100, 200)
+        for codigo in range(1, COMPACTACAO_MINIMA + 2):
+            estoque.remover(codigo) # mais da metade vira lápide: o estoque compacta as colunas
+        self.assertLess(len(estoque.codigos), 2 * COMPACTACAO_MINIMA)
+        self.assertEqual(estoque.buscar_descricao('produto 2000'), [estoque.localizar(2000)])
+        estoque.remover(9999) # o slot da descrição vazia continua no índice
+        self.assertNotIn(9999, estoque)
+        estoque.totais()
+
+    def test_rejeita_valores_que_nao_cabem_nas_colunas(self):
+        estoque = estoque_exemplo()
+        for produto in [('Grande', LIMITE_INTEIRO + 1, 1, 1, 1), ('Grande', 99, LIMITE_INTEIRO + 1, 1, 1),
+                        ('Grande', 99, 1, 1, LIMITE_INTEIRO + 1)]:
+            with self.assertRaises(ValueError):
+                estoque.adicionar(*produto)
+        with self.assertRaises(ValueError):
+            estoque.definir_quantidade(1, LIMITE_INTEIRO + 1)
+        self.assertEqual(len(estoque), 10)
+        self.assertNotIn(99, estoque)
+        estoque.totais()
+
+class TesteLotes(unittest.TestCase):
+    def setUp(self):
+        self.estoque = estoque_exemplo()
+        self.inicial = estado(self.estoque)
+        self.operacoes = []
+        self.estoque.adicionar_ouvinte(lambda operacao, *argumentos: self.operacoes.append(operacao))
+
+    def assertRejeitado(self, funcao, argumento, erros):
+        with self.assertRaises(LoteRejeitado) as contexto:
+            funcao(argumento)
+        self.assertEqual(contexto.exception.erros, erros)
+        self.assertEqual(estado(self.estoque), self.inicial) # nada foi aplicado
+        self.assertEqual(self.operacoes, []) # nem avisado aos ouvintes (diário, alertas)
+
+    def test_movimentacao_rejeitada_nao_altera_nada(self):
+        self.assertRejeitado(self.estoque.movimentar_lote, [(1, 5), (2, 1.5), (99, 1), (3, -10), (4, '2')], [
+            (2, 2, "movimentação inválida: (2, 1.5)"),
+            (3, 99, PRODUTO_NAO_ENCONTRADO),
+            (4, 3, QUANTIDADE_NAO_PERMITIDA),
+            (5, 4, "movimentação inválida: (4, '2')"),
+        ])
+        self.assertRejeitado(self.estoque.movimentar_lote, [(1, LIMITE_INTEIRO)], [(1, 1, QUANTIDADE_NAO_PERMITIDA)])
+
+    def test_reprecificacao_rejeitada_nao_altera_nada(self):
+        self.assertRejeitado(self.estoque.reprecificar_lote, [(1, 1000), (2, 99.5), (3, 1), (98, 500)], [
+            (2, 2, "preço inválido: (2, 99.5)"),
+            (3, 3, PRECO_MENOR_QUE_CUSTO),
+            (4, 98, PRODUTO_NAO_ENCONTRADO),
+        ])
+
+    def test_lote_aceito_aplica_tudo_num_grupo(self):
+        self.estoque.movimentar_lote([(1, 5), (2, 3), (1, -2)])
+        self.assertEqual([self.estoque.quantidades[self.estoque.localizar(codigo)] for codigo in (1, 2)], [4, 5])
+        self.estoque.reprecificar_lote([(1, 1000), (1, 1200)])
+        self.assertEqual(self.estoque.precos[self.estoque.localizar(1)], 1200) # vale o último preço
+        self.assertEqual(self.operacoes, ['inicio_grupo', 'quantidade', 'quantidade', 'fim_grupo',
+                                          'inicio_grupo', 'preco', 'fim_grupo'])
+        self.estoque.totais()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Testes dos índices secundários: a busca por trigramas tem de dar o mesmo resultado de uma varredura
+das descrições, inclusive depois de remoções, trocas de descrição e compactação.
+"""
+import random
+import unittest
+
+from estoque import COMPACTACAO_MINIMA, Estoque
+from indices import IndiceTrigramas
+
+CONSULTAS = ['', 'm', 'Mo', 'ous', 'mouse', 'MOUSE 1', 'monitor 12', 'ção', 'cao', 'é', 'xyz']
+
+def varredura(estoque, consulta):
+    normalizar = estoque.indice_descricoes.normalizar
+    consulta = normalizar(consulta)
+    return [slot for slot in estoque.slots() if estoque.descricoes[slot] and consulta in normalizar(estoque.descricoes[slot])]
+
+def estoque_aleatorio(sem_acentos=False, semente=3):
+    sorteio = random.Random(semente)
+    nomes = ['Monitor', 'Mouse', 'Teclado', 'Cabo', 'Impressão', 'Ação', 'Café']
+    estoque = Estoque(sem_acentos=sem_acentos)
+    for codigo in range(1, 3 * COMPACTACAO_MINIMA):
+        estoque.adicionar(f"{sorteio.choice(nomes)} {codigo % 23}", codigo, 1, 100, 200)
+    return estoque, sorteio
+
+class TesteIndiceTrigramas(unittest.TestCase):
+    def assertIgualAVarredura(self, estoque):
+        for consulta in CONSULTAS:
+            self.assertEqual(estoque.buscar_descricao(consulta), varredura(estoque, consulta), consulta)
+
+    def test_busca_igual_a_varredura_apos_alteracoes(self):
+        for sem_acentos in (False, True):
+            estoque, sorteio = estoque_aleatorio(sem_acentos)
+            self.assertIgualAVarredura(estoque)
+            for codigo in sorteio.sample(range(1, 3 * COMPACTACAO_MINIMA), 200):
+                estoque.atualizar_descricao(estoque.localizar(codigo), sorteio.choice(['MOUSE sem fio', 'Cabo', '']))
+            for codigo in sorteio.sample(range(1, 3 * COMPACTACAO_MINIMA), 2 * COMPACTACAO_MINIMA):
+                estoque.remover(codigo) # passa da metade: compacta e reconstrói o índice
+            self.assertLess(len(estoque.codigos), 2 * COMPACTACAO_MINIMA)
+            self.assertIgualAVarredura(estoque)
+
+    def test_limite_retorna_os_primeiros_resultados(self):
+        estoque, _ = estoque_aleatorio()
+        for consulta in CONSULTAS:
+            todos = estoque.buscar_descricao(consulta)
+            for limite in (0, 1, 5, len(todos) + 1):
+                self.assertEqual(estoque.buscar_descricao(consulta, limite), todos[:limite], (consulta, limite))
+
+    def test_indice_avulso_mantem_as_proprias_descricoes(self):
+        indice = IndiceTrigramas()
+        indice.adicionar(0, 'Monitor Samsung')
+        indice.adicionar(1, 'Mouse Razer')
+        self.assertEqual(indice.buscar('MONI'), [0])
+        self.assertEqual(indice.buscar('m'), [0, 1])
+        self.assertEqual(indice.buscar('m', limite=1), [0])
+        indice.atualizar(0, 'Teclado')
+        self.assertEqual(indice.buscar('mon'), [])
+        self.assertTrue(indice.contem(0, 'tecl'))
+        indice.remover(1)
+        self.assertEqual(indice.buscar('m'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Testes da execução em vários processos: buscas, totais e linhas do relatório têm de ser iguais aos do
+processo único, antes e depois de alterações no estoque.
+"""
+import random
+import unittest
+from unittest import mock
+
+import catalogo
+from catalogo import Catalogo
+from estoque import Estoque
+from paralelo import MotorParalelo
+
+NOMES = ['Mouse Razer', 'Teclado Mecânico', 'Monitor Samsung', 'Cabo USB', 'Ação Ñandú', 'STRASSE', 'Straße', '']
+CONSULTAS = ['ra', 'a', 'mouse', 'ss', 'ção', 'cao', 'MOU', 'zzz', 'e ', 'ñ']
+
+def estoque_aleatorio(quantidade=3000, semente=11, **opcoes):
+    sorteio = random.Random(semente)
+    estoque = Estoque(**opcoes)
+    for codigo in range(1, quantidade + 1):
+        custo = sorteio.randint(0, 50000)
+        estoque.adicionar(f"{sorteio.choice(NOMES)} {codigo % 13}", codigo, sorteio.randint(0, 300), custo,
+                          custo + sorteio.randint(0, 50000))
+    return estoque, sorteio
+
+def alterar(estoque, sorteio, fase):
+    for slot in sorteio.sample(list(estoque.slots()), 200): # alterações copiadas para o bloco na hora
+        estoque.atualizar_quantidade(slot, sorteio.randint(0, 9))
+        estoque.atualizar_preco(slot, estoque.precos[slot] + 1)
+    for slot in sorteio.sample(list(estoque.slots()), 20): # alterações que publicam o bloco de novo
+        estoque.atualizar_descricao(slot, f"Renomeado {fase} ção")
+    estoque.adicionar('Novo produto', 100000 + fase, 5, 100, 200)
+    for codigo in [estoque.codigos[slot] for slot in list(estoque.slots())[::4]]:
+        estoque.remover(codigo) # cria lápides e, quando passam da metade, compacta as colunas
+
+def relatorio(estoque, processos=None, inicio=0, limite=None):
+    catalogo_ = Catalogo(processos=processos)
+    catalogo_._estoque = estoque
+    try:
+        return ''.join(catalogo_.linhas_relatorio(inicio, limite))
+    finally:
+        if catalogo_._paralelo is not None:
+            catalogo_._paralelo.fechar()
+
+class TesteMotorParalelo(unittest.TestCase):
+    def assertMesmosResultados(self, motor, estoque):
+        self.assertEqual(motor.totais(), estoque.recalcular_totais())
+        self.assertEqual(motor.totais(), estoque.totais())
+        for consulta in CONSULTAS:
+            self.assertEqual(motor.buscar(consulta), estoque.buscar_descricao(consulta), consulta)
+        self.assertEqual(motor.buscar(''), list(estoque.slots()))
+
+    def test_mesmos_resultados_do_processo_unico(self):
+        for sem_acentos in (False, True):
+            estoque, sorteio = estoque_aleatorio(sem_acentos=sem_acentos)
+            with MotorParalelo(estoque, processos=2, tamanho_fragmento=700) as motor:
+                self.assertMesmosResultados(motor, estoque)
+                for fase in range(3):
+                    alterar(estoque, sorteio, fase)
+                    self.assertMesmosResultados(motor, estoque)
+                self.assertLess(len(estoque.codigos), 3000) # a última fase compactou as colunas
+
+    def test_relatorio_igual_ao_do_processo_unico(self):
+        estoque, sorteio = estoque_aleatorio()
+        with mock.patch.object(catalogo, 'MINIMO_PARALELO', 0):
+            for fase in range(2):
+                unico = relatorio(estoque)
+                self.assertEqual(relatorio(estoque, processos=2), unico)
+                self.assertEqual(relatorio(estoque, 2, 100, 1500), relatorio(estoque, None, 100, 1500))
+                self.assertEqual(relatorio(estoque, 2, len(estoque) - 10, 50), relatorio(estoque, None, len(estoque) - 10, 50))
+                alterar(estoque, sorteio, fase)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Testes da persistência: recuperação do diário, linha incompleta, instantâneos e descrições.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from estoque import interpretar_produto
+from persistencia import ArmazenamentoEstoque
+
+def estado(estoque):
+    return [estoque.tupla(slot) for slot in estoque.slots()]
+
+class TestePersistencia(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def alterar(self, estoque):
+        estoque.adicionar(*interpretar_produto('Mouse Razer;204;40;120.00;250.00'))
+        estoque.adicionar(*interpretar_produto('Monitor LG;206;8;750.00;1150.00'))
+        estoque.definir_quantidade(204, 35)
+        estoque.definir_preco(206, 120000)
+        estoque.remover(204)
+        estoque.adicionar(*interpretar_produto('Teclado;207;3;180.00;300.00'))
+
+    def test_recupera_o_diario_sem_fechar(self):
+        armazenamento = ArmazenamentoEstoque(self.diretorio)
+        estoque = armazenamento.abrir()
+        self.alterar(estoque)
+        esperado = estado(estoque) # o processo "cai" aqui: o diário não é fechado
+
+        recuperado = ArmazenamentoEstoque(self.diretorio).abrir()
+        self.assertEqual(estado(recuperado), esperado)
+        self.assertEqual(recuperado.totais(), estoque.totais())
+        self.assertEqual(recuperado.alocador.proximo, estoque.alocador.proximo)
+        armazenamento.fechar()
+
+    def test_descarta_a_ultima_linha_incompleta(self):
+        with ArmazenamentoEstoque(self.diretorio) as estoque:
+            self.alterar(estoque)
+            esperado = estado(estoque)
+        with open(os.path.join(self.diretorio, 'diario.log'), 'ab') as diario:
+            diario.write(b'{"seq": 99, "op": "quanti') # gravação interrompida
+
+        with ArmazenamentoEstoque(self.diretorio) as recuperado:
+            self.assertEqual(estado(recuperado), esperado)
+            recuperado.definir_quantidade(206, 1) # o diário continua utilizável depois da linha descartada
+        with ArmazenamentoEstoque(self.diretorio) as recuperado:
+            self.assertEqual(recuperado.quantidades[recuperado.localizar(206)], 1)
+
+    def test_instantaneo_com_lapides_e_diario_posterior(self):
+        armazenamento = ArmazenamentoEstoque(self.diretorio)
+        estoque = armazenamento.abrir()
+        self.alterar(estoque)
+        armazenamento.gravar_instantaneo() # grava só os produtos vivos e reinicia o diário
+        self.assertEqual(os.path.getsize(armazenamento.caminho_diario), 0)
+        estoque.definir_quantidade(207, 9)
+        esperado = estado(estoque)
+        armazenamento.fechar()
+
+        with ArmazenamentoEstoque(self.diretorio) as recuperado:
+            self.assertEqual(estado(recuperado), esperado)
+            self.assertNotIn(204, recuperado)
+
+    def test_instantaneo_preserva_as_descricoes(self):
+        descricoes = ['', 'Cabo;HDMI', 'Monitor 27" – ação', 'Mouse\nsem fio', 'Teclado']
+        with ArmazenamentoEstoque(self.diretorio) as estoque:
+            for codigo, descricao in enumerate(descricoes, 1):
+                estoque.adicionar(descricao, codigo, codigo, 100, 200)
+            with self.assertRaises(ValueError): # '\0' separa as descrições no instantâneo
+                estoque.adicionar('Cabo\0HDMI', 10, 1, 100, 200)
+            with self.assertRaises(ValueError):
+                estoque.atualizar_descricao(estoque.localizar(5), 'Teclado\0ABNT')
+        armazenamento = ArmazenamentoEstoque(self.diretorio)
+        armazenamento.abrir()
+        armazenamento.gravar_instantaneo()
+        armazenamento.fechar()
+
+        with ArmazenamentoEstoque(self.diretorio) as recuperado:
+            self.assertEqual([recuperado.descricoes[slot] for slot in recuperado.slots()], descricoes)
+            self.assertNotIn(10, recuperado)
+
+    def test_instantaneo_com_descricoes_a_mais_e_rejeitado(self):
+        armazenamento = ArmazenamentoEstoque(self.diretorio)
+        estoque = armazenamento.abrir()
+        estoque.adicionar('Mouse', 1, 1, 100, 200)
+        armazenamento.gravar_instantaneo()
+        armazenamento.fechar()
+        with open(armazenamento.caminho_instantaneo, 'ab') as arquivo:
+            arquivo.write(b'\0sobra')
+        with self.assertRaises(ValueError):
+            ArmazenamentoEstoque(self.diretorio).abrir()
+
+if __name__ == '__main__':
+    unittest.main()
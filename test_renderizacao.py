@@ -0,0 +1,77 @@
+"""
+Testes da renderização em blocos: escrita em saídas com apenas `write`, paginação e exibição por
+páginas no terminal.
+"""
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import at
+from renderizacao import bloco_produto, blocos_produtos, escrever, paginar, paginas
+
+class SoEscrita:
+    """Saída que só tem `write`, como alguns sockets e objetos de log."""
+
+    def __init__(self):
+        self.escritas = []
+
+    def write(self, texto):
+        self.escritas.append(texto)
+
+class TesteRenderizacao(unittest.TestCase):
+    def test_escrever_em_saida_sem_flush(self):
+        saida = SoEscrita()
+        pedacos = [f"linha {numero}\n" for numero in range(100)]
+        self.assertEqual(escrever(pedacos, saida, tamanho_buffer=50), len(''.join(pedacos)))
+        self.assertEqual(''.join(saida.escritas), ''.join(pedacos))
+        self.assertTrue(all(len(escrita) >= 50 for escrita in saida.escritas[:-1])) # blocos grandes, não um por pedaço
+        self.assertEqual(escrever([], SoEscrita()), 0)
+
+    def test_escrever_chama_flush_quando_existe(self):
+        saida = mock.Mock(spec=['write', 'flush'])
+        escrever(['a\n', 'b\n'], saida)
+        saida.write.assert_called_once_with('a\nb\n')
+        saida.flush.assert_called_once_with()
+
+    def test_paginar_e_paginas(self):
+        self.assertEqual(list(paginar(range(10))), list(range(10)))
+        self.assertEqual(list(paginar(range(10), 3)), list(range(3, 10)))
+        self.assertEqual(list(paginar(range(10), 3, 4)), [3, 4, 5, 6])
+        self.assertEqual(list(paginar(range(10), 8, 5)), [8, 9])
+        self.assertEqual(list(paginas(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(paginas([], 3)), [])
+
+    def test_blocos_produtos(self):
+        produto = {'descricao': 'Mouse Razer', 'codigo': '204'}
+        self.assertEqual(bloco_produto(produto), 'Produto:\ndescricao: Mouse Razer\ncodigo: 204\n--------------------\n')
+        self.assertEqual(list(blocos_produtos([produto, produto])), [bloco_produto(produto)] * 2)
+
+class TesteExibicaoPorPaginas(unittest.TestCase):
+    def exibir(self, pedacos, respostas, **opcoes):
+        saida = io.StringIO()
+        with mock.patch.object(at, 'tamanho_pagina', 2), mock.patch('builtins.input', side_effect=respostas) as entrada:
+            with redirect_stdout(saida):
+                at.exibir(pedacos, **opcoes)
+        return saida.getvalue(), entrada.call_count
+
+    def test_cabecalho_e_rodape_ficam_fora_das_paginas(self):
+        pedacos = ['topo\n', 'a\n', 'b\n', 'c\n', 'd\n', 'e\n', 'total\n']
+        texto, perguntas = self.exibir(pedacos, ['1', '1'], cabecalho=1, rodape=1)
+        self.assertEqual(texto, ''.join(pedacos))
+        self.assertEqual(perguntas, 2) # três páginas de itens: a-b, c-d, e
+
+    def test_parar_interrompe_a_listagem(self):
+        texto, perguntas = self.exibir(['topo\n', 'a\n', 'b\n', 'c\n', 'total\n'], ['2'], cabecalho=1, rodape=1)
+        self.assertEqual(texto, 'topo\na\nb\n')
+        self.assertEqual(perguntas, 1)
+
+    def test_saida_informada_nao_pagina(self):
+        saida = SoEscrita()
+        with mock.patch.object(at, 'tamanho_pagina', 2), mock.patch('builtins.input') as entrada:
+            at.exibir(['a\n', 'b\n', 'c\n'], saida)
+        self.assertEqual(''.join(saida.escritas), 'a\nb\nc\n')
+        entrada.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
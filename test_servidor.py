@@ -0,0 +1,83 @@
+"""
+Testes do serviço de rede: ordem das respostas com pipelining e tratamento de falhas do escritor.
+"""
+import unittest
+
+from estoque import Estoque, interpretar_produto
+from servidor import ClienteEstoque, ServidorEstoque
+
+def estoque_exemplo():
+    estoque = Estoque(verificar=True)
+    estoque.adicionar_lote([interpretar_produto('Mouse Logitech;203;50;70.00;150.00'),
+                            interpretar_produto('Mouse Razer;204;40;120.00;250.00')])
+    return estoque
+
+def quantidade(resultado):
+    return int(resultado['resultado'][0]['quantidade'])
+
+class TesteServidor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.estoque = estoque_exemplo()
+        self.servidor = ServidorEstoque(self.estoque, porta=0)
+        await self.servidor.iniciar()
+        self.cliente = ClienteEstoque(porta=self.servidor.porta)
+        await self.cliente.conectar()
+
+    async def asyncTearDown(self):
+        await self.cliente.fechar()
+        await self.servidor.fechar()
+
+    async def test_leitura_ve_apenas_as_escritas_enviadas_antes(self):
+        resultados = await self.cliente.executar_varios([
+            'quantidade 203 1', 'buscar 203', 'movimentar 203:+5', 'buscar 203', 'quantidade 204 7', 'valor_total'])
+        self.assertEqual([resultado['linha'] for resultado in resultados], [1, 2, 3, 4, 5, 6])
+        self.assertTrue(all(resultado['ok'] for resultado in resultados))
+        self.assertEqual(quantidade(resultados[1]), 1)
+        self.assertEqual(quantidade(resultados[3]), 6)
+        self.assertEqual(resultados[5]['resultado'], '2650.00') # 6 * 150.00 + 7 * 250.00
+
+    async def test_leituras_de_outra_conexao_nao_esperam(self):
+        async with ClienteEstoque(porta=self.servidor.porta) as outro:
+            await self.cliente.executar('quantidade 203 9')
+            self.assertEqual(quantidade(await outro.executar('buscar 203')), 9)
+
+    async def test_erro_inesperado_nao_derruba_o_escritor(self):
+        executar = self.servidor._executor.executar
+        def executar_com_falha(linha):
+            if linha == 'quantidade 203 77':
+                raise OverflowError('falha simulada')
+            return executar(linha)
+        self.servidor._executor.executar = executar_com_falha
+
+        falhou, seguinte = await self.cliente.executar_varios(['quantidade 203 77', 'quantidade 203 8'])
+        self.assertFalse(falhou['ok'])
+        self.assertTrue(seguinte['ok'])
+        self.assertEqual(quantidade(await self.cliente.executar('buscar 203')), 8)
+
+    async def test_falha_ao_gravar_o_grupo_desfaz_as_escritas(self):
+        grupos, falhas = [0], [1]
+        def ouvinte(operacao, *argumentos): # como o diário: grava (e falha) só no fim do grupo mais externo
+            if operacao == 'inicio_grupo':
+                grupos[0] += 1
+            elif operacao == 'fim_grupo':
+                grupos[0] -= 1
+                if not grupos[0] and falhas:
+                    falhas.pop()
+                    raise OSError('fsync falhou')
+        self.estoque.adicionar_ouvinte(ouvinte)
+
+        self.assertFalse((await self.cliente.executar('movimentar 203:+5'))['ok'])
+        self.assertEqual(quantidade(await self.cliente.executar('buscar 203')), 50)
+        self.assertTrue((await self.cliente.executar('movimentar 203:+5'))['ok']) # a repetição aplica uma vez só
+        self.assertEqual(quantidade(await self.cliente.executar('buscar 203')), 55)
+        self.estoque.totais()
+
+    async def test_listar_sem_limite_usa_a_pagina_padrao(self):
+        self.servidor._executor.limite_padrao = 1
+        resultado = await self.cliente.executar('listar')
+        self.assertEqual(len(resultado['resultado']), 1)
+        resultado = await self.cliente.executar('relatorio 1 5')
+        self.assertEqual([item['codigo'] for item in resultado['resultado']['itens']], ['204'])
+
+if __name__ == '__main__':
+    unittest.main()